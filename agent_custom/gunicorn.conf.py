@@ -0,0 +1,16 @@
+"""Gunicorn 配置
+
+``/api/events`` 是SSE长连接，同步 worker 会被每个打开的页面独占，
+因此使用线程 worker（每个连接占一个线程而不是一个进程）。
+各进程的事件总线相互独立，页面另有低频轮询补齐其他进程的更新。
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+# gthread 下 timeout 只用于检测卡死的 worker，不会中断正常的长连接
+timeout = 60
+keepalive = 5
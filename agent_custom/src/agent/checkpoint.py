@@ -0,0 +1,103 @@
+"""节点结果检查点"""
+
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+from ..core.config import get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class CheckpointStore:
+    """节点结果检查点存储（SQLite）
+    
+    按 task_id 保存每个成功节点的输出。任务重试时加载这些输出，
+    已完成的节点直接复用结果，不再重复调用上游接口和LLM。
+    """
+    
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                task_id TEXT NOT NULL,
+                node TEXT NOT NULL,
+                data TEXT NOT NULL,
+                saved_at REAL NOT NULL,
+                PRIMARY KEY (task_id, node)
+            )
+        """)
+        self._conn.commit()
+    
+    def save(self, task_id: str, node: str, values: Dict[str, Any]):
+        """保存节点输出
+        
+        Args:
+            task_id: 任务ID
+            node: 节点名
+            values: 节点输出的状态字段
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (task_id, node, data, saved_at) "
+                "VALUES (?, ?, ?, ?)",
+                (task_id, node, json.dumps(values, ensure_ascii=False, default=str), time.time())
+            )
+            self._conn.commit()
+    
+    def load(self, task_id: str) -> Dict[str, Any]:
+        """加载任务的所有检查点
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            按保存顺序合并后的状态字段
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM checkpoints WHERE task_id = ? ORDER BY saved_at",
+                (task_id,)
+            ).fetchall()
+        
+        values: Dict[str, Any] = {}
+        for row in rows:
+            values.update(json.loads(row[0]))
+        return values
+    
+    def clear(self, task_id: str):
+        """删除任务的检查点"""
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+            self._conn.commit()
+    
+    def prune(self, max_age: float) -> int:
+        """删除超过 ``max_age`` 秒的检查点
+        
+        Returns:
+            删除的记录数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM checkpoints WHERE saved_at < ?", (time.time() - max_age,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+
+@lru_cache()
+def get_checkpoint_store() -> CheckpointStore:
+    """获取共享的检查点存储"""
+    store = CheckpointStore(settings.data_dir / "checkpoints.sqlite3")
+    store.prune(settings.tasks.max_age)
+    return store
@@ -1,38 +1,57 @@
 """Agent工作流图定义"""
 
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
+import asyncio
+
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage
 
+from .checkpoint import get_checkpoint_store
 from .state import AgentState
 from .nodes import (
     route_task,
     find_hotspots,
+    afind_hotspots,
     analyze_video,
+    aanalyze_video,
+    dispatch_analysis,
+    analyze_one_video,
+    aanalyze_one_video,
+    merge_analyses,
     generate_prompt,
+    agenerate_prompt,
     create_video,
+    acreate_video,
     format_output
 )
+from ..tools.bilibili import get_bilibili_client
+from ..core.config import get_settings
 from ..core.logger import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 
-def create_agent_graph() -> StateGraph:
+def create_agent_graph(use_async: bool = False) -> StateGraph:
     """创建Agent工作流图
     
+    Args:
+        use_async: 是否使用异步I/O节点，异步图需通过 ``arun_agent`` 执行
+    
     Returns:
         配置好的StateGraph实例
     """
     # 创建状态图
     workflow = StateGraph(AgentState)
     
-    # 添加节点
+    # 添加节点（纯计算节点同步/异步图共用）
     workflow.add_node("route", route_task)
-    workflow.add_node("find_hotspots", find_hotspots)
-    workflow.add_node("analyze", analyze_video)
-    workflow.add_node("generate", generate_prompt)
-    workflow.add_node("create", create_video)
+    workflow.add_node("find_hotspots", afind_hotspots if use_async else find_hotspots)
+    workflow.add_node("analyze", aanalyze_video if use_async else analyze_video)
+    workflow.add_node("analyze_one", aanalyze_one_video if use_async else analyze_one_video)
+    workflow.add_node("merge", merge_analyses)
+    workflow.add_node("generate", agenerate_prompt if use_async else generate_prompt)
+    workflow.add_node("create", acreate_video if use_async else create_video)
     workflow.add_node("format", format_output)
     
     # 设置入口点
@@ -50,11 +69,19 @@ def create_agent_graph() -> StateGraph:
         }
     )
     
-    # 热点发现 -> 分析
-    workflow.add_edge("find_hotspots", "analyze")
+    # 热点发现 -> 分析（前N个视频并行分析，或单视频分析）
+    workflow.add_conditional_edges(
+        "find_hotspots",
+        dispatch_analysis,
+        ["analyze", "analyze_one"]
+    )
+    
+    # 并行分析 -> 汇总
+    workflow.add_edge("analyze_one", "merge")
     
     # 分析 -> 生成
     workflow.add_edge("analyze", "generate")
+    workflow.add_edge("merge", "generate")
     
     # 生成 -> 创建视频
     workflow.add_edge("generate", "create")
@@ -76,6 +103,8 @@ def run_agent(
     graph: StateGraph,
     user_input: str,
     task_type: str = "complete",
+    on_token: Optional[Callable[[str], None]] = None,
+    resume: bool = False,
     **kwargs
 ) -> Dict[str, Any]:
     """运行Agent
@@ -84,11 +113,63 @@ def run_agent(
         graph: 编译后的工作流图
         user_input: 用户输入
         task_type: 任务类型
+        on_token: 提示词流式输出回调（参数为当前累计文本）
+        resume: 是否从检查点恢复，已完成的节点直接复用结果
         **kwargs: 其他参数
         
     Returns:
         执行结果
     """
+    initial_state = _initial_state(user_input, task_type, resume, **kwargs)
+    
+    try:
+        # 执行工作流
+        result = graph.invoke(initial_state, config=_run_config(on_token))
+        logger.info(f"任务 {initial_state['task_id']} 执行完成")
+        return result
+        
+    except Exception as e:
+        logger.error(f"任务执行失败: {str(e)}", exc_info=True)
+        return {
+            **initial_state,
+            "error": str(e),
+            "completed": False
+        }
+
+
+async def arun_agent(
+    graph: StateGraph,
+    user_input: str,
+    task_type: str = "complete",
+    on_token: Optional[Callable[[str], None]] = None,
+    resume: bool = False,
+    **kwargs
+) -> Dict[str, Any]:
+    """异步运行Agent，参数与 ``run_agent`` 相同
+    
+    ``graph`` 应由 ``create_agent_graph(use_async=True)`` 创建。运行结束后
+    关闭当前事件循环的B站异步客户端。
+    """
+    # 恢复时读取检查点是SQLite查询，放到线程中避免阻塞事件循环
+    initial_state = await asyncio.to_thread(_initial_state, user_input, task_type, resume, **kwargs)
+    
+    try:
+        async with get_bilibili_client().scope():
+            result = await graph.ainvoke(initial_state, config=_run_config(on_token))
+        logger.info(f"任务 {initial_state['task_id']} 执行完成")
+        return result
+        
+    except Exception as e:
+        logger.error(f"任务执行失败: {str(e)}", exc_info=True)
+        return {
+            **initial_state,
+            "error": str(e),
+            "completed": False
+        }
+
+
+def _initial_state(user_input: str, task_type: str, resume: bool, **kwargs) -> AgentState:
+    """构建初始状态，恢复时合并检查点中的节点输出"""
     from datetime import datetime
     
     # 初始化状态
@@ -105,17 +186,19 @@ def run_agent(
         "metadata": {}
     }
     
-    try:
-        # 执行工作流
-        result = graph.invoke(initial_state)
-        logger.info(f"任务 {initial_state['task_id']} 执行完成")
-        return result
-        
-    except Exception as e:
-        logger.error(f"任务执行失败: {str(e)}", exc_info=True)
-        return {
-            **initial_state,
-            "error": str(e),
-            "completed": False
-        }
+    if resume:
+        restored = get_checkpoint_store().load(initial_state["task_id"])
+        if restored:
+            initial_state.update(restored)
+            logger.info(f"任务 {initial_state['task_id']} 从检查点恢复: {', '.join(restored)}")
+    
+    return initial_state
+
+
+def _run_config(on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    # max_concurrency 限制并行分析分支数
+    return {
+        "max_concurrency": settings.analysis.max_concurrency,
+        "configurable": {"on_token": on_token}
+    }
 
@@ -1,12 +1,22 @@
 """Agent工作流节点实现"""
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+from collections import Counter
+import asyncio
 from datetime import datetime
 
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Send
+
+from .checkpoint import get_checkpoint_store
 from .state import AgentState
 from ..tools.hotspot import HotspotFinder
 from ..tools.analyzer import VideoAnalyzer
+from ..tools.breaker import CircuitOpenError, get_circuit_breaker
 from ..tools.generator import PromptGenerator, VideoGenerator
+from ..tools.registry import get_tool
+from ..tools.text import get_tokenizer, tfidf_keywords
+from ..tools.tracker import get_hotspot_tracker
 from ..core.config import get_settings
 from ..core.logger import get_logger
 
@@ -14,6 +24,74 @@ logger = get_logger(__name__)
 settings = get_settings()
 
 
+def _restored(state: AgentState, step: str, *keys: str) -> bool:
+    """检查节点输出是否已从检查点恢复（恢复时跳过该节点）
+    
+    Args:
+        state: 当前状态
+        step: 节点名
+        *keys: 节点必需的输出字段
+        
+    Returns:
+        是否可以复用已有结果
+    """
+    if not all(state.get(key) for key in keys):
+        return False
+    
+    logger.info(f"复用检查点: {step}")
+    state["messages"].append(f"复用已完成的步骤: {step}")
+    state["updated_at"] = datetime.now()
+    return True
+
+
+def _save_checkpoint(state: AgentState, step: str, *keys: str):
+    """保存节点输出到检查点
+    
+    Args:
+        state: 当前状态
+        step: 节点名
+        *keys: 需要保存的输出字段
+    """
+    try:
+        get_checkpoint_store().save(
+            state["task_id"],
+            step,
+            {key: state.get(key) for key in keys}
+        )
+    except Exception as e:
+        logger.warning(f"保存检查点失败: {str(e)}")
+
+
+def _fail(state: AgentState, step: str, error: Exception):
+    """记录节点失败
+    
+    Args:
+        state: 当前状态
+        step: 步骤描述，例如 "热点查找"
+        error: 异常
+    """
+    logger.error(f"{step}失败: {str(error)}")
+    state["error"] = str(error)
+    state["messages"].append(f"{step}失败: {str(error)}")
+
+
+def _check_backend(backend: str):
+    """后端熔断期间直接失败，不再调用工具等待超时
+    
+    只查看熔断状态，到期后的试探请求由工具内的客户端发出并记录结果。
+    
+    Args:
+        backend: ``bilibili`` 或 ``gemini``
+        
+    Raises:
+        CircuitOpenError: 后端已熔断
+    """
+    config = settings.llm.breaker if backend == "gemini" else settings.bilibili.breaker
+    breaker = get_circuit_breaker(backend, config)
+    if breaker.is_open():
+        raise CircuitOpenError(backend, breaker.retry_after())
+
+
 def route_task(state: AgentState) -> AgentState:
     """路由任务类型
     
@@ -44,28 +122,84 @@ def find_hotspots(state: AgentState) -> AgentState:
     logger.info("开始查找热点视频")
     state["current_step"] = "finding_hotspots"
     
+    if _restored(state, "find_hotspots", "hotspot_videos"):
+        return state
+    
     try:
-        finder = HotspotFinder()
-        keywords = state.get("keywords", [])
-        
-        if not keywords:
-            keywords = ["AI", "科技"]  # 默认关键词
-        
-        hotspots = finder.find_hotspots(keywords, top_k=10)
-        
-        state["hotspot_videos"] = hotspots
-        state["selected_video"] = hotspots[0] if hotspots else None
-        state["messages"].append(f"找到 {len(hotspots)} 个热点视频")
+        keywords = _search_keywords(state)
+        hotspots = _tracked_hotspots(keywords)
+        if hotspots is None:
+            _check_backend("bilibili")
+            hotspots = get_tool(HotspotFinder).find_hotspots(keywords, top_k=10)
+        _apply_hotspots(state, hotspots)
+    except Exception as e:
+        _fail(state, "热点查找", e)
+    
+    state["updated_at"] = datetime.now()
+    return state
+
+
+async def afind_hotspots(state: AgentState) -> AgentState:
+    """查找热点视频（异步）
+    
+    Args:
+        state: 当前状态
         
+    Returns:
+        更新后的状态
+    """
+    logger.info("开始查找热点视频")
+    state["current_step"] = "finding_hotspots"
+    
+    if _restored(state, "find_hotspots", "hotspot_videos"):
+        return state
+    
+    try:
+        keywords = _search_keywords(state)
+        hotspots = await asyncio.to_thread(_tracked_hotspots, keywords)
+        if hotspots is None:
+            _check_backend("bilibili")
+            hotspots = await get_tool(HotspotFinder).afind_hotspots(keywords, top_k=10)
+        await asyncio.to_thread(_apply_hotspots, state, hotspots)
     except Exception as e:
-        logger.error(f"热点查找失败: {str(e)}")
-        state["error"] = str(e)
-        state["messages"].append(f"热点查找失败: {str(e)}")
+        _fail(state, "热点查找", e)
     
     state["updated_at"] = datetime.now()
     return state
 
 
+def _search_keywords(state: AgentState) -> List[str]:
+    return state.get("keywords") or ["AI", "科技"]  # 默认关键词
+
+
+def _tracked_hotspots(keywords: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """从热点追踪器读取预先计算的排名，未开启或尚无新鲜快照时返回None"""
+    if not settings.hotspot.tracker.enabled:
+        return None
+    
+    try:
+        tracker = get_hotspot_tracker()
+        tracker.track(keywords)
+        hotspots = tracker.ranking(keywords, top_k=10)
+    except Exception as e:
+        logger.warning(f"读取热点排名失败: {str(e)}")
+        return None
+    
+    if hotspots:
+        logger.info("使用热点追踪排名")
+        return hotspots
+    return None
+
+
+def _apply_hotspots(state: AgentState, hotspots: List[Dict[str, Any]]):
+    state["hotspot_videos"] = hotspots
+    state["selected_video"] = hotspots[0] if hotspots else None
+    state["messages"].append(f"找到 {len(hotspots)} 个热点视频")
+    
+    if hotspots:
+        _save_checkpoint(state, "find_hotspots", "hotspot_videos", "selected_video")
+
+
 def analyze_video(state: AgentState) -> AgentState:
     """分析视频内容
     
@@ -78,35 +212,239 @@ def analyze_video(state: AgentState) -> AgentState:
     logger.info("开始分析视频")
     state["current_step"] = "analyzing"
     
+    if _restored(state, "analyze", "video_insights"):
+        return state
+    
     try:
-        analyzer = VideoAnalyzer()
-        video = state.get("selected_video")
+        _check_backend("bilibili")
+        analyzer = get_tool(VideoAnalyzer)
+        
+        # 分析视频（详情只获取一次，评论并发获取）
+        analysis = analyzer.analyze(_selected_video(state))
+        _apply_analysis(state, analysis)
+    except Exception as e:
+        _fail(state, "视频分析", e)
+    
+    state["updated_at"] = datetime.now()
+    return state
+
+
+async def aanalyze_video(state: AgentState) -> AgentState:
+    """分析视频内容（异步）
+    
+    Args:
+        state: 当前状态
         
-        if not video:
-            raise ValueError("没有选中的视频")
+    Returns:
+        更新后的状态
+    """
+    logger.info("开始分析视频")
+    state["current_step"] = "analyzing"
+    
+    if _restored(state, "analyze", "video_insights"):
+        return state
+    
+    try:
+        _check_backend("bilibili")
+        analyzer = get_tool(VideoAnalyzer)
+        analysis = await analyzer.aanalyze(_selected_video(state))
+        await asyncio.to_thread(_apply_analysis, state, analysis)
+    except Exception as e:
+        _fail(state, "视频分析", e)
+    
+    state["updated_at"] = datetime.now()
+    return state
+
+
+def _selected_video(state: AgentState) -> Dict[str, Any]:
+    video = state.get("selected_video")
+    if not video:
+        raise ValueError("没有选中的视频")
+    return video
+
+
+def _without_texts(comments: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉评论原文：原文只用于多视频汇总，不写入状态、检查点和任务结果"""
+    return {key: value for key, value in comments.items() if key != "texts"}
+
+
+def _apply_analysis(state: AgentState, analysis: Dict[str, Any]):
+    state["video_insights"] = analysis["insights"]
+    state["comments_analysis"] = _without_texts(analysis["comments"])
+    state["messages"].append("视频分析完成")
+    
+    if analysis["insights"]:
+        _save_checkpoint(state, "analyze", "selected_video", "video_insights", "comments_analysis")
+
+
+def dispatch_analysis(state: AgentState) -> Union[str, List[Send]]:
+    """分发视频分析任务
+    
+    热点视频多于1个且开启并行分析时，为前N个视频各生成一个分析分支；
+    否则走单视频分析节点。
+    
+    Args:
+        state: 当前状态
         
-        # 分析视频
-        insights = analyzer.analyze_video(video)
-        comments = analyzer.analyze_comments(video.get("bvid", ""))
+    Returns:
+        下一个节点名或Send列表
+    """
+    videos = state.get("hotspot_videos") or []
+    top_n = settings.analysis.fanout_top_n
+    
+    # 已从检查点恢复分析结果时由单视频节点直接复用
+    if state.get("video_insights") or top_n <= 1 or len(videos) <= 1:
+        return "analyze"
+    
+    return [Send("analyze_one", {"video": video}) for video in videos[:top_n]]
+
+
+def analyze_one_video(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """分析单个热点视频（并行分支）
+    
+    Args:
+        payload: 包含 video 的分支输入
         
-        state["video_insights"] = insights
-        state["comments_analysis"] = comments
-        state["messages"].append("视频分析完成")
+    Returns:
+        只包含 video_analyses 的状态更新
+    """
+    video = payload["video"]
+    
+    try:
+        _check_backend("bilibili")
+        analysis = get_tool(VideoAnalyzer).analyze(video)
+    except Exception as e:
+        return _branch_result(video, error=e)
+    
+    return _branch_result(video, analysis)
+
+
+async def aanalyze_one_video(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """分析单个热点视频（异步并行分支）
+    
+    Args:
+        payload: 包含 video 的分支输入
         
+    Returns:
+        只包含 video_analyses 的状态更新
+    """
+    video = payload["video"]
+    
+    try:
+        _check_backend("bilibili")
+        analysis = await get_tool(VideoAnalyzer).aanalyze(video)
     except Exception as e:
-        logger.error(f"视频分析失败: {str(e)}")
-        state["error"] = str(e)
-        state["messages"].append(f"视频分析失败: {str(e)}")
+        return _branch_result(video, error=e)
+    
+    return _branch_result(video, analysis)
+
+
+def _branch_result(
+    video: Dict[str, Any],
+    analysis: Optional[Dict[str, Any]] = None,
+    error: Optional[Exception] = None
+) -> Dict[str, Any]:
+    bvid = video.get("bvid", "")
+    
+    if error is not None:
+        logger.error(f"视频 {bvid} 分析失败: {str(error)}")
+        result = {"bvid": bvid, "video": video, "error": str(error)}
+    else:
+        result = {"bvid": bvid, "video": video, **analysis}
     
+    return {"video_analyses": [result]}
+
+
+def merge_analyses(state: AgentState) -> AgentState:
+    """汇总并行分析结果
+    
+    以排名最高的视频为主体，合并所有视频的标签和热门评论，并把所有视频
+    的评论作为同一个语料计算TF-IDF关键词。
+    
+    Args:
+        state: 当前状态
+        
+    Returns:
+        更新后的状态
+    """
+    logger.info("汇总视频分析结果")
+    state["current_step"] = "analyzing"
+    
+    branches = state.get("video_analyses") or []
+    
+    # 评论原文只在这里计算关键词；按BV号合并，替换各分支带原文的结果
+    state["video_analyses"] = [
+        {**a, "comments": _without_texts(a["comments"])} if a.get("comments") else a
+        for a in branches
+    ]
+    
+    # 按热点排名排序
+    rank = {video.get("bvid"): i for i, video in enumerate(state.get("hotspot_videos") or [])}
+    analyses = sorted(
+        [a for a in branches if a.get("insights")],
+        key=lambda a: rank.get(a.get("bvid"), len(rank))
+    )
+    
+    if not analyses:
+        state["error"] = "视频分析失败"
+        state["messages"].append("视频分析失败: 没有可用的分析结果")
+        state["updated_at"] = datetime.now()
+        return state
+    
+    primary = analyses[0]
+    
+    tags: List[str] = []
+    keyword_counter: Counter = Counter()
+    hot_comments: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    total_comments = 0
+    
+    for analysis in analyses:
+        for tag in analysis["insights"].get("tags", []):
+            if tag not in tags:
+                tags.append(tag)
+        
+        comments = analysis.get("comments") or {}
+        total_comments += comments.get("total", 0)
+        hot_comments.extend(comments.get("hot_comments", []))
+        texts.extend(comments.get("texts", []))
+        
+        # 没有评论原文时（例如旧检查点）按各视频关键词排名加权
+        keywords = comments.get("keywords", [])
+        for i, keyword in enumerate(keywords):
+            keyword_counter[keyword] += len(keywords) - i
+    
+    state["selected_video"] = primary["video"]
+    state["video_insights"] = {
+        **primary["insights"],
+        "tags": tags,
+        "related_videos": [
+            {"bvid": a["bvid"], "title": a["insights"].get("title", "")}
+            for a in analyses[1:]
+        ]
+    }
+    if texts:
+        keywords = tfidf_keywords(texts, get_tokenizer(settings.analysis.tokenizer), top_k=10)
+    else:
+        keywords = [keyword for keyword, _ in keyword_counter.most_common(10)]
+    
+    state["comments_analysis"] = {
+        "total": total_comments,
+        "hot_comments": sorted(hot_comments, key=lambda c: c.get("like", 0), reverse=True)[:10],
+        "keywords": keywords
+    }
+    state["messages"].append(f"已并行分析 {len(analyses)} 个热点视频")
+    _save_checkpoint(state, "analyze", "selected_video", "video_insights", "comments_analysis")
     state["updated_at"] = datetime.now()
     return state
 
 
-def generate_prompt(state: AgentState) -> AgentState:
+def generate_prompt(state: AgentState, config: RunnableConfig) -> AgentState:
     """生成视频提示词
     
     Args:
         state: 当前状态
+        config: 运行配置，``configurable.on_token`` 为流式输出回调
         
     Returns:
         更新后的状态
@@ -114,34 +452,71 @@ def generate_prompt(state: AgentState) -> AgentState:
     logger.info("开始生成提示词")
     state["current_step"] = "generating_prompt"
     
+    if _restored(state, "generate", "prompt_text"):
+        return state
+    
     try:
-        generator = PromptGenerator()
-        
-        insights = state.get("video_insights", {})
-        comments = state.get("comments_analysis", {})
+        generator = get_tool(PromptGenerator)
         
         # 生成提示词
-        prompt_result = generator.generate_prompt(
-            video_insights=insights,
-            comments_analysis=comments,
-            user_input=state.get("user_input", "")
-        )
-        
-        state["prompt_text"] = prompt_result.get("text", "")
-        state["prompt_json"] = prompt_result.get("json", {})
-        state["messages"].append("提示词生成完成")
+        prompt_result = generator.generate_prompt(**_prompt_inputs(state, config))
+        _apply_prompt(state, prompt_result)
+    except Exception as e:
+        _fail(state, "提示词生成", e)
+    
+    state["updated_at"] = datetime.now()
+    return state
+
+
+async def agenerate_prompt(state: AgentState, config: RunnableConfig) -> AgentState:
+    """生成视频提示词（异步）
+    
+    Args:
+        state: 当前状态
+        config: 运行配置，``configurable.on_token`` 为流式输出回调
         
+    Returns:
+        更新后的状态
+    """
+    logger.info("开始生成提示词")
+    state["current_step"] = "generating_prompt"
+    
+    if _restored(state, "generate", "prompt_text"):
+        return state
+    
+    try:
+        generator = get_tool(PromptGenerator)
+        prompt_result = await generator.agenerate_prompt(**_prompt_inputs(state, config))
+        await asyncio.to_thread(_apply_prompt, state, prompt_result)
     except Exception as e:
-        logger.error(f"提示词生成失败: {str(e)}")
-        state["error"] = str(e)
-        state["messages"].append(f"提示词生成失败: {str(e)}")
+        _fail(state, "提示词生成", e)
     
     state["updated_at"] = datetime.now()
     return state
 
 
+def _prompt_inputs(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+    return {
+        "video_insights": state.get("video_insights", {}),
+        "comments_analysis": state.get("comments_analysis", {}),
+        "user_input": state.get("user_input", ""),
+        "on_token": (config.get("configurable") or {}).get("on_token")
+    }
+
+
+def _apply_prompt(state: AgentState, prompt_result: Dict[str, Any]):
+    state["prompt_text"] = prompt_result.get("text", "")
+    state["prompt_json"] = prompt_result.get("json", {})
+    state["messages"].append("提示词生成完成")
+    
+    if state["prompt_text"]:
+        _save_checkpoint(state, "generate", "prompt_text", "prompt_json")
+
+
 def create_video(state: AgentState) -> AgentState:
-    """创建视频
+    """提交视频生成任务
+    
+    视频由后台任务管理器生成，节点只提交任务并记录任务ID，不等待结果。
     
     Args:
         state: 当前状态
@@ -152,28 +527,62 @@ def create_video(state: AgentState) -> AgentState:
     logger.info("开始创建视频")
     state["current_step"] = "creating_video"
     
+    if _restored(state, "create", "video_job_id"):
+        return state
+    
     try:
-        generator = VideoGenerator()
-        
-        prompt_text = state.get("prompt_text", "")
-        if not prompt_text:
-            raise ValueError("没有提示词")
-        
-        # 生成视频
-        video_url = generator.generate_video(prompt_text)
-        
-        state["video_url"] = video_url
-        state["messages"].append("视频创建完成")
+        generator = get_tool(VideoGenerator)
+        job_id = generator.submit_video(_prompt_text(state), task_id=state.get("task_id"))
+        _apply_video_job(state, job_id)
+    except Exception as e:
+        _fail(state, "视频创建", e)
+    
+    state["updated_at"] = datetime.now()
+    return state
+
+
+async def acreate_video(state: AgentState) -> AgentState:
+    """提交视频生成任务（异步）
+    
+    Args:
+        state: 当前状态
         
+    Returns:
+        更新后的状态
+    """
+    logger.info("开始创建视频")
+    state["current_step"] = "creating_video"
+    
+    if _restored(state, "create", "video_job_id"):
+        return state
+    
+    try:
+        # 提交和检查点都是本地SQLite写入，放到线程中避免阻塞事件循环
+        generator = get_tool(VideoGenerator)
+        job_id = await asyncio.to_thread(
+            generator.submit_video, _prompt_text(state), task_id=state.get("task_id")
+        )
+        await asyncio.to_thread(_apply_video_job, state, job_id)
     except Exception as e:
-        logger.error(f"视频创建失败: {str(e)}")
-        state["error"] = str(e)
-        state["messages"].append(f"视频创建失败: {str(e)}")
+        _fail(state, "视频创建", e)
     
     state["updated_at"] = datetime.now()
     return state
 
 
+def _prompt_text(state: AgentState) -> str:
+    prompt_text = state.get("prompt_text", "")
+    if not prompt_text:
+        raise ValueError("没有提示词")
+    return prompt_text
+
+
+def _apply_video_job(state: AgentState, job_id: str):
+    state["video_job_id"] = job_id
+    state["messages"].append("视频生成任务已提交")
+    _save_checkpoint(state, "create", "video_job_id")
+
+
 def format_output(state: AgentState) -> AgentState:
     """格式化输出结果
     
@@ -1,9 +1,23 @@
 """Agent状态定义"""
 
-from typing import TypedDict, Optional, List, Dict, Any
+from typing import Annotated, TypedDict, Optional, List, Dict, Any
 from datetime import datetime
 
 
+def merge_video_analyses(
+    left: Optional[List[Dict[str, Any]]],
+    right: Optional[List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """按BV号合并并行分析结果
+    
+    合并是幂等的：节点返回完整状态时不会重复累加已有结果。
+    """
+    merged = {item.get("bvid"): item for item in left or []}
+    for item in right or []:
+        merged[item.get("bvid")] = item
+    return list(merged.values())
+
+
 class AgentState(TypedDict, total=False):
     """Agent执行状态"""
     
@@ -20,11 +34,13 @@ class AgentState(TypedDict, total=False):
     # 分析结果
     video_insights: Optional[Dict[str, Any]]
     comments_analysis: Optional[Dict[str, Any]]
+    video_analyses: Annotated[List[Dict[str, Any]], merge_video_analyses]
     
     # 生成内容
     prompt_text: str
     prompt_json: Optional[Dict[str, Any]]
     video_url: Optional[str]
+    video_job_id: Optional[str]
     
     # 执行状态
     current_step: str
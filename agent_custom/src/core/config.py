@@ -25,6 +25,13 @@ class LLMProviderConfig(BaseSettings):
     default_model: str = ""
 
 
+class BreakerConfig(BaseSettings):
+    """Circuit breaker configuration."""
+    
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+
+
 class LLMConfig(BaseSettings):
     """LLM configuration."""
     
@@ -32,6 +39,23 @@ class LLMConfig(BaseSettings):
     temperature: float = 0.0
     max_tokens: int = 4096
     providers: Dict[str, dict] = Field(default_factory=dict)
+    key_strategy: str = "round_robin"
+    key_cooldown: int = 60
+    rate_limit: float = 1.0
+    rate_burst: int = 5
+    breaker: BreakerConfig = Field(default_factory=BreakerConfig)
+
+
+class TrackerConfig(BaseSettings):
+    """Background hotspot tracker configuration."""
+    
+    enabled: bool = False
+    interval: int = 600
+    max_age: int = 1800
+    retention_days: int = 7
+    smoothing: float = 0.5
+    max_idle_intervals: int = 12
+    max_keywords: int = 200
 
 
 class HotspotConfig(BaseSettings):
@@ -40,6 +64,7 @@ class HotspotConfig(BaseSettings):
     keywords: List[str] = Field(default_factory=lambda: ["AI", "technology"])
     lookback_days: int = 7
     top_k: int = 10
+    max_concurrency: int = 5
     score_weights: Dict[str, float] = Field(
         default_factory=lambda: {
             "views": 0.1,
@@ -50,6 +75,75 @@ class HotspotConfig(BaseSettings):
             "duration_weight": 0.25,
         }
     )
+    tracker: TrackerConfig = Field(default_factory=TrackerConfig)
+
+
+class AnalysisConfig(BaseSettings):
+    """Video analysis configuration."""
+    
+    fanout_top_n: int = 3
+    max_concurrency: int = 3
+    comment_page_size: int = 20
+    comment_max_pages: int = 5
+    comment_concurrency: int = 3
+    tokenizer: str = "auto"
+
+
+class BilibiliConfig(BaseSettings):
+    """Bilibili API client configuration."""
+    
+    api_base: str = "https://api.bilibili.com"
+    timeout: int = 10
+    pool_size: int = 20
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    rate_limit: float = 5.0
+    rate_burst: int = 1
+    breaker: BreakerConfig = Field(default_factory=BreakerConfig)
+
+
+class PromptCacheConfig(BaseSettings):
+    """LLM prompt result cache configuration."""
+    
+    enabled: bool = True
+    max_entries: int = 512
+    ttl: int = 86400
+
+
+class CacheConfig(BaseSettings):
+    """API response cache configuration."""
+    
+    enabled: bool = True
+    max_entries: int = 2048
+    persist: bool = False
+    default_ttl: int = 60
+    ttl: Dict[str, int] = Field(
+        default_factory=lambda: {
+            "/x/web-interface/search/type": 60,
+            "/x/web-interface/view": 600,
+            "/x/v2/reply": 300,
+        }
+    )
+    prompt: PromptCacheConfig = Field(default_factory=PromptCacheConfig)
+
+
+class VideoConfig(BaseSettings):
+    """Video generation and download configuration."""
+    
+    max_size_mb: int = 500
+    supported_formats: List[str] = Field(default_factory=lambda: ["mp4", "webm", "mkv"])
+    download_timeout: int = 600
+    download_attempts: int = 3
+    backend: str = "auto"
+    model: str = "veo-2.0-generate-001"
+    api_base: str = "https://generativelanguage.googleapis.com/v1beta"
+    aspect_ratio: str = "16:9"
+    max_concurrent: int = 2
+    poll_interval: float = 5.0
+    max_poll_interval: float = 60.0
+    poll_backoff: float = 1.5
+    timeout: int = 1800
+    wait_timeout: int = 600
 
 
 class TaskConfig(BaseSettings):
@@ -58,8 +152,16 @@ class TaskConfig(BaseSettings):
     max_concurrent: int = 5
     max_retries: int = 2
     retry_delay: int = 3
+    progress_interval: float = 0.3
+    poll_interval: int = 30
+    stream_timeout: int = 300
     cleanup_interval: int = 3600
     history_size: int = 100
+    max_age: int = 604800
+    store_backend: str = "sqlite"
+    store_path: Optional[str] = None
+    max_batch_size: int = 100
+    lease_timeout: int = 120
 
 
 class Settings(BaseSettings):
@@ -93,6 +195,15 @@ class Settings(BaseSettings):
     videos_dir: Path = Path("./data/videos")
     logs_dir: Path = Path("./logs")
     
+    # Nested configs
+    llm: LLMConfig = Field(default_factory=LLMConfig)
+    hotspot: HotspotConfig = Field(default_factory=HotspotConfig)
+    analysis: AnalysisConfig = Field(default_factory=AnalysisConfig)
+    bilibili: BilibiliConfig = Field(default_factory=BilibiliConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    tasks: TaskConfig = Field(default_factory=TaskConfig)
+    video: VideoConfig = Field(default_factory=VideoConfig)
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._load_yaml_config()
@@ -110,6 +221,27 @@ class Settings(BaseSettings):
                     self.api_host = config_data["server"].get("host", self.api_host)
                     self.api_port = config_data["server"].get("port", self.api_port)
                     self.debug = config_data["server"].get("reload", self.debug)
+                
+                if "llm" in config_data:
+                    self.llm = LLMConfig(**config_data["llm"])
+                
+                if "hotspot" in config_data:
+                    self.hotspot = HotspotConfig(**config_data["hotspot"])
+                
+                if "analysis" in config_data:
+                    self.analysis = AnalysisConfig(**config_data["analysis"])
+                
+                if "bilibili" in config_data:
+                    self.bilibili = BilibiliConfig(**config_data["bilibili"])
+                
+                if "cache" in config_data:
+                    self.cache = CacheConfig(**config_data["cache"])
+                
+                if "tasks" in config_data:
+                    self.tasks = TaskConfig(**config_data["tasks"])
+                
+                if "video" in config_data:
+                    self.video = VideoConfig(**config_data["video"])
     
     def _ensure_directories(self):
         """Create necessary directories if they don't exist."""
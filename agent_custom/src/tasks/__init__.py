@@ -0,0 +1,18 @@
+"""任务管理模块"""
+
+from .batch import BatchScheduler, build_task
+from .events import EventBus, format_sse
+from .executor import TaskExecutor
+from .store import TaskStore, MemoryTaskStore, SQLiteTaskStore, create_task_store
+
+__all__ = [
+    "BatchScheduler",
+    "build_task",
+    "EventBus",
+    "format_sse",
+    "TaskExecutor",
+    "TaskStore",
+    "MemoryTaskStore",
+    "SQLiteTaskStore",
+    "create_task_store"
+]
@@ -0,0 +1,215 @@
+"""批量任务提交"""
+
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .executor import TaskExecutor
+from .store import TASK_STATUSES, TaskStore
+from ..agent.checkpoint import get_checkpoint_store
+from ..tools.hotspot import HotspotFinder
+from ..tools.registry import get_tool
+from ..core.config import get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+DEFAULT_KEYWORDS = ["AI", "科技"]
+
+# 工作流支持的任务类型
+TASK_TYPES = ("complete", "hotspot", "analyze", "generate")
+
+# 需要查找热点的任务类型
+SEARCH_TASK_TYPES = ("hotspot",)
+
+
+def build_task(
+    task_type: str = "complete",
+    keywords: Optional[List[str]] = None,
+    user_input: str = "",
+    **fields
+) -> Dict[str, Any]:
+    """创建待执行的任务记录
+    
+    Args:
+        task_type: 任务类型
+        keywords: 关键词列表，为空时使用默认关键词
+        user_input: 用户输入
+        **fields: 其他字段（例如 batch_id）
+    
+    Returns:
+        任务记录
+    """
+    keywords = [k.strip() for k in keywords or [] if k and k.strip()] or list(DEFAULT_KEYWORDS)
+    now = datetime.now()
+    
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"任务 - {', '.join(keywords[:3])}",
+        "description": user_input or "自动生成视频",
+        "status": "pending",
+        "task_type": task_type,
+        "keywords": keywords,
+        "user_input": user_input,
+        "created_at": now,
+        "updated_at": now,
+        "result": None,
+        "error": None,
+        **fields
+    }
+
+
+class BatchScheduler:
+    """批量任务调度器
+    
+    一个批次内所有热点任务的关键词合并去重后只搜索一次，按各任务的
+    关键词组合分别排序，作为 ``find_hotspots`` 检查点写入后再提交执行，
+    工作流恢复时直接复用搜索结果。N 个任务 × K 个关键词的搜索变为
+    去重后的关键词数次搜索。
+    
+    批次本身不单独保存：任务记录带有 ``batch_id``，批次进度从任务存储
+    查询，多进程共享，并随历史任务一起清理。
+    """
+    
+    def __init__(
+        self,
+        executor: TaskExecutor,
+        store: TaskStore,
+        finder_factory: Optional[Callable[[], HotspotFinder]] = None
+    ):
+        self.executor = executor
+        self.store = store
+        self.finder_factory = finder_factory or (lambda: get_tool(HotspotFinder))
+    
+    def submit(self, specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """创建批次并在后台执行
+        
+        Args:
+            specs: 任务参数列表，每项包含 task_type、keywords、user_input
+        
+        Returns:
+            批次信息（含进度）
+        """
+        batch_id = uuid.uuid4().hex
+        tasks = [
+            build_task(
+                spec.get("task_type", "complete"),
+                spec.get("keywords"),
+                spec.get("user_input", ""),
+                batch_id=batch_id
+            )
+            for spec in specs
+        ]
+        
+        for task in tasks:
+            self.store[task["id"]] = task
+        
+        search_keywords = _search_keywords(tasks)
+        
+        threading.Thread(
+            target=self._run,
+            args=(batch_id, tasks, search_keywords),
+            name=f"batch-{batch_id[:8]}",
+            daemon=True
+        ).start()
+        
+        logger.info(f"批次 {batch_id} 已创建: {len(tasks)} 个任务, {len(search_keywords)} 个关键词")
+        return self.get(batch_id)
+    
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """获取批次进度
+        
+        Args:
+            batch_id: 批次ID
+        
+        Returns:
+            批次信息，``counts`` 为各状态任务数，``progress`` 为已结束比例；
+            批次不存在或任务已全部被清理时返回None
+        """
+        tasks = self.store.batch(batch_id)
+        if not tasks:
+            return None
+        
+        keywords = _search_keywords(tasks)
+        counts = Counter(task.get("status", "pending") for task in tasks)
+        total = len(tasks)
+        finished = counts["completed"] + counts["failed"]
+        
+        return {
+            "id": batch_id,
+            "task_ids": [task["id"] for task in tasks],
+            "keywords": keywords,
+            "searches": len(keywords),
+            "created_at": tasks[0].get("created_at"),
+            "total": total,
+            "counts": {status: counts.get(status, 0) for status in TASK_STATUSES},
+            "progress": finished / total,
+            "done": finished == total,
+        }
+    
+    def _run(self, batch_id: str, tasks: List[Dict[str, Any]], keywords: List[str]):
+        """合并搜索后提交批次内的任务（后台线程）"""
+        finder: Optional[HotspotFinder] = None
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        
+        if keywords:
+            try:
+                finder = self.finder_factory()
+                results = finder.search_keywords(keywords, settings.hotspot.lookback_days)
+            except Exception as e:
+                # 搜索失败时由各任务自行搜索
+                logger.error(f"批次 {batch_id} 合并搜索失败: {str(e)}")
+        
+        # 单个任务出错不影响批次内其余任务的提交
+        for task in tasks:
+            resume = False
+            
+            if results and task["task_type"] in SEARCH_TASK_TYPES:
+                try:
+                    resume = self._save_hotspots(task, finder, results)
+                except Exception as e:
+                    # 写入检查点失败时由任务自行搜索
+                    logger.error(f"任务 {task['id']} 复用批次搜索结果失败: {str(e)}")
+            
+            try:
+                self.executor.submit(task["id"], resume=resume)
+            except Exception as e:
+                logger.error(f"任务 {task['id']} 提交失败: {str(e)}", exc_info=True)
+                self._fail(task["id"], f"提交失败: {str(e)}")
+    
+    def _save_hotspots(
+        self,
+        task: Dict[str, Any],
+        finder: HotspotFinder,
+        results: Dict[str, List[Dict[str, Any]]]
+    ) -> bool:
+        """把任务的热点排名写入 ``find_hotspots`` 检查点，返回是否写入"""
+        hotspots = finder.rank_results(task["keywords"], results, top_k=settings.hotspot.top_k)
+        if not hotspots:
+            return False
+        
+        get_checkpoint_store().save(task["id"], "find_hotspots", {
+            "hotspot_videos": hotspots,
+            "selected_video": hotspots[0],
+        })
+        return True
+    
+    def _fail(self, task_id: str, error: str):
+        task = self.store.get(task_id)
+        if task is None:
+            return
+        
+        task.update(status="failed", error=error, updated_at=datetime.now())
+        self.store[task_id] = task
+
+
+def _search_keywords(tasks: List[Dict[str, Any]]) -> List[str]:
+    """批次内需要搜索的关键词（按出现顺序去重）"""
+    return list(dict.fromkeys(
+        keyword
+        for task in tasks if task["task_type"] in SEARCH_TASK_TYPES
+        for keyword in task["keywords"]
+    ))
@@ -0,0 +1,77 @@
+"""任务事件总线"""
+
+import queue
+import threading
+from typing import List, Tuple
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+Event = Tuple[str, str]
+
+
+class EventBus:
+    """进程内事件总线
+    
+    每个订阅者（例如一个SSE连接）拥有独立的有界队列，
+    消费过慢的订阅者会丢弃新事件而不是阻塞发布者。
+    """
+    
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: List["queue.Queue[Event]"] = []
+        self._lock = threading.Lock()
+    
+    def subscribe(self) -> "queue.Queue[Event]":
+        """订阅事件
+        
+        Returns:
+            接收 (事件名, 数据) 的队列
+        """
+        subscriber: "queue.Queue[Event]" = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: "queue.Queue[Event]"):
+        """取消订阅"""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+    
+    def has_subscribers(self) -> bool:
+        """是否有订阅者（没有时发布方可跳过渲染）"""
+        with self._lock:
+            return bool(self._subscribers)
+    
+    def publish(self, event: str, data: str):
+        """发布事件
+        
+        Args:
+            event: 事件名
+            data: 事件数据
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                logger.warning(f"事件订阅者队列已满，丢弃事件: {event}")
+
+
+def format_sse(event: str, data: str) -> str:
+    """格式化为Server-Sent Events消息
+    
+    Args:
+        event: 事件名
+        data: 事件数据（多行数据会拆成多个 data 字段）
+        
+    Returns:
+        SSE消息文本
+    """
+    lines = [f"event: {event}"]
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
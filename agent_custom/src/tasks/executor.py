@@ -0,0 +1,215 @@
+"""后台任务执行器"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, MutableMapping, Optional
+
+from ..agent.checkpoint import get_checkpoint_store
+from ..agent.graph import run_agent
+from .store import TaskStore
+from ..core.config import get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class TaskExecutor:
+    """任务执行器
+
+    在有界线程池中执行工作流图，请求线程只负责入队。
+    并发数、重试次数和重试间隔默认取自 ``TaskConfig``。
+    
+    使用 ``TaskStore`` 时，入队的任务持有本执行器的租约，后台心跳线程
+    每 ``lease_timeout / 4`` 秒续期，并接管其他进程退出后遗留的过期任务
+    （从检查点恢复重新执行）。
+    """
+    
+    def __init__(
+        self,
+        graph: Any,
+        store: MutableMapping[str, Dict[str, Any]],
+        max_workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ):
+        config = settings.tasks
+        
+        self.graph = graph
+        self.store = store
+        self.max_workers = max_workers or config.max_concurrent
+        self.max_retries = config.max_retries if max_retries is None else max_retries
+        self.retry_delay = config.retry_delay if retry_delay is None else retry_delay
+        self.progress_interval = config.progress_interval
+        self.lease_timeout = config.lease_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="task-worker"
+        )
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+    
+    def submit(self, task_id: str, resume: bool = False) -> Future:
+        """提交任务到后台执行
+        
+        Args:
+            task_id: 任务ID（任务需已写入存储）
+            resume: 是否从检查点恢复（用于重试失败的任务）
+            
+        Returns:
+            任务的Future对象
+        """
+        if isinstance(self.store, TaskStore):
+            self.store.renew([task_id], self.owner, self.lease_timeout)
+        
+        future = self._pool.submit(self._run, task_id, resume)
+        
+        with self._lock:
+            self._futures[task_id] = future
+        future.add_done_callback(lambda _: self._forget(task_id))
+        
+        logger.info(f"任务 {task_id} 已入队")
+        return future
+    
+    def active_count(self) -> int:
+        """获取排队和执行中的任务数"""
+        with self._lock:
+            return len(self._futures)
+    
+    def start(self):
+        """接管过期任务并启动租约心跳线程"""
+        if not isinstance(self.store, TaskStore):
+            return
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        
+        self.recover()
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="task-lease", daemon=True)
+        self._heartbeat.start()
+    
+    def recover(self) -> int:
+        """接管租约已过期的未结束任务并重新入队
+        
+        Returns:
+            接管的任务数
+        """
+        claimed = self.store.claim_expired(self.owner, self.lease_timeout)
+        
+        with self._lock:
+            # 自己仍在执行的任务只是续期不及时，不重复入队
+            claimed = [task_id for task_id in claimed if task_id not in self._futures]
+        
+        for task_id in claimed:
+            logger.warning(f"任务 {task_id} 的执行进程已退出，重新入队")
+            self.submit(task_id, resume=True)
+        return len(claimed)
+    
+    def shutdown(self, wait: bool = True):
+        """关闭执行器
+        
+        Args:
+            wait: 是否等待已提交任务执行完成
+        """
+        self._stop.set()
+        self._pool.shutdown(wait=wait)
+    
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_timeout / 4):
+            try:
+                with self._lock:
+                    task_ids = list(self._futures)
+                self.store.renew(task_ids, self.owner, self.lease_timeout)
+                self.recover()
+            except Exception as e:
+                logger.error(f"任务租约续期失败: {str(e)}", exc_info=True)
+    
+    def _forget(self, task_id: str):
+        with self._lock:
+            self._futures.pop(task_id, None)
+    
+    def _run(self, task_id: str, resume: bool = False):
+        """执行单个任务（工作线程）
+        
+        自动重试时从检查点恢复，已成功的节点不会重复执行。
+        """
+        task = self.store.get(task_id)
+        if task is None:
+            logger.warning(f"任务 {task_id} 不存在，跳过执行")
+            return
+        
+        self._update(task_id, status="running")
+        
+        try:
+            attempts = 0
+            while True:
+                attempts += 1
+                result = run_agent(
+                    self.graph,
+                    user_input=task.get("user_input", ""),
+                    task_type=task.get("task_type", "complete"),
+                    task_id=task_id,
+                    keywords=task.get("keywords", []),
+                    on_token=self._progress_callback(task_id),
+                    resume=resume or attempts > 1
+                )
+                
+                # 节点自行捕获异常并写入 error，工作流仍会走到 format_output
+                succeeded = bool(result.get("completed") and not result.get("error"))
+                if succeeded or attempts > self.max_retries:
+                    break
+                
+                logger.warning(
+                    f"任务 {task_id} 第 {attempts} 次执行失败，"
+                    f"{self.retry_delay} 秒后重试"
+                )
+                time.sleep(self.retry_delay)
+            
+            self._update(
+                task_id,
+                status="completed" if succeeded else "failed",
+                result=result,
+                error=result.get("error"),
+                attempts=attempts
+            )
+            
+            # 成功后检查点不再需要；失败时保留供重试复用
+            if succeeded:
+                get_checkpoint_store().clear(task_id)
+            
+        except Exception as e:
+            logger.error(f"任务执行失败: {str(e)}", exc_info=True)
+            self._update(task_id, status="failed", error=str(e))
+    
+    def _progress_callback(self, task_id: str) -> Callable[[str], None]:
+        """创建提示词流式输出回调，按 ``progress_interval`` 节流写入任务记录"""
+        last_write = 0.0
+        
+        def on_token(text: str):
+            nonlocal last_write
+            now = time.monotonic()
+            if now - last_write < self.progress_interval:
+                return
+            last_write = now
+            self._update(task_id, partial_prompt=text)
+        
+        return on_token
+    
+    def _update(self, task_id: str, **fields):
+        """更新任务记录并写回存储"""
+        task = self.store.get(task_id)
+        if task is None:
+            return
+        
+        task.update(fields)
+        task["updated_at"] = datetime.now()
+        self.store[task_id] = task
@@ -0,0 +1,566 @@
+"""任务存储"""
+
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from collections import Counter
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from ..core.config import TaskConfig, get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# 已结束、可被清理的任务状态
+FINISHED_STATUSES = ("completed", "failed")
+
+# 未结束、由执行器租约保护的任务状态
+ACTIVE_STATUSES = ("pending", "running")
+
+# 统计展示的任务状态
+TASK_STATUSES = ("pending", "running", "completed", "failed")
+
+
+def _created_at(task: Dict[str, Any]) -> datetime:
+    created_at = task.get("created_at")
+    return created_at if isinstance(created_at, datetime) else datetime.min
+
+
+def _updated_at(task: Dict[str, Any]) -> datetime:
+    updated_at = task.get("updated_at")
+    return updated_at if isinstance(updated_at, datetime) else _created_at(task)
+
+
+def _stats_from_counts(counts: Mapping[str, int]) -> Dict[str, int]:
+    stats = {status: counts.get(status, 0) for status in TASK_STATUSES}
+    stats["total"] = sum(counts.values())
+    return stats
+
+
+class TaskStore(MutableMapping):
+    """任务存储抽象基类
+    
+    提供与 ``dict`` 相同的接口（``task_id -> task``），路由和执行器无需
+    关心具体后端。写入后按 ``cleanup_interval`` 周期性清理历史任务：
+    只保留最近 ``history_size`` 个已结束任务，并删除超过 ``max_age``
+    秒的已结束任务。
+    
+    未结束的任务由执行器持有租约（``owner`` + 到期时间）并定期续期。
+    进程重启或被回收后租约不再续期，到期的任务可由其他执行器接管。
+    
+    注意：读取返回的是任务副本，修改后需要重新赋值写回。
+    """
+    
+    def __init__(self, config: Optional[TaskConfig] = None):
+        self.config = config or settings.tasks
+        self._last_cleanup = time.monotonic()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """注册任务变更监听器，每次写入任务后调用
+        
+        Args:
+            listener: 接收任务副本的回调
+        """
+        self._listeners.append(listener)
+    
+    def _notify(self, task: Dict[str, Any]):
+        for listener in self._listeners:
+            try:
+                listener(dict(task))
+            except Exception as e:
+                logger.error(f"任务变更监听器执行失败: {str(e)}")
+    
+    def values(self) -> List[Dict[str, Any]]:
+        """获取所有任务（按创建时间排序）"""
+        return [self[task_id] for task_id in self]
+    
+    @abstractmethod
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取最新创建的任务
+        
+        Args:
+            limit: 返回数量
+            
+        Returns:
+            按创建时间倒序的任务列表
+        """
+    
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """获取各状态任务数（含 total）"""
+    
+    @abstractmethod
+    def batch(self, batch_id: str) -> List[Dict[str, Any]]:
+        """获取同一批次的任务
+        
+        Args:
+            batch_id: 批次ID
+            
+        Returns:
+            按创建时间排序的任务列表（已被清理的任务不在其中）
+        """
+    
+    @abstractmethod
+    def version(self) -> int:
+        """获取存储版本号，任何写入或删除都会使其递增"""
+    
+    def maybe_evict(self):
+        """距上次清理超过 ``cleanup_interval`` 时执行清理"""
+        if time.monotonic() - self._last_cleanup < self.config.cleanup_interval:
+            return
+        
+        self._last_cleanup = time.monotonic()
+        try:
+            removed = self.evict()
+            if removed:
+                logger.info(f"已清理 {removed} 个历史任务")
+        except Exception as e:
+            logger.error(f"清理历史任务失败: {str(e)}")
+    
+    @abstractmethod
+    def evict(self) -> int:
+        """清理历史任务
+        
+        Returns:
+            删除的任务数
+        """
+    
+    @abstractmethod
+    def renew(self, task_ids: List[str], owner: str, ttl: float):
+        """为任务设置或续期租约
+        
+        Args:
+            task_ids: 任务ID列表
+            owner: 租约持有者（执行器标识）
+            ttl: 租约有效秒数
+        """
+    
+    @abstractmethod
+    def claim_expired(self, owner: str, ttl: float) -> List[str]:
+        """接管租约已过期的未结束任务
+        
+        没有租约的任务（已创建但尚未入队）在 ``updated_at`` 超过 ``ttl``
+        秒后同样视为过期。多个进程同时接管时每个任务只会被一个进程取得。
+        
+        Args:
+            owner: 新的租约持有者
+            ttl: 新租约有效秒数
+            
+        Returns:
+            接管的任务ID列表
+        """
+
+
+class MemoryTaskStore(TaskStore):
+    """内存任务存储（单进程）
+    
+    增量维护按创建时间排序的索引和各状态计数，列表和统计查询
+    不需要遍历全部任务。
+    """
+    
+    def __init__(self, config: Optional[TaskConfig] = None):
+        super().__init__(config)
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._order: List[Tuple[datetime, str]] = []
+        self._counts: Counter = Counter()
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._version = 0
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._tasks[task_id])
+    
+    def __setitem__(self, task_id: str, task: Dict[str, Any]):
+        with self._lock:
+            if task_id in self._tasks:
+                self._remove(task_id)
+            
+            task = dict(task)
+            self._tasks[task_id] = task
+            bisect.insort(self._order, (_created_at(task), task_id))
+            self._counts[task.get("status", "pending")] += 1
+            self._version += 1
+        self._notify(task)
+        self.maybe_evict()
+    
+    def __delitem__(self, task_id: str):
+        with self._lock:
+            if task_id not in self._tasks:
+                raise KeyError(task_id)
+            self._remove(task_id)
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter([task_id for _, task_id in self._order])
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+    
+    def values(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(self._tasks[task_id]) for _, task_id in self._order]
+    
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                dict(self._tasks[task_id])
+                for _, task_id in reversed(self._order[-limit:])
+            ]
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return _stats_from_counts(self._counts)
+    
+    def batch(self, batch_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                dict(self._tasks[task_id])
+                for _, task_id in self._order
+                if self._tasks[task_id].get("batch_id") == batch_id
+            ]
+    
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+    
+    def evict(self) -> int:
+        cutoff = datetime.now() - timedelta(seconds=self.config.max_age)
+        expired = []
+        
+        with self._lock:
+            finished = 0
+            for created_at, task_id in reversed(self._order):
+                if self._tasks[task_id].get("status") not in FINISHED_STATUSES:
+                    continue
+                finished += 1
+                if finished > self.config.history_size or created_at < cutoff:
+                    expired.append(task_id)
+            
+            for task_id in expired:
+                self._remove(task_id)
+        
+        return len(expired)
+    
+    def renew(self, task_ids: List[str], owner: str, ttl: float):
+        expires_at = time.time() + ttl
+        with self._lock:
+            for task_id in task_ids:
+                if task_id in self._tasks:
+                    self._leases[task_id] = (owner, expires_at)
+    
+    def claim_expired(self, owner: str, ttl: float) -> List[str]:
+        now = time.time()
+        stale = datetime.now() - timedelta(seconds=ttl)
+        claimed = []
+        
+        with self._lock:
+            for task_id, task in self._tasks.items():
+                if task.get("status", "pending") not in ACTIVE_STATUSES:
+                    continue
+                
+                lease = self._leases.get(task_id)
+                expired = lease[1] < now if lease else _updated_at(task) < stale
+                if expired:
+                    self._leases[task_id] = (owner, now + ttl)
+                    claimed.append(task_id)
+        
+        return claimed
+    
+    def _remove(self, task_id: str):
+        """从数据和索引中删除任务（需持有锁）"""
+        task = self._tasks.pop(task_id)
+        self._leases.pop(task_id, None)
+        
+        entry = (_created_at(task), task_id)
+        index = bisect.bisect_left(self._order, entry)
+        if index < len(self._order) and self._order[index] == entry:
+            del self._order[index]
+        
+        status = task.get("status", "pending")
+        self._counts[status] -= 1
+        if self._counts[status] <= 0:
+            del self._counts[status]
+        
+        self._version += 1
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def _timestamp(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value or datetime.now().isoformat())
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite任务存储
+    
+    使用WAL模式，多个工作进程可以共享同一个数据库文件。
+    每个线程使用独立连接。批次ID单独存一列并建索引，批次进度直接
+    从任务表查询。各状态计数和存储版本号由触发器维护在
+    ``task_counts`` 和 ``task_meta`` 表中。租约存在 ``lease_owner`` 和
+    ``lease_expires_at`` 列，续期不改变存储版本号。
+    """
+    
+    def __init__(self, path: Path, config: Optional[TaskConfig] = None):
+        super().__init__(config)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL,
+                batch_id TEXT,
+                lease_owner TEXT,
+                lease_expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+            CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+            
+            CREATE TABLE IF NOT EXISTS task_counts (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TRIGGER IF NOT EXISTS tasks_count_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO task_counts (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_count_delete AFTER DELETE ON tasks BEGIN
+                UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_count_update AFTER UPDATE OF status ON tasks
+            WHEN OLD.status <> NEW.status BEGIN
+                UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+                INSERT INTO task_counts (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END;
+            
+            CREATE TABLE IF NOT EXISTS task_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO task_meta (key, value) VALUES ('version', 0);
+            CREATE TRIGGER IF NOT EXISTS tasks_version_insert AFTER INSERT ON tasks BEGIN
+                UPDATE task_meta SET value = value + 1 WHERE key = 'version';
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_version_update
+            AFTER UPDATE OF status, created_at, updated_at, data, batch_id ON tasks BEGIN
+                UPDATE task_meta SET value = value + 1 WHERE key = 'version';
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_version_delete AFTER DELETE ON tasks BEGIN
+                UPDATE task_meta SET value = value + 1 WHERE key = 'version';
+            END;
+        """)
+        
+        # 旧版本数据库没有 batch_id 列
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if "batch_id" not in columns:
+            conn.execute("ALTER TABLE tasks ADD COLUMN batch_id TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_batch_id ON tasks(batch_id)")
+        
+        # 旧版本数据库没有租约列，版本号触发器也会在续期时递增
+        if "lease_owner" not in columns:
+            conn.executescript("""
+                ALTER TABLE tasks ADD COLUMN lease_owner TEXT;
+                ALTER TABLE tasks ADD COLUMN lease_expires_at REAL;
+                DROP TRIGGER IF EXISTS tasks_version_update;
+                CREATE TRIGGER tasks_version_update
+                AFTER UPDATE OF status, created_at, updated_at, data, batch_id ON tasks BEGIN
+                    UPDATE task_meta SET value = value + 1 WHERE key = 'version';
+                END;
+            """)
+        
+        # 启动时按现有数据重建计数
+        with conn:
+            conn.execute("DELETE FROM task_counts")
+            conn.execute(
+                "INSERT INTO task_counts (status, count) "
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            )
+    
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        row = self._conn().execute(
+            "SELECT data FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(task_id)
+        return json.loads(row[0], object_hook=_decode)
+    
+    def __setitem__(self, task_id: str, task: Dict[str, Any]):
+        conn = self._conn()
+        with conn:
+            # 使用UPSERT而非REPLACE，保证计数触发器正确执行
+            conn.execute(
+                "INSERT INTO tasks (id, status, created_at, updated_at, data, batch_id) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, "
+                "created_at = excluded.created_at, updated_at = excluded.updated_at, "
+                "data = excluded.data, batch_id = excluded.batch_id",
+                (
+                    task_id,
+                    task.get("status", "pending"),
+                    _timestamp(task.get("created_at")),
+                    _timestamp(task.get("updated_at")),
+                    json.dumps(task, ensure_ascii=False, default=_encode),
+                    task.get("batch_id")
+                )
+            )
+        self._notify(task)
+        self.maybe_evict()
+    
+    def __delitem__(self, task_id: str):
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(task_id)
+    
+    def __contains__(self, task_id: object) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone() is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        rows = self._conn().execute("SELECT id FROM tasks ORDER BY created_at").fetchall()
+        return iter([row[0] for row in rows])
+    
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    
+    def values(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT data FROM tasks ORDER BY created_at").fetchall()
+        return [json.loads(row[0], object_hook=_decode) for row in rows]
+    
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT data FROM tasks ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(row[0], object_hook=_decode) for row in rows]
+    
+    def stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, count FROM task_counts").fetchall()
+        return _stats_from_counts(dict(rows))
+    
+    def batch(self, batch_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT data FROM tasks WHERE batch_id = ? ORDER BY created_at", (batch_id,)
+        ).fetchall()
+        return [json.loads(row[0], object_hook=_decode) for row in rows]
+    
+    def version(self) -> int:
+        return self._conn().execute(
+            "SELECT value FROM task_meta WHERE key = 'version'"
+        ).fetchone()[0]
+    
+    def evict(self) -> int:
+        cutoff = (datetime.now() - timedelta(seconds=self.config.max_age)).isoformat()
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                f"""
+                DELETE FROM tasks
+                WHERE status IN ({placeholders})
+                  AND (
+                    created_at < ?
+                    OR id NOT IN (
+                        SELECT id FROM tasks
+                        WHERE status IN ({placeholders})
+                        ORDER BY created_at DESC
+                        LIMIT ?
+                    )
+                  )
+                """,
+                (*FINISHED_STATUSES, cutoff, *FINISHED_STATUSES, self.config.history_size)
+            )
+        return cursor.rowcount
+    
+    def renew(self, task_ids: List[str], owner: str, ttl: float):
+        expires_at = time.time() + ttl
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "UPDATE tasks SET lease_owner = ?, lease_expires_at = ? WHERE id = ?",
+                [(owner, expires_at, task_id) for task_id in task_ids]
+            )
+    
+    def claim_expired(self, owner: str, ttl: float) -> List[str]:
+        now = time.time()
+        stale = (datetime.now() - timedelta(seconds=ttl)).isoformat()
+        expired = (
+            f"status IN ({', '.join('?' for _ in ACTIVE_STATUSES)}) "
+            f"AND (lease_expires_at < ? OR (lease_expires_at IS NULL AND updated_at < ?))"
+        )
+        params = (*ACTIVE_STATUSES, now, stale)
+        
+        conn = self._conn()
+        rows = conn.execute(f"SELECT id FROM tasks WHERE {expired}", params).fetchall()
+        
+        # 条件更新：其他进程已接管的任务 rowcount 为0
+        claimed = []
+        with conn:
+            for (task_id,) in rows:
+                cursor = conn.execute(
+                    f"UPDATE tasks SET lease_owner = ?, lease_expires_at = ? WHERE id = ? AND {expired}",
+                    (owner, now + ttl, task_id, *params)
+                )
+                if cursor.rowcount:
+                    claimed.append(task_id)
+        return claimed
+
+
+def create_task_store(config: Optional[TaskConfig] = None) -> TaskStore:
+    """根据配置创建任务存储
+    
+    Args:
+        config: 任务配置，默认使用全局配置
+        
+    Returns:
+        任务存储实例
+    """
+    config = config or settings.tasks
+    
+    if config.store_backend == "memory":
+        return MemoryTaskStore(config)
+    if config.store_backend == "sqlite":
+        path = Path(config.store_path) if config.store_path else settings.data_dir / "tasks.sqlite3"
+        return SQLiteTaskStore(path, config)
+    
+    raise ValueError(f"不支持的任务存储后端: {config.store_backend}")
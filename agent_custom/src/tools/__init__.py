@@ -3,11 +3,14 @@
 from .hotspot import HotspotFinder
 from .analyzer import VideoAnalyzer
 from .generator import PromptGenerator, VideoGenerator
+from .registry import get_tool, reset_tools
 
 __all__ = [
     "HotspotFinder",
     "VideoAnalyzer", 
     "PromptGenerator",
-    "VideoGenerator"
+    "VideoGenerator",
+    "get_tool",
+    "reset_tools"
 ]
 
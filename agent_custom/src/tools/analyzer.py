@@ -1,8 +1,11 @@
 """视频分析工具"""
 
-from typing import Dict, Any, List
-import requests
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from .bilibili import get_bilibili_client
+from .text import get_tokenizer, tfidf_keywords
 from ..core.config import get_settings
 from ..core.logger import get_logger
 
@@ -14,17 +17,86 @@ class VideoAnalyzer:
     """视频内容分析器"""
     
     def __init__(self):
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Cookie": settings.bili_cookie or ""
+        self.client = get_bilibili_client()
+        self.comment_page_size = settings.analysis.comment_page_size
+        self.comment_max_pages = settings.analysis.comment_max_pages
+        self.comment_concurrency = settings.analysis.comment_concurrency
+        self.tokenizer = get_tokenizer(settings.analysis.tokenizer)
+    
+    def analyze(self, video: Dict[str, Any], top_k: int = 50) -> Dict[str, Any]:
+        """分析视频内容和评论区
+        
+        每个视频只获取一次详情。搜索结果已带 aid 时，详情和评论并发获取；
+        否则先获取详情拿到 aid，再获取评论。
+        
+        Args:
+            video: 视频数据
+            top_k: 获取前K条评论
+            
+        Returns:
+            包含 insights 和 comments 的分析结果
+        """
+        bvid = video.get("bvid", "")
+        aid = video.get("aid")
+        
+        if aid:
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="analyzer") as pool:
+                detail_future = pool.submit(self._get_video_detail, bvid)
+                comments_future = pool.submit(self.analyze_comments, bvid, top_k, aid)
+                detail = detail_future.result()
+                comments = comments_future.result()
+        else:
+            detail = self._get_video_detail(bvid)
+            if detail.get("aid"):
+                comments = self.analyze_comments(bvid, top_k, aid=detail["aid"])
+            else:
+                comments = {"total": 0, "comments": []}
+        
+        return {
+            "insights": self.analyze_video(video, detail=detail),
+            "comments": comments
         }
-        self.api_base = "https://api.bilibili.com"
     
-    def analyze_video(self, video: Dict[str, Any]) -> Dict[str, Any]:
+    async def aanalyze(self, video: Dict[str, Any], top_k: int = 50) -> Dict[str, Any]:
+        """异步分析视频内容和评论区，行为与 ``analyze`` 相同
+        
+        Args:
+            video: 视频数据
+            top_k: 获取前K条评论
+            
+        Returns:
+            包含 insights 和 comments 的分析结果
+        """
+        bvid = video.get("bvid", "")
+        aid = video.get("aid")
+        
+        if aid:
+            detail, comments = await asyncio.gather(
+                self._aget_video_detail(bvid),
+                self.aanalyze_comments(bvid, top_k, aid)
+            )
+        else:
+            detail = await self._aget_video_detail(bvid)
+            if detail.get("aid"):
+                comments = await self.aanalyze_comments(bvid, top_k, aid=detail["aid"])
+            else:
+                comments = {"total": 0, "comments": []}
+        
+        return {
+            "insights": self.analyze_video(video, detail=detail),
+            "comments": comments
+        }
+    
+    def analyze_video(
+        self,
+        video: Dict[str, Any],
+        detail: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """分析视频内容
         
         Args:
             video: 视频数据
+            detail: 已获取的视频详情，为空时重新获取
             
         Returns:
             分析结果
@@ -35,38 +107,48 @@ class VideoAnalyzer:
         
         try:
             # 获取视频详情
-            detail = self._get_video_detail(bvid)
-            
-            # 提取关键信息
-            insights = {
-                "bvid": bvid,
-                "title": video.get("title", ""),
-                "description": video.get("description", ""),
-                "tags": detail.get("tags", []),
-                "duration": video.get("duration", 0),
-                "stats": {
-                    "view": detail.get("stat", {}).get("view", 0),
-                    "like": detail.get("stat", {}).get("like", 0),
-                    "coin": detail.get("stat", {}).get("coin", 0),
-                    "favorite": detail.get("stat", {}).get("favorite", 0),
-                    "share": detail.get("stat", {}).get("share", 0),
-                },
-                "author": video.get("author", ""),
-                "pubdate": video.get("pubdate", 0)
-            }
+            if detail is None:
+                detail = self._get_video_detail(bvid)
             
-            return insights
+            return self._build_insights(video, detail)
             
         except Exception as e:
             logger.error(f"视频分析失败: {str(e)}")
             return {}
     
-    def analyze_comments(self, bvid: str, top_k: int = 50) -> Dict[str, Any]:
+    def _build_insights(self, video: Dict[str, Any], detail: Dict[str, Any]) -> Dict[str, Any]:
+        """从搜索结果和视频详情中提取关键信息"""
+        stat = detail.get("stat", {})
+        
+        return {
+            "bvid": video.get("bvid", ""),
+            "title": video.get("title", ""),
+            "description": video.get("description", ""),
+            "tags": detail.get("tags", []),
+            "duration": video.get("duration", 0),
+            "stats": {
+                "view": stat.get("view", 0),
+                "like": stat.get("like", 0),
+                "coin": stat.get("coin", 0),
+                "favorite": stat.get("favorite", 0),
+                "share": stat.get("share", 0),
+            },
+            "author": video.get("author", ""),
+            "pubdate": video.get("pubdate", 0)
+        }
+    
+    def analyze_comments(
+        self,
+        bvid: str,
+        top_k: int = 50,
+        aid: Optional[int] = None
+    ) -> Dict[str, Any]:
         """分析评论区
         
         Args:
             bvid: 视频BV号
             top_k: 获取前K条评论
+            aid: 视频AV号，已知时跳过详情请求
             
         Returns:
             评论分析结果
@@ -74,37 +156,52 @@ class VideoAnalyzer:
         logger.info(f"分析评论: {bvid}")
         
         try:
-            comments = self._get_comments(bvid, top_k)
-            
-            if not comments:
-                return {"total": 0, "comments": []}
-            
-            # 提取热门评论
-            hot_comments = sorted(
-                comments,
-                key=lambda x: x.get("like", 0),
-                reverse=True
-            )[:10]
-            
-            analysis = {
-                "total": len(comments),
-                "hot_comments": [
-                    {
-                        "content": c.get("content", ""),
-                        "like": c.get("like", 0),
-                        "author": c.get("member", {}).get("uname", "")
-                    }
-                    for c in hot_comments
-                ],
-                "keywords": self._extract_keywords(comments)
-            }
-            
-            return analysis
-            
+            return self._summarize_comments(self._get_comments(bvid, top_k, aid=aid))
         except Exception as e:
             logger.error(f"评论分析失败: {str(e)}")
             return {}
     
+    async def aanalyze_comments(
+        self,
+        bvid: str,
+        top_k: int = 50,
+        aid: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """异步分析评论区，参数与 ``analyze_comments`` 相同"""
+        logger.info(f"分析评论: {bvid}")
+        
+        try:
+            return self._summarize_comments(await self._aget_comments(bvid, top_k, aid=aid))
+        except Exception as e:
+            logger.error(f"评论分析失败: {str(e)}")
+            return {}
+    
+    def _summarize_comments(self, comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """汇总评论：热门评论、关键词和评论原文（供多视频汇总时统一计算关键词）"""
+        if not comments:
+            return {"total": 0, "comments": []}
+        
+        # 提取热门评论
+        hot_comments = sorted(
+            comments,
+            key=lambda x: x.get("like", 0),
+            reverse=True
+        )[:10]
+        
+        return {
+            "total": len(comments),
+            "hot_comments": [
+                {
+                    "content": c.get("content", ""),
+                    "like": c.get("like", 0),
+                    "author": c.get("member", {}).get("uname", "")
+                }
+                for c in hot_comments
+            ],
+            "keywords": self._extract_keywords(comments),
+            "texts": [c.get("content", "") for c in comments]
+        }
+    
     def _get_video_detail(self, bvid: str) -> Dict[str, Any]:
         """获取视频详情
         
@@ -114,94 +211,219 @@ class VideoAnalyzer:
         Returns:
             视频详情
         """
-        url = f"{self.api_base}/x/web-interface/view"
-        params = {"bvid": bvid}
+        try:
+            data = self.client.get("/x/web-interface/view", {"bvid": bvid})
+        except Exception as e:
+            logger.error(f"请求失败: {str(e)}")
+            return {}
         
+        return self._parse_detail(data)
+    
+    async def _aget_video_detail(self, bvid: str) -> Dict[str, Any]:
+        """异步获取视频详情"""
         try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                return data.get("data", {})
-            else:
-                logger.warning(f"获取视频详情失败: {data.get('message')}")
-                return {}
-                
+            data = await self.client.aget("/x/web-interface/view", {"bvid": bvid})
         except Exception as e:
             logger.error(f"请求失败: {str(e)}")
             return {}
+        
+        return self._parse_detail(data)
     
-    def _get_comments(self, bvid: str, limit: int) -> List[Dict[str, Any]]:
+    def _parse_detail(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if data.get("code") == 0:
+            return data.get("data", {})
+        
+        logger.warning(f"获取视频详情失败: {data.get('message')}")
+        return {}
+    
+    def _get_comments(
+        self,
+        bvid: str,
+        limit: int,
+        aid: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """获取评论
         
+        先获取第一页以得到评论总数，再并发获取其余页，收集到 ``limit``
+        条评论后提前停止。
+        
         Args:
             bvid: 视频BV号
             limit: 评论数量限制
+            aid: 视频AV号，为空时通过视频详情获取
             
         Returns:
             评论列表
         """
         # 获取aid
-        detail = self._get_video_detail(bvid)
-        aid = detail.get("aid")
+        if not aid:
+            aid = self._get_video_detail(bvid).get("aid")
         
         if not aid:
             return []
         
-        url = f"{self.api_base}/x/v2/reply"
-        params = {
-            "type": 1,
-            "oid": aid,
-            "sort": 2,  # 按热度排序
-            "ps": min(limit, 20),
-            "pn": 1
-        }
+        page_size = min(limit, self.comment_page_size)
+        first = self._fetch_comment_page(*self._comment_request(aid, page_size, pn=1))
+        collector = _CommentCollector(limit)
         
+        if not collector.add(self._parse_comments(first)):
+            return collector.comments
+        
+        pages = self._remaining_pages(first, limit, page_size)
+        if not pages:
+            return collector.comments
+        
+        pool = ThreadPoolExecutor(
+            max_workers=min(self.comment_concurrency, len(pages)),
+            thread_name_prefix="comments"
+        )
         try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                replies = data.get("data", {}).get("replies", [])
-                return [
-                    {
-                        "content": r.get("content", {}).get("message", ""),
-                        "like": r.get("like", 0),
-                        "member": r.get("member", {})
-                    }
-                    for r in replies
-                ]
-            else:
-                return []
-                
+            futures = [
+                pool.submit(self._fetch_comment_page, *self._comment_request(aid, page_size, pn=pn))
+                for pn in pages
+            ]
+            # 按到达顺序汇入，足够时取消剩余请求
+            for future in as_completed(futures):
+                collector.add(self._parse_comments(future.result()))
+                if collector.full:
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        return collector.comments
+    
+    async def _aget_comments(
+        self,
+        bvid: str,
+        limit: int,
+        aid: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """异步获取评论，分页策略与 ``_get_comments`` 相同"""
+        if not aid:
+            aid = (await self._aget_video_detail(bvid)).get("aid")
+        
+        if not aid:
+            return []
+        
+        page_size = min(limit, self.comment_page_size)
+        first = await self._afetch_comment_page(*self._comment_request(aid, page_size, pn=1))
+        collector = _CommentCollector(limit)
+        
+        if not collector.add(self._parse_comments(first)):
+            return collector.comments
+        
+        pages = self._remaining_pages(first, limit, page_size)
+        semaphore = asyncio.Semaphore(max(1, self.comment_concurrency))
+        
+        async def fetch(pn: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._afetch_comment_page(*self._comment_request(aid, page_size, pn=pn))
+        
+        tasks = [asyncio.ensure_future(fetch(pn)) for pn in pages]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                collector.add(self._parse_comments(await next_page))
+                if collector.full:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return collector.comments
+    
+    def _fetch_comment_page(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """获取一页评论，失败时返回空响应"""
+        try:
+            return self.client.get(path, params)
         except Exception as e:
             logger.error(f"获取评论失败: {str(e)}")
+            return {}
+    
+    async def _afetch_comment_page(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return await self.client.aget(path, params)
+        except Exception as e:
+            logger.error(f"获取评论失败: {str(e)}")
+            return {}
+    
+    def _page_budget(self, limit: int, page_size: int) -> int:
+        """获取 ``limit`` 条评论所需的页数，不超过配置上限"""
+        return max(1, min(self.comment_max_pages, -(-limit // page_size)))
+    
+    def _remaining_pages(self, first: Dict[str, Any], limit: int, page_size: int) -> List[int]:
+        """根据第一页返回的评论总数计算还需获取的页码"""
+        count = (first.get("data") or {}).get("page", {}).get("count", 0)
+        total_pages = -(-count // page_size)
+        return list(range(2, min(self._page_budget(limit, page_size), total_pages) + 1))
+    
+    def _comment_request(self, aid: int, page_size: int, pn: int = 1) -> Tuple[str, Dict[str, Any]]:
+        return "/x/v2/reply", {
+            "type": 1,
+            "oid": aid,
+            "sort": 2,  # 按热度排序
+            "ps": page_size,
+            "pn": pn
+        }
+    
+    def _parse_comments(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if data.get("code") != 0:
             return []
+        
+        replies = data.get("data", {}).get("replies") or []
+        return [
+            {
+                "rpid": r.get("rpid"),
+                "content": r.get("content", {}).get("message", ""),
+                "like": r.get("like", 0),
+                "member": r.get("member", {})
+            }
+            for r in replies
+        ]
     
-    def _extract_keywords(self, comments: List[Dict[str, Any]]) -> List[str]:
+    def _extract_keywords(self, comments: List[Dict[str, Any]], top_k: int = 10) -> List[str]:
         """从评论中提取关键词
         
         Args:
             comments: 评论列表
+            top_k: 返回前K个关键词
             
         Returns:
             关键词列表
         """
-        # 简单实现：提取高频词
-        from collections import Counter
-        
-        all_text = " ".join([c.get("content", "") for c in comments])
-        words = all_text.split()
-        
-        # 过滤停用词和短词
-        stop_words = {"的", "了", "是", "在", "我", "有", "和", "就", "不", "人", "都", "一"}
-        filtered_words = [w for w in words if len(w) > 1 and w not in stop_words]
+        return tfidf_keywords((c.get("content", "") for c in comments), self.tokenizer, top_k)
+
+
+class _CommentCollector:
+    """按到达顺序收集评论，按rpid去重，达到上限后停止"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.comments: List[Dict[str, Any]] = []
+        self._seen = set()
+    
+    def add(self, comments: List[Dict[str, Any]]) -> bool:
+        """加入一页评论
         
-        # 统计频率
-        counter = Counter(filtered_words)
-        top_keywords = [word for word, count in counter.most_common(10)]
+        Args:
+            comments: 一页评论
+            
+        Returns:
+            是否还需要继续翻页（本页为空时视为已到末页）
+        """
+        for comment in comments:
+            if self.full:
+                break
+            
+            rpid = comment.get("rpid")
+            if rpid is not None:
+                if rpid in self._seen:
+                    continue
+                self._seen.add(rpid)
+            
+            self.comments.append(comment)
         
-        return top_keywords
-
+        return bool(comments) and not self.full
+    
+    @property
+    def full(self) -> bool:
+        return len(self.comments) >= self.limit
@@ -0,0 +1,210 @@
+"""生成视频的本地存储"""
+
+import hashlib
+import mimetypes
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from ..core.config import VideoConfig, get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class AssetTooLargeError(ValueError):
+    """视频超过 ``video.max_size_mb`` 限制"""
+
+
+class VideoAssetStore:
+    """视频文件存储
+    
+    按块流式下载到 ``videos_dir``，中断后用 Range 请求从已下载的位置
+    继续；文件按内容SHA-256命名，相同内容只保存一份。
+    """
+    
+    def __init__(
+        self,
+        root: Path,
+        config: Optional[VideoConfig] = None,
+        client: Optional[httpx.Client] = None
+    ):
+        config = config or settings.video
+        
+        self.root = root
+        self.partial_dir = root / ".partial"
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = config.max_size_mb * 1024 * 1024
+        self.formats = config.supported_formats
+        self.max_attempts = max(1, config.download_attempts)
+        self.client = client or httpx.Client(
+            timeout=httpx.Timeout(config.download_timeout, connect=10),
+            follow_redirects=True
+        )
+        
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="video-download")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(root / "assets.sqlite3"), check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS assets (
+                asset_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                url TEXT PRIMARY KEY,
+                asset_id TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+    
+    def get(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        """获取视频记录，文件已丢失时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        
+        if row is None:
+            return None
+        
+        asset = dict(row)
+        asset["path"] = self.root / asset["filename"]
+        return asset if asset["path"].exists() else None
+    
+    def find(self, url: str) -> Optional[Dict[str, Any]]:
+        """按来源URL查找已下载的视频"""
+        with self._lock:
+            row = self._conn.execute("SELECT asset_id FROM sources WHERE url = ?", (url,)).fetchone()
+        return self.get(row[0]) if row else None
+    
+    def download(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """下载视频，已下载过的URL直接返回
+        
+        Args:
+            url: 视频地址
+            headers: 额外请求头（例如上游鉴权）
+        
+        Returns:
+            视频记录
+        
+        Raises:
+            AssetTooLargeError: 超过大小限制
+            httpx.HTTPError: 多次续传后仍失败
+        """
+        existing = self.find(url)
+        if existing is not None:
+            return existing
+        
+        partial = self.partial_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.part"
+        
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                content_type = self._fetch(url, partial, headers or {})
+                break
+            except httpx.TransportError as e:
+                if attempt == self.max_attempts:
+                    raise
+                logger.warning(f"视频下载中断，从 {partial.stat().st_size if partial.exists() else 0} 字节处续传: {str(e)}")
+            except AssetTooLargeError:
+                partial.unlink(missing_ok=True)
+                raise
+        
+        return self._store(url, partial, content_type)
+    
+    def download_async(self, url: str, headers: Optional[Dict[str, str]] = None) -> Future:
+        """在后台线程下载视频"""
+        return self._pool.submit(self.download, url, headers)
+    
+    def _fetch(self, url: str, partial: Path, headers: Dict[str, str]) -> str:
+        """把视频流式写入临时文件，已有部分内容时续传
+        
+        Returns:
+            内容类型
+        """
+        offset = partial.stat().st_size if partial.exists() else 0
+        if offset:
+            headers = {**headers, "Range": f"bytes={offset}-"}
+        
+        with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416:
+                # 临时文件已完整
+                return self._content_type(url, response.headers.get("Content-Type"))
+            
+            response.raise_for_status()
+            
+            # 服务器不支持Range时从头下载
+            if response.status_code != 206:
+                offset = 0
+            
+            length = response.headers.get("Content-Length")
+            if length is not None and offset + int(length) > self.max_size:
+                raise AssetTooLargeError(f"视频大小超过限制 {self.max_size} 字节")
+            
+            written = offset
+            with open(partial, "ab" if offset else "wb") as f:
+                for chunk in response.iter_bytes(CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > self.max_size:
+                        raise AssetTooLargeError(f"视频大小超过限制 {self.max_size} 字节")
+                    f.write(chunk)
+            
+            return self._content_type(url, response.headers.get("Content-Type"))
+    
+    def _store(self, url: str, partial: Path, content_type: str) -> Dict[str, Any]:
+        """按内容哈希保存临时文件，内容重复时只保留已有文件"""
+        digest = hashlib.sha256()
+        with open(partial, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        
+        asset_id = digest.hexdigest()
+        extension = mimetypes.guess_extension(content_type) or ".mp4"
+        filename = f"{asset_id}{extension}"
+        size = partial.stat().st_size
+        
+        if (self.root / filename).exists():
+            partial.unlink()
+        else:
+            partial.replace(self.root / filename)
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO assets (asset_id, filename, size, content_type, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (asset_id, filename, size, content_type, time.time())
+            )
+            self._conn.execute("INSERT OR REPLACE INTO sources (url, asset_id) VALUES (?, ?)", (url, asset_id))
+            self._conn.commit()
+        
+        logger.info(f"视频已保存: {filename} ({size} 字节)")
+        return self.get(asset_id)
+    
+    def _content_type(self, url: str, header: Optional[str]) -> str:
+        content_type = (header or "").split(";")[0].strip()
+        if content_type.startswith("video/"):
+            return content_type
+        
+        # 上游未返回视频类型时按URL后缀判断
+        suffix = Path(urlparse(url).path).suffix.lstrip(".").lower()
+        if suffix in self.formats:
+            return mimetypes.types_map.get(f".{suffix}", f"video/{suffix}")
+        return "video/mp4"
+
+
+@lru_cache()
+def get_asset_store() -> VideoAssetStore:
+    """获取共享的视频存储"""
+    return VideoAssetStore(settings.videos_dir)
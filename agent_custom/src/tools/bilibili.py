@@ -0,0 +1,248 @@
+"""B站API客户端"""
+
+from typing import AsyncIterator, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import urlparse
+import asyncio
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .breaker import get_circuit_breaker
+from .cache import get_response_cache, make_cache_key
+from .ratelimit import get_rate_limiter
+from .singleflight import SingleFlight
+from ..core.config import BilibiliConfig, get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# 需要退避重试的HTTP状态码（412为B站风控拦截）
+RETRY_STATUS_CODES = (412, 429, 500, 502, 503, 504)
+
+# 风控拦截时接口返回的业务错误码
+RISK_CONTROL_CODE = -412
+
+
+class BilibiliClient:
+    """B站API客户端
+    
+    所有工具共享同一个 ``requests.Session``，复用 keep-alive 连接，
+    并统一处理重试退避、代理、限流和响应缓存。异步接口 ``aget`` 为每个
+    事件循环维护一个 ``httpx.AsyncClient``，行为与 ``get`` 一致，
+    ``async with client.scope()`` 退出时关闭当前循环的客户端。
+    缓存未命中时，相同路径和参数的并发请求合并为一次；连续遇到风控拦截、
+    限流或服务端错误时熔断，熔断期间请求直接抛出 ``CircuitOpenError``。
+    """
+    
+    def __init__(self, config: Optional[BilibiliConfig] = None):
+        config = config or settings.bilibili
+        
+        self.api_base = config.api_base.rstrip("/")
+        self.timeout = config.timeout
+        self.pool_size = config.pool_size
+        self.max_retries = config.max_retries
+        self.backoff_factor = config.backoff_factor
+        
+        retry = Retry(
+            total=config.max_retries,
+            backoff_factor=config.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=config.pool_size,
+            max_retries=retry
+        )
+        
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": "https://www.bilibili.com",
+            "Cookie": settings.bili_cookie or ""
+        }
+        self.proxies = {scheme: url for scheme, url in settings.get_proxy_dict().items() if url}
+        self.session.headers.update(self.headers)
+        self.session.proxies.update(self.proxies)
+        
+        # 异步客户端与事件循环绑定，按循环分别创建
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._scopes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, int]" = weakref.WeakKeyDictionary()
+        
+        self.rate_limiter = get_rate_limiter(urlparse(self.api_base).netloc, config.rate_limit, config.rate_burst)
+        self.breaker = get_circuit_breaker("bilibili", config.breaker)
+        
+        self.cache = get_response_cache() if settings.cache.enabled else None
+        self.cache_ttl = settings.cache.ttl
+        self.inflight = SingleFlight()
+    
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """发送GET请求
+        
+        Args:
+            path: API路径，例如 ``/x/web-interface/view``
+            params: 查询参数
+        
+        Returns:
+            响应JSON（只读，调用方不应修改）
+        """
+        key = make_cache_key(path, params)
+        
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        return self.inflight.do(key, lambda: self._request(path, params, key))
+    
+    async def aget(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """异步发送GET请求
+        
+        Args:
+            path: API路径，例如 ``/x/web-interface/view``
+            params: 查询参数
+        
+        Returns:
+            响应JSON（只读，调用方不应修改）
+        """
+        key = make_cache_key(path, params)
+        
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        return await self.inflight.ado(key, lambda: self._arequest(path, params, key))
+    
+    def _request(self, path: str, params: Optional[Dict[str, Any]], key: str) -> Dict[str, Any]:
+        self.breaker.check()
+        self.rate_limiter.acquire()
+        
+        try:
+            response = self.session.get(
+                f"{self.api_base}{path}",
+                params=params,
+                timeout=self.timeout
+            )
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        
+        data = response.json() if response.ok else None
+        self._record_outcome(response.status_code, data)
+        response.raise_for_status()
+        
+        self._cache_set(path, key, data)
+        return data
+    
+    async def _arequest(self, path: str, params: Optional[Dict[str, Any]], key: str) -> Dict[str, Any]:
+        self.breaker.check()
+        client = self._async_client()
+        attempt = 0
+        
+        while True:
+            await self.rate_limiter.aacquire()
+            
+            try:
+                response = await client.get(f"{self.api_base}{path}", params=params)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    break
+            
+            # 与同步接口相同的指数退避
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+        
+        data = response.json() if response.is_success else None
+        self._record_outcome(response.status_code, data)
+        response.raise_for_status()
+        
+        self._cache_set(path, key, data)
+        return data
+    
+    def _record_outcome(self, status_code: int, data: Optional[Dict[str, Any]]):
+        """按响应更新熔断器：重试后仍为风控拦截、限流或服务端错误时计为失败"""
+        if status_code in RETRY_STATUS_CODES or (data or {}).get("code") == RISK_CONTROL_CODE:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环的异步客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        
+        if client is None:
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                ),
+                proxy=self.proxies.get("https") or self.proxies.get("http")
+            )
+            self._async_clients[loop] = client
+        
+        return client
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        return self.cache.get(key)
+    
+    def _cache_set(self, path: str, key: str, data: Dict[str, Any]):
+        # 只缓存成功的响应
+        if self.cache is not None and data.get("code") == 0:
+            self.cache.set(key, data, ttl=self.cache_ttl.get(path))
+    
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+    
+    async def aclose(self):
+        """关闭当前事件循环的异步客户端"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator["BilibiliClient"]:
+        """在当前事件循环内使用异步客户端
+        
+        同一循环上的多个使用方共享客户端，最后一个退出时才关闭，
+        避免每次 ``asyncio.run`` 都遗留一个未关闭的连接池。
+        
+        Yields:
+            客户端自身
+        """
+        loop = asyncio.get_running_loop()
+        self._scopes[loop] = self._scopes.get(loop, 0) + 1
+        
+        try:
+            yield self
+        finally:
+            self._scopes[loop] -= 1
+            if not self._scopes[loop]:
+                del self._scopes[loop]
+                await self.aclose()
+
+
+@lru_cache()
+def get_bilibili_client() -> BilibiliClient:
+    """获取共享的B站API客户端"""
+    return BilibiliClient()
@@ -0,0 +1,172 @@
+"""熔断器：后端不可用时快速失败"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..core.config import BreakerConfig
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """后端已熔断，请求未发出"""
+    
+    def __init__(self, backend: str, retry_after: float):
+        super().__init__(f"{backend} 暂不可用（已熔断），{retry_after:.0f} 秒后重试")
+        self.backend = backend
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """熔断器（线程安全）
+    
+    连续失败 ``failure_threshold`` 次后熔断，``reset_timeout`` 秒内的
+    请求直接抛出 ``CircuitOpenError``。到期后放行一次试探请求：成功则
+    恢复，失败则重新熔断。试探请求在 ``reset_timeout`` 内没有结果时
+    再放行下一次。
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+        self._trips = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """``closed``、``open`` 或 ``half_open``"""
+        with self._lock:
+            return self._state(time.monotonic())
+    
+    def is_open(self) -> bool:
+        """是否处于熔断中（只查看状态，不占用试探请求名额）
+        
+        熔断未到期，或到期后已有试探请求在进行时返回True。
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            
+            now = time.monotonic()
+            return now - self._opened_at < self.reset_timeout or self._trial_pending(now)
+    
+    def retry_after(self) -> float:
+        """距离放行试探请求的秒数"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+    
+    def check(self):
+        """检查是否允许发出请求，到期后第一次调用作为试探请求放行
+        
+        Raises:
+            CircuitOpenError: 已熔断
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_timeout - now
+            
+            if remaining <= 0 and not self._trial_pending(now):
+                self._trial_at = now
+                return
+            
+            self._rejected += 1
+            raise CircuitOpenError(self.name, max(remaining, 0.0))
+    
+    def record_success(self):
+        """记录请求成功"""
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} 已恢复")
+            self._reset()
+    
+    def reset(self):
+        """恢复到关闭状态"""
+        with self._lock:
+            self._reset()
+    
+    def record_failure(self):
+        """记录请求失败，连续失败达到阈值或试探失败时熔断"""
+        with self._lock:
+            self._failures += 1
+            
+            if self._trial_at is not None or (
+                self._opened_at is None and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._trial_at = None
+                self._trips += 1
+                logger.warning(f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取熔断统计"""
+        with self._lock:
+            return {
+                "state": self._state(time.monotonic()),
+                "failures": self._failures,
+                "trips": self._trips,
+                "rejected": self._rejected,
+            }
+    
+    def _reset(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+    
+    def _trial_pending(self, now: float) -> bool:
+        return self._trial_at is not None and now - self._trial_at < self.reset_timeout
+    
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(backend: str, config: Optional[BreakerConfig] = None) -> CircuitBreaker:
+    """获取指定后端共享的熔断器
+    
+    Args:
+        backend: 后端名，例如 ``bilibili``、``gemini``
+        config: 熔断配置（仅首次创建时生效）
+    
+    Returns:
+        熔断器实例
+    """
+    config = config or BreakerConfig()
+    with _breakers_lock:
+        if backend not in _breakers:
+            _breakers[backend] = CircuitBreaker(backend, config.failure_threshold, config.reset_timeout)
+        return _breakers[backend]
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """所有后端的熔断统计"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def reset_breakers():
+    """把所有熔断器恢复到关闭状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        breaker.reset()
@@ -0,0 +1,237 @@
+"""API响应缓存"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+def make_cache_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """根据接口路径和参数生成缓存键
+    
+    Args:
+        endpoint: 接口路径
+        params: 查询参数
+        
+    Returns:
+        缓存键
+    """
+    return f"{endpoint}?{json.dumps(params or {}, sort_keys=True, ensure_ascii=False)}"
+
+
+class SQLiteCacheBackend:
+    """缓存的SQLite持久化后端
+    
+    ``prune`` 删除过期项，并在配置了 ``max_entries`` 时只保留过期时间
+    最晚的 ``max_entries`` 项。
+    """
+    
+    def __init__(self, path: Path, max_entries: Optional[int] = None):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)")
+        self._conn.commit()
+        
+        # 按当前上限清理上次运行留下的缓存
+        self.prune()
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """读取未过期的缓存项，返回 (值, 过期时间)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+    
+    def set(self, key: str, value: Any, expires_at: float):
+        """写入缓存项"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            self._conn.commit()
+    
+    def prune(self):
+        """删除过期缓存项，超出 ``max_entries`` 时删除过期时间最早的项"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key NOT IN "
+                    "(SELECT key FROM cache ORDER BY expires_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+class TTLCache:
+    """带过期时间的LRU缓存（线程安全）
+    
+    内存中最多保留 ``max_entries`` 项，超出时淘汰最久未使用的项。
+    配置了持久化后端时，写入同时落盘，内存未命中时从磁盘加载；
+    每 ``PRUNE_INTERVAL`` 次写入清理一次磁盘。
+    """
+    
+    PRUNE_INTERVAL = 256
+    
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        default_ttl: float = 60,
+        backend: Optional[SQLiteCacheBackend] = None
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.backend = backend
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            缓存值，未命中或已过期时返回None
+        """
+        now = time.time()
+        
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._data[key]
+        
+        if self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._store(key, entry)
+                    self.hits += 1
+                return entry[0]
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存
+        
+        Args:
+            key: 缓存键
+            value: 缓存值（持久化时需可JSON序列化）
+            ttl: 过期秒数，默认使用 ``default_ttl``
+        """
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        
+        with self._lock:
+            self._store(key, (value, expires_at))
+            self._writes += 1
+            prune = self._writes % self.PRUNE_INTERVAL == 0
+        
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+                if prune:
+                    self.backend.prune()
+            except Exception as e:
+                logger.warning(f"缓存持久化失败: {str(e)}")
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+        if self.backend is not None:
+            self.backend.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+    
+    def _store(self, key: str, entry: Tuple[Any, float]):
+        """写入内存并按LRU淘汰（需持有锁）"""
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+@lru_cache()
+def get_response_cache() -> TTLCache:
+    """获取共享的API响应缓存"""
+    config = settings.cache
+    backend = None
+    
+    if config.persist:
+        backend = SQLiteCacheBackend(settings.data_dir / "cache" / "responses.sqlite3", config.max_entries)
+    
+    return TTLCache(
+        max_entries=config.max_entries,
+        default_ttl=config.default_ttl,
+        backend=backend
+    )
+
+
+@lru_cache()
+def get_prompt_cache() -> TTLCache:
+    """获取共享的提示词结果缓存（始终持久化）"""
+    config = settings.cache.prompt
+    
+    return TTLCache(
+        max_entries=config.max_entries,
+        default_ttl=config.ttl,
+        backend=SQLiteCacheBackend(settings.data_dir / "cache" / "prompts.sqlite3", config.max_entries)
+    )
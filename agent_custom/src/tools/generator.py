@@ -1,11 +1,19 @@
 """内容生成工具"""
 
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
+import asyncio
+import hashlib
 import json
+import re
 
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from .breaker import get_circuit_breaker
+from .cache import get_prompt_cache
+from .keypool import KeyPool, NoAvailableKeyError, is_rate_limit_error, is_unavailable_error
+from .ratelimit import get_rate_limiter
+from .video_jobs import get_video_job_manager
 from ..core.config import get_settings
 from ..core.logger import get_logger
 
@@ -21,17 +29,35 @@ class PromptGenerator:
         if not api_keys:
             raise ValueError("未配置Gemini API密钥")
         
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            google_api_key=api_keys[0],
-            temperature=0.7
+        self.model = "gemini-2.0-flash-exp"
+        self.temperature = 0.7
+        self.key_pool = KeyPool(
+            api_keys,
+            cooldown=settings.llm.key_cooldown,
+            strategy=settings.llm.key_strategy
         )
+        
+        # 多密钥时由密钥池负责故障转移，客户端内部只做一次重试
+        client_kwargs = {"max_retries": 1} if len(self.key_pool) > 1 else {}
+        self.llms = {
+            key: ChatGoogleGenerativeAI(
+                model=self.model,
+                google_api_key=key,
+                temperature=self.temperature,
+                **client_kwargs
+            )
+            for key in self.key_pool.keys
+        }
+        self.cache = get_prompt_cache() if settings.cache.prompt.enabled else None
+        self.rate_limiter = get_rate_limiter("gemini", settings.llm.rate_limit, settings.llm.rate_burst)
+        self.breaker = get_circuit_breaker("gemini", settings.llm.breaker)
     
     def generate_prompt(
         self,
         video_insights: Dict[str, Any],
         comments_analysis: Dict[str, Any],
-        user_input: str = ""
+        user_input: str = "",
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """生成视频提示词
         
@@ -39,6 +65,8 @@ class PromptGenerator:
             video_insights: 视频分析结果
             comments_analysis: 评论分析结果
             user_input: 用户输入
+            on_token: 流式回调，每收到一段输出时以当前累计文本调用；
+                为空时等待完整响应
             
         Returns:
             生成的提示词（文本和JSON格式）
@@ -46,8 +74,234 @@ class PromptGenerator:
         logger.info("开始生成提示词")
         
         try:
-            # 构建提示
-            system_prompt = """你是一个专业的视频创意专家。
+            messages = self._build_messages(video_insights, comments_analysis, user_input)
+            cache_key = self._cache_key(messages)
+            
+            prompt_text = self._cached_prompt(cache_key, on_token)
+            if prompt_text is None:
+                prompt_text = self._invoke(messages, on_token).strip()
+                self._store_prompt(cache_key, prompt_text)
+            
+            return self._build_result(prompt_text, video_insights, comments_analysis)
+            
+        except Exception as e:
+            logger.error(f"提示词生成失败: {str(e)}")
+            raise
+    
+    async def agenerate_prompt(
+        self,
+        video_insights: Dict[str, Any],
+        comments_analysis: Dict[str, Any],
+        user_input: str = "",
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """异步生成视频提示词，参数与 ``generate_prompt`` 相同"""
+        logger.info("开始生成提示词")
+        
+        try:
+            messages = self._build_messages(video_insights, comments_analysis, user_input)
+            cache_key = self._cache_key(messages)
+            
+            # 缓存可能是SQLite后端，读写放到线程中
+            prompt_text = await asyncio.to_thread(self._cached_prompt, cache_key, on_token)
+            if prompt_text is None:
+                prompt_text = (await self._ainvoke(messages, on_token)).strip()
+                await asyncio.to_thread(self._store_prompt, cache_key, prompt_text)
+            
+            return self._build_result(prompt_text, video_insights, comments_analysis)
+            
+        except Exception as e:
+            logger.error(f"提示词生成失败: {str(e)}")
+            raise
+    
+    def _cached_prompt(
+        self,
+        cache_key: str,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """查询提示词缓存，命中时一次性回调完整文本"""
+        prompt_text = self.cache.get(cache_key) if self.cache is not None else None
+        
+        if prompt_text is not None:
+            logger.info("命中提示词缓存")
+            if on_token is not None:
+                on_token(prompt_text)
+        
+        return prompt_text
+    
+    def _store_prompt(self, cache_key: str, prompt_text: str):
+        if self.cache is not None:
+            self.cache.set(cache_key, prompt_text)
+    
+    def _build_result(
+        self,
+        prompt_text: str,
+        video_insights: Dict[str, Any],
+        comments_analysis: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """构建文本和JSON格式的提示词"""
+        prompt_json = {
+            "prompt": prompt_text,
+            "style": "realistic",
+            "duration": 5,
+            "aspect_ratio": "16:9",
+            "metadata": {
+                "source_video": video_insights.get('bvid', ''),
+                "keywords": comments_analysis.get('keywords', [])[:5]
+            }
+        }
+        
+        logger.info("提示词生成成功")
+        
+        return {
+            "text": prompt_text,
+            "json": prompt_json
+        }
+    
+    def _invoke(
+        self,
+        messages: List[BaseMessage],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """调用LLM，密钥被限流时自动切换到下一个可用密钥
+        
+        所有密钥都被限流，或遇到超时、连接失败、5xx时计入熔断器，熔断期间
+        直接抛出 ``CircuitOpenError``。
+        
+        Args:
+            messages: LLM消息
+            on_token: 流式回调，为空时使用非流式调用
+            
+        Returns:
+            LLM输出文本
+        """
+        self.breaker.check()
+        last_error: Optional[Exception] = None
+        
+        for _ in range(len(self.key_pool)):
+            self.rate_limiter.acquire()
+            key = self._acquire_key()
+            try:
+                if on_token is None:
+                    text = self.llms[key].invoke(messages).content
+                else:
+                    text = self._stream(self.llms[key], messages, on_token)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self.key_pool.release(key, rate_limited=rate_limited)
+                if not rate_limited:
+                    if is_unavailable_error(e):
+                        self.breaker.record_failure()
+                    raise
+                last_error = e
+                continue
+            
+            self.key_pool.release(key)
+            self.breaker.record_success()
+            return text
+        
+        self.breaker.record_failure()
+        raise last_error
+    
+    def _acquire_key(self) -> str:
+        try:
+            return self.key_pool.acquire()
+        except NoAvailableKeyError:
+            # 所有密钥都在冷却中，等同于被限流
+            self.breaker.record_failure()
+            raise
+    
+    def _stream(
+        self,
+        llm: ChatGoogleGenerativeAI,
+        messages: List[BaseMessage],
+        on_token: Callable[[str], None]
+    ) -> str:
+        """流式调用LLM
+        
+        Args:
+            llm: LLM客户端
+            messages: LLM消息
+            on_token: 以当前累计文本调用的回调
+            
+        Returns:
+            完整输出文本
+        """
+        text = ""
+        for chunk in llm.stream(messages):
+            if not chunk.text:
+                continue
+            text += chunk.text
+            on_token(text)
+        return text
+    
+    async def _ainvoke(
+        self,
+        messages: List[BaseMessage],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """异步调用LLM，故障转移和熔断逻辑与 ``_invoke`` 相同"""
+        self.breaker.check()
+        last_error: Optional[Exception] = None
+        
+        for _ in range(len(self.key_pool)):
+            await self.rate_limiter.aacquire()
+            key = self._acquire_key()
+            try:
+                if on_token is None:
+                    text = (await self.llms[key].ainvoke(messages)).content
+                else:
+                    text = await self._astream(self.llms[key], messages, on_token)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self.key_pool.release(key, rate_limited=rate_limited)
+                if not rate_limited:
+                    if is_unavailable_error(e):
+                        self.breaker.record_failure()
+                    raise
+                last_error = e
+                continue
+            
+            self.key_pool.release(key)
+            self.breaker.record_success()
+            return text
+        
+        self.breaker.record_failure()
+        raise last_error
+    
+    async def _astream(
+        self,
+        llm: ChatGoogleGenerativeAI,
+        messages: List[BaseMessage],
+        on_token: Callable[[str], None]
+    ) -> str:
+        """异步流式调用LLM"""
+        text = ""
+        async for chunk in llm.astream(messages):
+            if not chunk.text:
+                continue
+            text += chunk.text
+            on_token(text)
+        return text
+    
+    def _build_messages(
+        self,
+        video_insights: Dict[str, Any],
+        comments_analysis: Dict[str, Any],
+        user_input: str = ""
+    ) -> List[BaseMessage]:
+        """构建LLM消息
+        
+        Args:
+            video_insights: 视频分析结果
+            comments_analysis: 评论分析结果
+            user_input: 用户输入
+            
+        Returns:
+            系统消息和用户消息
+        """
+        # 构建提示
+        system_prompt = """你是一个专业的视频创意专家。
 根据提供的视频数据和评论分析，生成一个吸引人的短视频提示词。
 
 要求：
@@ -55,8 +309,8 @@ class PromptGenerator:
 2. 长度控制在200字以内
 3. 融合热点元素和用户需求
 4. 输出纯文本描述，不要包含任何标签或格式"""
-            
-            user_message = f"""
+        
+        user_message = f"""
 视频信息：
 - 标题：{video_insights.get('title', '')}
 - 描述：{video_insights.get('description', '')}
@@ -68,49 +322,63 @@ class PromptGenerator:
 
 请生成视频提示词：
 """
+        
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_message)
+        ]
+        
+        return messages
+    
+    def _cache_key(self, messages: List[BaseMessage]) -> str:
+        """根据规范化后的消息、模型和温度生成缓存键
+        
+        Args:
+            messages: LLM消息
             
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_message)
-            ]
-            
-            response = self.llm.invoke(messages)
-            prompt_text = response.content.strip()
-            
-            # 构建JSON格式
-            prompt_json = {
-                "prompt": prompt_text,
-                "style": "realistic",
-                "duration": 5,
-                "aspect_ratio": "16:9",
-                "metadata": {
-                    "source_video": video_insights.get('bvid', ''),
-                    "keywords": comments_analysis.get('keywords', [])[:5]
-                }
-            }
-            
-            logger.info("提示词生成成功")
-            
-            return {
-                "text": prompt_text,
-                "json": prompt_json
-            }
-            
-        except Exception as e:
-            logger.error(f"提示词生成失败: {str(e)}")
-            raise
+        Returns:
+            缓存键（SHA-256）
+        """
+        normalized = [
+            [message.type, re.sub(r"\s+", " ", message.content).strip()]
+            for message in messages
+        ]
+        payload = json.dumps(
+            {"model": self.model, "temperature": self.temperature, "messages": normalized},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 class VideoGenerator:
-    """视频生成器"""
+    """视频生成器
+    
+    视频生成交给 ``VideoJobManager`` 在后台提交和轮询，``submit_video``
+    立即返回任务ID，不会占用工作流线程。
+    """
     
     def __init__(self):
-        self.api_key = settings.veo_api_key
-        if not self.api_key:
+        self.jobs = get_video_job_manager()
+        if self.jobs.backend.name == "fake":
             logger.warning("未配置VEO API密钥，将使用模拟模式")
+        self.jobs.start()
+    
+    def submit_video(self, prompt: str, task_id: Optional[str] = None) -> str:
+        """提交视频生成任务
+        
+        Args:
+            prompt: 视频提示词
+            task_id: 关联的Agent任务ID
+            
+        Returns:
+            视频任务ID
+        """
+        logger.info("提交视频生成任务")
+        return self.jobs.submit(prompt, task_id=task_id)
     
     def generate_video(self, prompt: str) -> str:
-        """生成视频
+        """生成视频并等待结果
         
         Args:
             prompt: 视频提示词
@@ -118,21 +386,22 @@ class VideoGenerator:
         Returns:
             视频URL
         """
-        logger.info("开始生成视频")
+        job = self.jobs.wait(self.submit_video(prompt), timeout=settings.video.wait_timeout)
         
-        try:
-            if not self.api_key:
-                # 模拟模式
-                logger.info("模拟视频生成")
-                return f"https://example.com/videos/mock_{hash(prompt)}.mp4"
-            
-            # TODO: 集成真实的VEO API
-            # 这里需要根据实际API文档实现
-            
-            logger.info("视频生成成功")
-            return "https://example.com/videos/generated.mp4"
+        if job["status"] != "completed":
+            logger.error(f"视频生成失败: {job['error']}")
+            raise RuntimeError(job["error"] or "视频生成失败")
+        
+        logger.info("视频生成成功")
+        return job["video_url"]
+    
+    async def agenerate_video(self, prompt: str) -> str:
+        """异步生成视频并等待结果
+        
+        Args:
+            prompt: 视频提示词
             
-        except Exception as e:
-            logger.error(f"视频生成失败: {str(e)}")
-            raise
-
+        Returns:
+            视频URL
+        """
+        return await asyncio.to_thread(self.generate_video, prompt)
@@ -1,9 +1,14 @@
 """热点视频发现工具"""
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import requests
+import time
 
+import numpy as np
+
+from .bilibili import get_bilibili_client
 from ..core.config import get_settings
 from ..core.logger import get_logger
 
@@ -15,17 +20,16 @@ class HotspotFinder:
     """热点视频查找器"""
     
     def __init__(self):
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Cookie": settings.bili_cookie or ""
-        }
-        self.api_base = "https://api.bilibili.com"
+        self.client = get_bilibili_client()
+        self.max_concurrency = settings.hotspot.max_concurrency
+        self.score_weights = settings.hotspot.score_weights
     
     def find_hotspots(
         self,
         keywords: List[str],
         top_k: int = 10,
-        lookback_days: int = 7
+        lookback_days: int = 7,
+        concurrency: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """查找热点视频
         
@@ -33,26 +37,120 @@ class HotspotFinder:
             keywords: 搜索关键词列表
             top_k: 返回前K个结果
             lookback_days: 回溯天数
+            concurrency: 并发搜索数，默认取配置值
             
         Returns:
             热点视频列表
         """
         logger.info(f"开始查找热点: keywords={keywords}, top_k={top_k}")
         
-        all_videos = []
+        results = self.search_keywords(keywords, lookback_days, concurrency)
+        return self.rank_results(keywords, results, top_k)
+    
+    async def afind_hotspots(
+        self,
+        keywords: List[str],
+        top_k: int = 10,
+        lookback_days: int = 7,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """异步查找热点视频，参数与 ``find_hotspots`` 相同"""
+        logger.info(f"开始查找热点: keywords={keywords}, top_k={top_k}")
         
+        results = await self.asearch_keywords(keywords, lookback_days, concurrency)
+        return self.rank_results(keywords, results, top_k)
+    
+    def rank_results(
+        self,
+        keywords: List[str],
+        results: Dict[str, List[Dict[str, Any]]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """按关键词顺序合并搜索结果，去重排序后取前K个
+        
+        Args:
+            keywords: 关键词列表
+            results: ``search_keywords`` 返回的关键词到视频列表的映射
+            top_k: 返回前K个结果
+            
+        Returns:
+            热点视频列表
+        """
+        all_videos = []
         for keyword in keywords:
-            try:
-                videos = self._search_videos(keyword, lookback_days)
-                all_videos.extend(videos)
-            except Exception as e:
-                logger.error(f"搜索关键词 '{keyword}' 失败: {str(e)}")
+            all_videos.extend(results.get(keyword, []))
         
         # 去重和排序
         unique_videos = self._deduplicate_videos(all_videos)
-        sorted_videos = self._rank_videos(unique_videos)
+        return self._rank_videos(unique_videos, top_k)
+    
+    def search_keywords(
+        self,
+        keywords: List[str],
+        lookback_days: int = 7,
+        concurrency: Optional[int] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """并发搜索多个关键词
+        
+        Args:
+            keywords: 搜索关键词列表
+            lookback_days: 回溯天数
+            concurrency: 并发搜索数，默认取配置值
+            
+        Returns:
+            关键词到视频列表的映射
+        """
+        unique_keywords = list(dict.fromkeys(keywords))
+        workers = min(concurrency or self.max_concurrency, len(unique_keywords))
+        results: Dict[str, List[Dict[str, Any]]] = {}
         
-        return sorted_videos[:top_k]
+        if workers <= 1:
+            for keyword in unique_keywords:
+                results[keyword] = self._search_keyword(keyword, lookback_days)
+            return results
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hotspot-search") as pool:
+            futures = {
+                keyword: pool.submit(self._search_keyword, keyword, lookback_days)
+                for keyword in unique_keywords
+            }
+            for keyword, future in futures.items():
+                results[keyword] = future.result()
+        
+        return results
+    
+    async def asearch_keywords(
+        self,
+        keywords: List[str],
+        lookback_days: int = 7,
+        concurrency: Optional[int] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """在事件循环中并发搜索多个关键词，参数与 ``search_keywords`` 相同"""
+        unique_keywords = list(dict.fromkeys(keywords))
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.max_concurrency))
+        
+        async def search(keyword: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._asearch_keyword(keyword, lookback_days)
+        
+        found = await asyncio.gather(*(search(keyword) for keyword in unique_keywords))
+        return dict(zip(unique_keywords, found))
+    
+    def _search_keyword(self, keyword: str, days: int) -> List[Dict[str, Any]]:
+        """搜索单个关键词，失败时返回空列表"""
+        try:
+            return self._search_videos(keyword, days)
+        except Exception as e:
+            logger.error(f"搜索关键词 '{keyword}' 失败: {str(e)}")
+            return []
+    
+    async def _asearch_keyword(self, keyword: str, days: int) -> List[Dict[str, Any]]:
+        """异步搜索单个关键词，失败时返回空列表"""
+        try:
+            return await self._asearch_videos(keyword, days)
+        except Exception as e:
+            logger.error(f"搜索关键词 '{keyword}' 失败: {str(e)}")
+            return []
     
     def _search_videos(self, keyword: str, days: int) -> List[Dict[str, Any]]:
         """搜索视频
@@ -64,9 +162,26 @@ class HotspotFinder:
         Returns:
             视频列表
         """
-        url = f"{self.api_base}/x/web-interface/search/type"
+        try:
+            data = self.client.get("/x/web-interface/search/type", self._search_params(keyword))
+        except Exception as e:
+            logger.error(f"请求失败: {str(e)}")
+            return []
+        
+        return self._parse_search(data, days)
+    
+    async def _asearch_videos(self, keyword: str, days: int) -> List[Dict[str, Any]]:
+        """异步搜索视频"""
+        try:
+            data = await self.client.aget("/x/web-interface/search/type", self._search_params(keyword))
+        except Exception as e:
+            logger.error(f"请求失败: {str(e)}")
+            return []
         
-        params = {
+        return self._parse_search(data, days)
+    
+    def _search_params(self, keyword: str) -> Dict[str, Any]:
+        return {
             "search_type": "video",
             "keyword": keyword,
             "order": "click",
@@ -74,22 +189,15 @@ class HotspotFinder:
             "page": 1,
             "pagesize": 20
         }
+    
+    def _parse_search(self, data: Dict[str, Any], days: int) -> List[Dict[str, Any]]:
+        """解析搜索接口响应"""
+        if data.get("code") == 0:
+            videos = data.get("data", {}).get("result", [])
+            return self._process_videos(videos, days)
         
-        try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == 0:
-                videos = data.get("data", {}).get("result", [])
-                return self._process_videos(videos, days)
-            else:
-                logger.warning(f"API返回错误: {data.get('message')}")
-                return []
-                
-        except Exception as e:
-            logger.error(f"请求失败: {str(e)}")
-            return []
+        logger.warning(f"API返回错误: {data.get('message')}")
+        return []
     
     def _process_videos(self, videos: List[Dict], days: int) -> List[Dict[str, Any]]:
         """处理视频数据
@@ -112,6 +220,7 @@ class HotspotFinder:
             
             processed.append({
                 "bvid": video.get("bvid", ""),
+                "aid": video.get("aid", 0),
                 "title": video.get("title", ""),
                 "author": video.get("author", ""),
                 "description": video.get("description", ""),
@@ -146,23 +255,39 @@ class HotspotFinder:
         
         return unique
     
-    def _rank_videos(self, videos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _rank_videos(
+        self,
+        videos: List[Dict[str, Any]],
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """视频排序打分
         
         Args:
             videos: 视频列表
+            top_k: 只返回前K个，为空时返回全部
             
         Returns:
             排序后的视频列表
         """
-        for video in videos:
-            score = self._calculate_score(video)
+        if not videos or (top_k is not None and top_k <= 0):
+            return []
+        
+        scores = score_videos(videos, self.score_weights)
+        for video, score in zip(videos, scores.tolist()):
             video["hotspot_score"] = score
         
-        return sorted(videos, key=lambda x: x["hotspot_score"], reverse=True)
+        # 先用 argpartition 选出前K个，只对这K个排序
+        if top_k is not None and top_k < len(videos):
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(videos))
+        
+        # 同分时保持原有顺序
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [videos[i] for i in order]
     
     def _calculate_score(self, video: Dict[str, Any]) -> float:
-        """计算视频热度分数
+        """计算单个视频的热度分数
         
         Args:
             video: 视频数据
@@ -170,23 +295,70 @@ class HotspotFinder:
         Returns:
             热度分数
         """
-        play = video.get("play", 0)
-        like = video.get("like", 0)
-        comment = video.get("comment", 0)
-        danmaku = video.get("danmaku", 0)
-        
-        # 时间衰减
-        pub_time = datetime.fromtimestamp(video.get("pubdate", 0))
-        hours_old = (datetime.now() - pub_time).total_seconds() / 3600
-        gravity = 1.8
-        
-        # 综合评分
-        score = (
-            play * 0.1 +
-            like * 1.0 +
-            comment * 0.8 +
-            danmaku * 0.5
-        ) / pow(hours_old + 2, gravity)
-        
-        return score
+        return float(score_videos([video], self.score_weights)[0])
+
+
+def score_videos(
+    videos: List[Dict[str, Any]],
+    weights: Dict[str, float],
+    now: Optional[float] = None
+) -> np.ndarray:
+    """批量计算视频热度分数
+    
+    互动加权和按发布时长做重力衰减，再按时长做对数加成：
+    ``(Σ w·互动) / (小时 + 2) ^ gravity × (1 + duration_weight · ln(1 + 分钟))``
+    
+    Args:
+        videos: 视频列表
+        weights: 评分权重，见 ``HotspotConfig.score_weights``
+        now: 参考时间戳，默认当前时间；同一批视频共用
+        
+    Returns:
+        与 ``videos`` 顺序一致的分数数组
+    """
+    now = time.time() if now is None else now
+    
+    stats = np.array(
+        [
+            (
+                video.get("play", 0) or 0,
+                video.get("like", 0) or 0,
+                video.get("comment", 0) or 0,
+                video.get("danmaku", 0) or 0,
+                video.get("pubdate", 0) or 0,
+                _duration_seconds(video.get("duration", 0)),
+            )
+            for video in videos
+        ],
+        dtype=np.float64
+    ).reshape(-1, 6)
+    
+    engagement = stats[:, :4] @ np.array([
+        weights.get("views", 0.1),
+        weights.get("likes", 1.0),
+        weights.get("comments", 0.8),
+        weights.get("danmaku", 0.5),
+    ])
+    
+    # 时间衰减
+    hours_old = np.maximum(now - stats[:, 4], 0) / 3600
+    decay = np.power(hours_old + 2, weights.get("gravity", 1.8))
+    
+    # 时长加成
+    boost = 1 + weights.get("duration_weight", 0.0) * np.log1p(stats[:, 5] / 60)
+    
+    return engagement / decay * boost
 
+
+def _duration_seconds(duration: Any) -> float:
+    """解析时长，支持秒数和搜索接口返回的 ``MM:SS`` / ``HH:MM:SS``"""
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    
+    seconds = 0.0
+    try:
+        for part in str(duration).split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return 0.0
+    return seconds
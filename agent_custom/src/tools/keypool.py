@@ -0,0 +1,165 @@
+"""API密钥池"""
+
+import itertools
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class NoAvailableKeyError(RuntimeError):
+    """所有密钥都在冷却中"""
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    """异常及其 ``__cause__``/``__context__`` 链（SDK 封装后的原始异常在链上）"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """从异常链中读取HTTP状态码
+    
+    兼容 google-genai 的 ``APIError.code``、google-api-core 异常的 ``code``
+    以及 httpx/requests 异常的 ``response.status_code``。
+    """
+    for e in _error_chain(error):
+        response = getattr(e, "response", None)
+        for value in (getattr(e, "status_code", None), getattr(response, "status_code", None), getattr(e, "code", None)):
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def _has_error_type(error: BaseException, names: frozenset) -> bool:
+    """异常链中是否有类名（含父类）在 ``names`` 中的异常"""
+    return any(cls.__name__ in names for e in _error_chain(error) for cls in type(e).__mro__)
+
+
+# 没有状态码时按异常类型判断（兼容 google-api-core 和 httpx）
+_RATE_LIMIT_ERRORS = frozenset({"ResourceExhausted", "TooManyRequests"})
+_UNAVAILABLE_ERRORS = frozenset({
+    "ServerError", "InternalServerError", "ServiceUnavailable", "BadGateway",
+    "GatewayTimeout", "DeadlineExceeded", "RetryError",
+    "TransportError", "TimeoutException",
+    "TimeoutError", "ConnectionError",
+})
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """判断异常是否为限流/配额耗尽（HTTP 429）
+    
+    按状态码或异常类型判断，不匹配错误信息文本（参数错误的信息里也可能
+    出现 ``429`` 这样的数字）。
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status == 429
+    return _has_error_type(error, _RATE_LIMIT_ERRORS)
+
+
+def is_unavailable_error(error: Exception) -> bool:
+    """判断异常是否为服务不可用（超时、连接失败或5xx），鉴权和参数错误不算"""
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    return _has_error_type(error, _UNAVAILABLE_ERRORS)
+
+
+class KeyPool:
+    """API密钥池
+    
+    在多个密钥间负载均衡，被限流的密钥进入冷却期，期间不再分配。
+    
+    支持两种策略：
+    - ``round_robin``: 轮询
+    - ``least_loaded``: 选择进行中请求最少的密钥
+    """
+    
+    def __init__(self, keys: List[str], cooldown: float = 60, strategy: str = "round_robin"):
+        if not keys:
+            raise ValueError("密钥池不能为空")
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError(f"不支持的密钥选择策略: {strategy}")
+        
+        self.keys = list(dict.fromkeys(keys))
+        self.cooldown = cooldown
+        self.strategy = strategy
+        
+        self._in_flight = {key: 0 for key in self.keys}
+        self._requests = {key: 0 for key in self.keys}
+        self._rate_limited = {key: 0 for key in self.keys}
+        self._cooldown_until = {key: 0.0 for key in self.keys}
+        self._cycle = itertools.cycle(self.keys)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def acquire(self) -> str:
+        """选择一个可用密钥
+        
+        Returns:
+            密钥
+            
+        Raises:
+            NoAvailableKeyError: 所有密钥都在冷却中
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [key for key in self.keys if self._cooldown_until[key] <= now]
+            
+            if not available:
+                wait = min(self._cooldown_until.values()) - now
+                raise NoAvailableKeyError(f"所有API密钥均被限流，{wait:.0f} 秒后恢复")
+            
+            if self.strategy == "least_loaded":
+                key = min(available, key=lambda k: (self._in_flight[k], self._requests[k]))
+            else:
+                key = next(k for k in self._cycle if k in available)
+            
+            self._in_flight[key] += 1
+            self._requests[key] += 1
+            return key
+    
+    def release(self, key: str, rate_limited: bool = False, retry_after: Optional[float] = None):
+        """归还密钥
+        
+        Args:
+            key: 密钥
+            rate_limited: 本次请求是否被限流
+            retry_after: 服务端建议的冷却秒数，默认使用 ``cooldown``
+        """
+        with self._lock:
+            self._in_flight[key] = max(0, self._in_flight[key] - 1)
+            
+            if rate_limited:
+                self._rate_limited[key] += 1
+                self._cooldown_until[key] = time.monotonic() + (retry_after or self.cooldown)
+                logger.warning(f"API密钥 {mask_key(key)} 被限流，冷却 {retry_after or self.cooldown} 秒")
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """获取各密钥的使用统计（密钥已脱敏）"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "key": mask_key(key),
+                    "in_flight": self._in_flight[key],
+                    "requests": self._requests[key],
+                    "rate_limited": self._rate_limited[key],
+                    "cooldown": max(0.0, self._cooldown_until[key] - now),
+                }
+                for key in self.keys
+            ]
+
+
+def mask_key(key: str) -> str:
+    """密钥脱敏，只保留末4位"""
+    return f"***{key[-4:]}" if len(key) > 4 else "***"
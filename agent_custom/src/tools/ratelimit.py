@@ -0,0 +1,79 @@
+"""请求限流工具"""
+
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+class RateLimiter:
+    """令牌桶限流器（线程安全）"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒产生的令牌数，<=0 表示不限流
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+    
+    async def aacquire(self):
+        """获取一个令牌（异步），令牌不足时让出事件循环等待"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    
+    def _try_acquire(self) -> float:
+        """尝试取出一个令牌
+        
+        Returns:
+            0 表示已取得令牌，否则为需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0
+        
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            
+            return (1 - self._tokens) / self.rate
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host: str, rate: float, burst: int = 1) -> RateLimiter:
+    """获取指定主机（或后端）共享的限流器
+    
+    Args:
+        host: 主机名或后端名
+        rate: 每秒请求数（仅首次创建时生效）
+        burst: 突发请求数（仅首次创建时生效）
+        
+    Returns:
+        限流器实例
+    """
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(rate, burst)
+        return _limiters[host]
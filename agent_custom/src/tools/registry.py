@@ -0,0 +1,44 @@
+"""工具实例注册表"""
+
+import threading
+from typing import Any, Dict, Type, TypeVar
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_instances: Dict[Type[Any], Any] = {}
+_lock = threading.Lock()
+
+
+def get_tool(cls: Type[T]) -> T:
+    """获取进程内共享的工具实例
+    
+    首次调用时构造实例（含LLM客户端和HTTP连接池），之后所有节点
+    和工作线程复用同一实例。构造失败时不缓存，下次调用重新构造。
+    
+    Args:
+        cls: 工具类，需支持无参构造
+        
+    Returns:
+        工具实例
+    """
+    instance = _instances.get(cls)
+    if instance is not None:
+        return instance
+    
+    with _lock:
+        instance = _instances.get(cls)
+        if instance is None:
+            instance = cls()
+            _instances[cls] = instance
+            logger.info(f"已创建共享工具实例: {cls.__name__}")
+        return instance
+
+
+def reset_tools():
+    """清空已缓存的工具实例"""
+    with _lock:
+        _instances.clear()
@@ -0,0 +1,118 @@
+"""请求合并：相同请求并发时只执行一次"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """按键合并并发调用（线程安全）
+    
+    同一个键已有调用在执行时，后到的调用不再重复执行，而是等待同一个
+    Future 的结果（或异常）。调用结束后键立即释放，之后的调用重新执行，
+    因此不会缓存结果。同步调用按线程共享 ``concurrent.futures.Future``；
+    异步调用按事件循环共享 ``asyncio.Future``，两者互不合并。
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.collapsed = 0
+    
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """执行调用，相同键的并发调用共享结果
+        
+        Args:
+            key: 调用键
+            fn: 实际执行的函数
+        
+        Returns:
+            函数返回值（并发调用方拿到同一个对象）
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.executed += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+    
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """异步执行调用，同一事件循环内相同键的并发调用共享结果
+        
+        Args:
+            key: 调用键
+            fn: 返回协程的函数
+        
+        Returns:
+            协程返回值（并发调用方拿到同一个对象）
+        """
+        loop = asyncio.get_running_loop()
+        
+        with self._lock:
+            calls = self._async_calls.setdefault(loop, {})
+            future = calls.get(key)
+            if future is None:
+                future = calls[key] = loop.create_future()
+                self.executed += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+        
+        if not leader:
+            # 等待方被取消时不影响正在执行的调用
+            return await asyncio.shield(future)
+        
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待方时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del calls[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        with self._lock:
+            total = self.executed + self.collapsed
+            return {
+                "in_flight": len(self._calls) + sum(len(calls) for calls in self._async_calls.values()),
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "collapse_rate": self.collapsed / total if total else 0.0,
+            }
@@ -0,0 +1,161 @@
+"""文本处理：分词与关键词提取"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List
+from collections import Counter
+from functools import lru_cache
+import math
+import re
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# 表情 [doge]、回复前缀 "回复 @xxx :"、链接
+_NOISE_PATTERN = re.compile(r"\[[^\[\]]{1,12}\]|回复\s*@\S+\s*[:：]|https?://\S+")
+_CJK_RANGE = re.compile(r"^[一-鿿]+$")
+# 连续的汉字，或连续的字母数字
+_TOKEN_PATTERN = re.compile(r"[一-鿿]+|[A-Za-z][A-Za-z0-9+#.\-]*|\d+[A-Za-z][A-Za-z0-9]*")
+
+# 不会单独构成关键词的常见虚字，汉字串在这些字处断开
+STOP_CHARS = frozenset("的了是在我你他她它有和就不都也很还吗呢吧啊哈呀哦嗯么这那个们着过被把给让")
+
+STOP_WORDS = frozenset({
+    "什么", "怎么", "为什么", "这样", "那样", "这么", "那么", "一个", "一下", "一样",
+    "可以", "没有", "就是", "还是", "但是", "因为", "所以", "如果", "然后", "而且",
+    "真的", "感觉", "觉得", "知道", "现在", "已经", "自己", "大家", "时候", "应该",
+    "视频", "up", "UP", "b站", "B站", "bilibili",
+    "the", "and", "for", "you", "this", "that", "with", "are", "is", "it",
+})
+
+# 汉字停用词和虚字作为分隔符，避免产生跨越停用词的二元组
+_CJK_STOP_PATTERN = re.compile("|".join(
+    sorted((re.escape(w) for w in STOP_WORDS if _CJK_RANGE.match(w)), key=len, reverse=True)
+    + ["[" + "".join(sorted(STOP_CHARS)) + "]"]
+))
+
+
+class Tokenizer(ABC):
+    """分词器抽象基类"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def tokenize(self, text: str) -> List[str]:
+        """切分文本
+        
+        Args:
+            text: 原始文本
+        
+        Returns:
+            过滤停用词后的词列表
+        """
+
+
+class SimpleTokenizer(Tokenizer):
+    """无需词典的离线分词器（未安装 jieba 时的后备）
+    
+    英文和数字按单词切分；汉字串先在停用词和虚字处断开，再按二元组切分。
+    二元组会切出 ``工智`` 这类跨词片段，正式环境应使用 ``JiebaTokenizer``。
+    """
+    
+    name = "simple"
+    
+    def tokenize(self, text: str) -> List[str]:
+        tokens = []
+        
+        for match in _TOKEN_PATTERN.finditer(_NOISE_PATTERN.sub(" ", text)):
+            run = match.group()
+            
+            if not _is_cjk(run[0]):
+                if len(run) > 1 and run not in STOP_WORDS:
+                    tokens.append(run)
+                continue
+            
+            for segment in _CJK_STOP_PATTERN.split(run):
+                tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        
+        return tokens
+
+
+class JiebaTokenizer(Tokenizer):
+    """基于 jieba 词典的分词器（默认）"""
+    
+    name = "jieba"
+    
+    def __init__(self):
+        import jieba
+        
+        self._cut = jieba.lcut
+    
+    def tokenize(self, text: str) -> List[str]:
+        return [
+            word
+            for word in self._cut(_NOISE_PATTERN.sub(" ", text))
+            if len(word.strip()) > 1 and word not in STOP_WORDS and _TOKEN_PATTERN.fullmatch(word)
+        ]
+
+
+@lru_cache()
+def get_tokenizer(name: str = "auto") -> Tokenizer:
+    """获取分词器
+    
+    Args:
+        name: ``simple``、``jieba`` 或 ``auto``（已安装 jieba 时使用 jieba）
+    
+    Returns:
+        分词器实例
+    """
+    if name in ("auto", "jieba"):
+        try:
+            return JiebaTokenizer()
+        except ImportError:
+            # 内置分词器只能切出二元组，关键词质量明显下降
+            logger.warning("未安装jieba，使用内置分词器")
+    
+    return SimpleTokenizer()
+
+
+def tfidf_keywords(
+    documents: Iterable[str],
+    tokenizer: Tokenizer,
+    top_k: int = 10
+) -> List[str]:
+    """批量计算TF-IDF并提取关键词
+    
+    每条文本作为一篇文档，词的得分为其在所有文档中的词频之和乘以
+    平滑逆文档频率 ``log((1 + N) / (1 + df)) + 1``。
+    
+    Args:
+        documents: 文本列表
+        tokenizer: 分词器
+        top_k: 返回前K个关键词
+    
+    Returns:
+        按得分降序的关键词列表
+    """
+    term_freq: Counter = Counter()
+    doc_freq: Counter = Counter()
+    total = 0
+    
+    for document in documents:
+        tokens = tokenizer.tokenize(document or "")
+        if not tokens:
+            continue
+        
+        total += 1
+        term_freq.update(tokens)
+        doc_freq.update(set(tokens))
+    
+    scores: Dict[str, float] = {
+        term: count * (math.log((1 + total) / (1 + doc_freq[term])) + 1)
+        for term, count in term_freq.items()
+    }
+    
+    # 同分时按首次出现顺序
+    return sorted(scores, key=scores.__getitem__, reverse=True)[:top_k]
+
+
+def _is_cjk(char: str) -> bool:
+    return bool(_CJK_RANGE.match(char))
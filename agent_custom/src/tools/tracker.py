@@ -0,0 +1,356 @@
+"""热点追踪：定期抓取快照并按增长速度排序"""
+
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .hotspot import HotspotFinder
+from .registry import get_tool
+from ..core.config import TrackerConfig, get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class HotspotTracker:
+    """热点追踪器
+    
+    后台线程定期用 ``HotspotFinder`` 搜索已追踪的关键词，把每个视频的
+    播放、点赞、评论、弹幕写入时间序列快照，并按两次快照之间的加权
+    互动增长速度（每小时）增量更新热度分数。任务查找热点时直接读取
+    预先算好的排名。连续 ``max_idle_intervals`` 个间隔没有任务请求的
+    关键词不再抓取，追踪的关键词最多保留 ``max_keywords`` 个。
+    
+    多个进程共享同一个数据库时各自运行抓取线程，每个关键词在一个间隔内
+    只由先认领到的进程抓取一次。
+    """
+    
+    def __init__(self, finder: HotspotFinder, path: Path, config: Optional[TrackerConfig] = None):
+        config = config or settings.hotspot.tracker
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.finder = finder
+        self.path = path
+        self.interval = config.interval
+        self.max_age = config.max_age
+        self.retention = config.retention_days * 86400
+        self.smoothing = config.smoothing
+        self.max_idle = config.max_idle_intervals * config.interval
+        self.max_keywords = config.max_keywords
+        self.lookback_days = settings.hotspot.lookback_days
+        
+        weights = settings.hotspot.score_weights
+        self.weights = (
+            weights.get("views", 0.1),
+            weights.get("likes", 1.0),
+            weights.get("comments", 0.8),
+            weights.get("danmaku", 0.5),
+        )
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                keyword TEXT PRIMARY KEY,
+                added_at REAL NOT NULL,
+                crawled_at REAL,
+                requested_at REAL,
+                claimed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS videos (
+                bvid TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                engagement REAL NOT NULL,
+                velocity REAL NOT NULL,
+                observed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_videos_velocity ON videos (velocity DESC);
+            CREATE TABLE IF NOT EXISTS video_keywords (
+                keyword TEXT NOT NULL,
+                bvid TEXT NOT NULL,
+                PRIMARY KEY (keyword, bvid)
+            );
+            CREATE TABLE IF NOT EXISTS snapshots (
+                bvid TEXT NOT NULL,
+                observed_at REAL NOT NULL,
+                play INTEGER NOT NULL,
+                likes INTEGER NOT NULL,
+                comments INTEGER NOT NULL,
+                danmaku INTEGER NOT NULL,
+                PRIMARY KEY (bvid, observed_at)
+            );
+            CREATE INDEX IF NOT EXISTS idx_snapshots_time ON snapshots (observed_at);
+        """)
+        
+        # 旧版本数据库没有 requested_at、claimed_at 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(keywords)")}
+        if "requested_at" not in columns:
+            self._conn.execute("ALTER TABLE keywords ADD COLUMN requested_at REAL")
+            self._conn.execute("UPDATE keywords SET requested_at = added_at")
+        if "claimed_at" not in columns:
+            self._conn.execute("ALTER TABLE keywords ADD COLUMN claimed_at REAL")
+        self._conn.commit()
+    
+    def track(self, keywords: List[str]):
+        """加入追踪的关键词并刷新请求时间，下一轮抓取时生效
+        
+        Args:
+            keywords: 关键词列表
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO keywords (keyword, added_at, requested_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(keyword) DO UPDATE SET requested_at = excluded.requested_at",
+                [(keyword, now, now) for keyword in keywords]
+            )
+            self._conn.commit()
+    
+    def keywords(self) -> List[str]:
+        """已追踪的关键词，先淘汰长时间未请求或超出上限的关键词"""
+        with self._lock:
+            self._expire(time.time())
+            rows = self._conn.execute("SELECT keyword FROM keywords ORDER BY added_at").fetchall()
+        return [row[0] for row in rows]
+    
+    def crawl(self, keywords: Optional[List[str]] = None) -> int:
+        """抓取一轮快照并更新热度分数
+        
+        Args:
+            keywords: 要抓取的关键词，默认为全部已追踪关键词；其他进程本间隔
+                内已认领的关键词会被跳过
+        
+        Returns:
+            本轮记录的视频数
+        """
+        keywords = self._claim(keywords or self.keywords(), time.time())
+        if not keywords:
+            return 0
+        
+        results = self.finder.search_keywords(keywords, self.lookback_days)
+        now = time.time()
+        
+        videos: Dict[str, Dict[str, Any]] = {}
+        links = []
+        for keyword, found in results.items():
+            for video in found:
+                if video.get("bvid"):
+                    videos.setdefault(video["bvid"], video)
+                    links.append((keyword, video["bvid"]))
+        
+        with self._lock:
+            previous = self._previous(list(videos))
+            
+            rows = []
+            snapshots = []
+            for bvid, video in videos.items():
+                engagement = self._engagement(video)
+                velocity = self._velocity(video, engagement, previous.get(bvid), now)
+                rows.append((bvid, json.dumps(video, ensure_ascii=False), engagement, velocity, now))
+                snapshots.append((
+                    bvid,
+                    now,
+                    video.get("play", 0) or 0,
+                    video.get("like", 0) or 0,
+                    video.get("comment", 0) or 0,
+                    video.get("danmaku", 0) or 0,
+                ))
+            
+            self._conn.executemany(
+                "INSERT INTO videos (bvid, data, engagement, velocity, observed_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(bvid) DO UPDATE SET data = excluded.data, engagement = excluded.engagement, "
+                "velocity = excluded.velocity, observed_at = excluded.observed_at",
+                rows
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)", snapshots)
+            self._conn.executemany("INSERT OR IGNORE INTO video_keywords VALUES (?, ?)", links)
+            self._conn.executemany(
+                "INSERT INTO keywords (keyword, added_at, crawled_at, requested_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(keyword) DO UPDATE SET crawled_at = excluded.crawled_at",
+                [(keyword, now, now, now) for keyword in results]
+            )
+            self._conn.execute("DELETE FROM snapshots WHERE observed_at < ?", (now - self.retention,))
+            self._conn.commit()
+        
+        logger.info(f"热点快照完成: {len(keywords)} 个关键词, {len(videos)} 个视频")
+        return len(videos)
+    
+    def ranking(self, keywords: List[str], top_k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """读取预先计算的热点排名
+        
+        Args:
+            keywords: 关键词列表
+            top_k: 返回前K个结果
+        
+        Returns:
+            按增长速度排序的视频列表；有关键词未追踪或快照已过期时返回None
+        """
+        keywords = list(dict.fromkeys(keywords))
+        if not keywords:
+            return None
+        
+        fresh_after = time.time() - self.max_age
+        placeholders = ", ".join("?" * len(keywords))
+        
+        with self._lock:
+            fresh = self._conn.execute(
+                f"SELECT COUNT(*) FROM keywords WHERE keyword IN ({placeholders}) AND crawled_at >= ?",
+                (*keywords, fresh_after)
+            ).fetchone()[0]
+            if fresh < len(keywords):
+                return None
+            
+            rows = self._conn.execute(
+                f"SELECT DISTINCT v.data, v.velocity FROM videos v "
+                f"JOIN video_keywords k ON k.bvid = v.bvid "
+                f"WHERE k.keyword IN ({placeholders}) AND v.observed_at >= ? "
+                f"ORDER BY v.velocity DESC LIMIT ?",
+                (*keywords, fresh_after, top_k)
+            ).fetchall()
+        
+        return [
+            {**json.loads(data), "hotspot_score": velocity, "velocity": velocity}
+            for data, velocity in rows
+        ]
+    
+    def history(self, bvid: str) -> List[Dict[str, Any]]:
+        """视频的快照时间序列
+        
+        Args:
+            bvid: 视频BV号
+        
+        Returns:
+            按时间排序的快照列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT observed_at, play, likes, comments, danmaku FROM snapshots "
+                "WHERE bvid = ? ORDER BY observed_at",
+                (bvid,)
+            ).fetchall()
+        
+        return [
+            {"observed_at": row[0], "play": row[1], "like": row[2], "comment": row[3], "danmaku": row[4]}
+            for row in rows
+        ]
+    
+    def start(self):
+        """启动后台抓取线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="hotspot-tracker", daemon=True)
+        self._thread.start()
+        logger.info(f"热点追踪已启动，间隔 {self.interval} 秒")
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台抓取线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.crawl()
+            except Exception as e:
+                logger.error(f"热点快照失败: {str(e)}", exc_info=True)
+            self._stop.wait(self.interval)
+    
+    def _claim(self, keywords: List[str], now: float) -> List[str]:
+        """认领本轮抓取的关键词（条件更新，距上次认领不足一个间隔时跳过）"""
+        claimed = []
+        with self._lock:
+            for keyword in keywords:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO keywords (keyword, added_at, requested_at) VALUES (?, ?, ?)",
+                    (keyword, now, now)
+                )
+                cursor = self._conn.execute(
+                    "UPDATE keywords SET claimed_at = ? "
+                    "WHERE keyword = ? AND (claimed_at IS NULL OR claimed_at <= ?)",
+                    (now, keyword, now - self.interval)
+                )
+                if cursor.rowcount:
+                    claimed.append(keyword)
+            self._conn.commit()
+        return claimed
+    
+    def _expire(self, now: float):
+        """删除过期关键词及只属于它们的视频（调用方持有锁）"""
+        expired = self._conn.execute(
+            "DELETE FROM keywords WHERE requested_at < ?", (now - self.max_idle,)
+        ).rowcount
+        expired += self._conn.execute(
+            "DELETE FROM keywords WHERE keyword NOT IN "
+            "(SELECT keyword FROM keywords ORDER BY requested_at DESC LIMIT ?)",
+            (self.max_keywords,)
+        ).rowcount
+        if not expired:
+            return
+        
+        self._conn.execute("DELETE FROM video_keywords WHERE keyword NOT IN (SELECT keyword FROM keywords)")
+        self._conn.execute("DELETE FROM videos WHERE bvid NOT IN (SELECT bvid FROM video_keywords)")
+        self._conn.execute("DELETE FROM snapshots WHERE bvid NOT IN (SELECT bvid FROM videos)")
+        self._conn.commit()
+        logger.info(f"停止追踪 {expired} 个长时间未请求的关键词")
+    
+    def _previous(self, bvids: List[str]) -> Dict[str, tuple]:
+        """读取视频上一次的互动量、速度和时间"""
+        previous = {}
+        for start in range(0, len(bvids), 500):
+            chunk = bvids[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT bvid, engagement, velocity, observed_at FROM videos "
+                f"WHERE bvid IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            previous.update({row[0]: row[1:] for row in rows})
+        return previous
+    
+    def _engagement(self, video: Dict[str, Any]) -> float:
+        views, likes, comments, danmaku = self.weights
+        return (
+            (video.get("play", 0) or 0) * views +
+            (video.get("like", 0) or 0) * likes +
+            (video.get("comment", 0) or 0) * comments +
+            (video.get("danmaku", 0) or 0) * danmaku
+        )
+    
+    def _velocity(
+        self,
+        video: Dict[str, Any],
+        engagement: float,
+        previous: Optional[tuple],
+        now: float
+    ) -> float:
+        """计算加权互动的每小时增长速度
+        
+        首次出现的视频用发布以来的平均速度估计；之后按两次快照的增量
+        计算，并与上一次的速度做指数平滑。
+        """
+        if previous is None or now <= previous[2]:
+            hours = max((now - (video.get("pubdate", 0) or 0)) / 3600, 1.0)
+            return engagement / hours
+        
+        last_engagement, last_velocity, observed_at = previous
+        rate = max(engagement - last_engagement, 0.0) / ((now - observed_at) / 3600)
+        return self.smoothing * rate + (1 - self.smoothing) * last_velocity
+
+
+@lru_cache()
+def get_hotspot_tracker() -> HotspotTracker:
+    """获取共享的热点追踪器"""
+    return HotspotTracker(get_tool(HotspotFinder), settings.data_dir / "hotspots.sqlite3")
@@ -0,0 +1,457 @@
+"""视频生成任务管理"""
+
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from ..core.config import VideoConfig, get_settings
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class VideoBackend(ABC):
+    """视频生成后端抽象基类
+    
+    远程生成是长时间运行的操作：``submit`` 返回操作ID，``poll`` 查询进度。
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    def submit(self, prompt: str, params: Dict[str, Any]) -> str:
+        """提交生成请求
+        
+        Args:
+            prompt: 视频提示词
+            params: 生成参数（时长、画幅等）
+        
+        Returns:
+            操作ID
+        """
+    
+    @abstractmethod
+    def poll(self, operation_id: str) -> Dict[str, Any]:
+        """查询操作状态
+        
+        Args:
+            operation_id: 操作ID
+        
+        Returns:
+            ``{"done": bool, "video_url": str, "error": str}``
+        """
+    
+    def download_headers(self) -> Optional[Dict[str, str]]:
+        """下载生成结果所需的请求头，返回None表示结果不可下载"""
+        return {}
+
+
+class FakeVideoBackend(VideoBackend):
+    """本地模拟后端，轮询指定次数后完成（用于测试和未配置密钥时）"""
+    
+    name = "fake"
+    
+    def __init__(self, polls: int = 2):
+        self.polls = polls
+        self._remaining: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, prompt: str, params: Dict[str, Any]) -> str:
+        operation_id = f"fake-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._remaining[operation_id] = self.polls
+        return operation_id
+    
+    def poll(self, operation_id: str) -> Dict[str, Any]:
+        # 重启后不认识的操作直接视为完成
+        with self._lock:
+            remaining = self._remaining.get(operation_id, 1) - 1
+            self._remaining[operation_id] = remaining
+        
+        if remaining > 0:
+            return {"done": False}
+        return {"done": True, "video_url": f"https://example.com/videos/mock_{operation_id}.mp4"}
+    
+    def download_headers(self) -> Optional[Dict[str, str]]:
+        # 模拟结果没有真实文件
+        return None
+
+
+class VeoBackend(VideoBackend):
+    """Gemini API 上的 Veo 长时间运行操作"""
+    
+    name = "veo"
+    
+    def __init__(self, api_key: str, config: VideoConfig):
+        self.model = config.model
+        self.headers = {"x-goog-api-key": api_key}
+        self.client = httpx.Client(
+            base_url=config.api_base.rstrip("/"),
+            headers=self.headers,
+            timeout=30
+        )
+    
+    def submit(self, prompt: str, params: Dict[str, Any]) -> str:
+        response = self.client.post(
+            f"/models/{self.model}:predictLongRunning",
+            json={"instances": [{"prompt": prompt}], "parameters": params}
+        )
+        response.raise_for_status()
+        return response.json()["name"]
+    
+    def poll(self, operation_id: str) -> Dict[str, Any]:
+        response = self.client.get(f"/{operation_id}")
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("done"):
+            return {"done": False}
+        
+        if data.get("error"):
+            return {"done": True, "error": data["error"].get("message", "视频生成失败")}
+        
+        samples = data.get("response", {}).get("generateVideoResponse", {}).get("generatedSamples", [])
+        if not samples:
+            return {"done": True, "error": "没有生成视频"}
+        return {"done": True, "video_url": samples[0].get("video", {}).get("uri", "")}
+    
+    def download_headers(self) -> Optional[Dict[str, str]]:
+        # 生成结果的下载地址同样需要API密钥
+        return self.headers
+
+
+class VideoJobManager:
+    """视频生成任务管理器
+    
+    任务持久化在SQLite中，后台线程负责提交和轮询：同时运行的远程操作
+    不超过 ``max_concurrent``，轮询间隔按 ``poll_backoff`` 逐次增大到
+    ``max_poll_interval``。重启后未完成的任务会继续提交或轮询。
+    """
+    
+    def __init__(self, backend: VideoBackend, path: Path, config: Optional[VideoConfig] = None):
+        config = config or settings.video
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self.path = path
+        self.max_concurrent = config.max_concurrent
+        self.poll_interval = config.poll_interval
+        self.max_poll_interval = config.max_poll_interval
+        self.poll_backoff = config.poll_backoff
+        self.timeout = config.timeout
+        self.params = {"aspectRatio": config.aspect_ratio}
+        
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS video_jobs (
+                job_id TEXT PRIMARY KEY,
+                task_id TEXT,
+                prompt TEXT NOT NULL,
+                status TEXT NOT NULL,
+                operation_id TEXT,
+                video_url TEXT,
+                error TEXT,
+                polls INTEGER NOT NULL DEFAULT 0,
+                next_poll_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_video_jobs_status ON video_jobs (status, created_at)")
+        self._conn.commit()
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """注册任务结束回调，参数为任务记录"""
+        self._listeners.append(listener)
+    
+    def submit(self, prompt: str, task_id: Optional[str] = None) -> str:
+        """提交视频生成任务（立即返回）
+        
+        Args:
+            prompt: 视频提示词
+            task_id: 关联的Agent任务ID
+        
+        Returns:
+            任务ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO video_jobs (job_id, task_id, prompt, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, task_id, prompt, now, now)
+            )
+            self._conn.commit()
+        
+        logger.info(f"视频任务 {job_id} 已提交")
+        self._notify()
+        return job_id
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM video_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待任务结束
+        
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待秒数
+        
+        Returns:
+            任务记录
+        
+        Raises:
+            TimeoutError: 超时仍未结束
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        with self._wakeup:
+            while True:
+                job = self.get(job_id)
+                if job is None:
+                    raise KeyError(job_id)
+                if job["status"] in FINISHED_STATUSES:
+                    return job
+                
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"视频任务 {job_id} 未在 {timeout} 秒内完成")
+                self._wakeup.wait(remaining)
+    
+    def counts(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM video_jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+    
+    def start(self):
+        """启动后台提交和轮询线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="video-jobs", daemon=True)
+        self._thread.start()
+        logger.info(f"视频任务管理器已启动，后端: {self.backend.name}")
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程，未完成的任务下次启动时继续"""
+        self._stopping = True
+        self._notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def run_once(self) -> float:
+        """执行一轮轮询和提交
+        
+        Returns:
+            距离下一次需要轮询的秒数
+        """
+        finished = self._poll_due() + self._start_queued()
+        
+        for job in finished:
+            for listener in self._listeners:
+                try:
+                    listener(job)
+                except Exception as e:
+                    logger.error(f"视频任务回调失败: {str(e)}", exc_info=True)
+        
+        if finished:
+            self._notify()
+        
+        with self._lock:
+            next_poll_at = self._conn.execute(
+                "SELECT MIN(next_poll_at) FROM video_jobs WHERE status = 'running'"
+            ).fetchone()[0]
+        
+        if next_poll_at is None:
+            return self.max_poll_interval
+        return max(next_poll_at - time.time(), 0.0)
+    
+    def _loop(self):
+        while not self._stopping:
+            try:
+                delay = self.run_once()
+            except Exception as e:
+                logger.error(f"视频任务轮询失败: {str(e)}", exc_info=True)
+                delay = self.poll_interval
+            
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(delay)
+    
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+    
+    def _poll_due(self) -> List[Dict[str, Any]]:
+        """轮询到期的运行中任务，返回本轮结束的任务"""
+        now = time.time()
+        with self._lock:
+            due = self._conn.execute(
+                "SELECT * FROM video_jobs WHERE status = 'running' AND next_poll_at <= ?", (now,)
+            ).fetchall()
+        
+        finished = []
+        for job in map(dict, due):
+            if not self._claim_poll(job, now):
+                continue
+            
+            try:
+                state = self.backend.poll(job["operation_id"])
+            except Exception as e:
+                # 轮询失败视为暂时性错误，退避后再试
+                logger.warning(f"视频任务 {job['job_id']} 轮询失败: {str(e)}")
+                state = {"done": False}
+            
+            if state.get("done"):
+                status = "failed" if state.get("error") else "completed"
+                finished.append(self._update(
+                    job["job_id"],
+                    status=status,
+                    video_url=state.get("video_url"),
+                    error=state.get("error"),
+                    polls=job["polls"] + 1
+                ))
+            elif now - (job["started_at"] or now) > self.timeout:
+                finished.append(self._update(job["job_id"], status="failed", error="视频生成超时"))
+            else:
+                interval = min(self.poll_interval * self.poll_backoff ** (job["polls"] + 1), self.max_poll_interval)
+                self._update(job["job_id"], polls=job["polls"] + 1, next_poll_at=now + interval)
+        
+        return finished
+    
+    def _claim_poll(self, job: Dict[str, Any], now: float) -> bool:
+        """领取一次轮询：把 next_poll_at 推后作为租约，其他进程不再重复轮询"""
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE video_jobs SET next_poll_at = ? "
+                "WHERE job_id = ? AND status = 'running' AND next_poll_at = ?",
+                (now + self.max_poll_interval, job["job_id"], job["next_poll_at"])
+            ).rowcount
+            self._conn.commit()
+        return claimed == 1
+    
+    def _claim(self, job_id: str) -> bool:
+        """把排队中的任务原子地标记为 ``submitting``
+        
+        多个进程的管理器共用同一个数据库，只有标记成功的进程才提交，
+        避免同一任务被重复提交到后端（消耗配额）。
+        """
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE video_jobs SET status = 'submitting', updated_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            ).rowcount
+            self._conn.commit()
+        return claimed == 1
+    
+    def _start_queued(self) -> List[Dict[str, Any]]:
+        """在并发上限内提交排队中的任务，返回提交失败的任务"""
+        with self._lock:
+            # 提交过程中进程退出的任务无法确认是否已提交，超时后标记失败
+            stale = self._conn.execute(
+                "SELECT job_id FROM video_jobs WHERE status = 'submitting' AND updated_at < ?",
+                (time.time() - self.timeout,)
+            ).fetchall()
+        failed = [self._update(row[0], status="failed", error="视频任务提交中断") for row in stale]
+        
+        with self._lock:
+            running = self._conn.execute(
+                "SELECT COUNT(*) FROM video_jobs WHERE status IN ('submitting', 'running')"
+            ).fetchone()[0]
+            queued = self._conn.execute(
+                "SELECT job_id, prompt FROM video_jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?",
+                (max(self.max_concurrent - running, 0),)
+            ).fetchall()
+        
+        for job_id, prompt in queued:
+            if not self._claim(job_id):
+                continue
+            
+            now = time.time()
+            try:
+                operation_id = self.backend.submit(prompt, self.params)
+            except Exception as e:
+                logger.error(f"视频任务 {job_id} 提交失败: {str(e)}")
+                failed.append(self._update(job_id, status="failed", error=str(e)))
+                continue
+            
+            self._update(
+                job_id,
+                status="running",
+                operation_id=operation_id,
+                started_at=now,
+                next_poll_at=now + self.poll_interval
+            )
+            logger.info(f"视频任务 {job_id} 开始生成: {operation_id}")
+        
+        return failed
+    
+    def _update(self, job_id: str, **fields) -> Dict[str, Any]:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE video_jobs SET {assignments} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT * FROM video_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row)
+
+
+def create_video_backend(config: Optional[VideoConfig] = None) -> VideoBackend:
+    """根据配置创建视频生成后端
+    
+    Args:
+        config: 视频配置，默认取自设置
+    
+    Returns:
+        ``backend`` 为 ``auto`` 时，配置了VEO密钥使用Veo，否则使用模拟后端
+    """
+    config = config or settings.video
+    
+    backend = config.backend
+    if backend == "auto":
+        backend = "veo" if settings.veo_api_key else "fake"
+    
+    if backend == "veo":
+        if not settings.veo_api_key:
+            raise ValueError("未配置VEO API密钥")
+        return VeoBackend(settings.veo_api_key, config)
+    
+    return FakeVideoBackend()
+
+
+@lru_cache()
+def get_video_job_manager() -> VideoJobManager:
+    """获取共享的视频任务管理器"""
+    return VideoJobManager(create_video_backend(), settings.data_dir / "video_jobs.sqlite3")
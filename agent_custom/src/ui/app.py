@@ -1,22 +1,33 @@
 """Flask + FastHTML应用主文件"""
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from fasthtml.common import *
 from datetime import datetime
-import uuid
+import queue
+import time
 
 from .components import (
     page_layout,
     navbar,
     hero_section,
-    task_card,
     create_modal,
-    stats_section,
+    live_updates,
     loading_spinner,
     alert
 )
-from ..agent.graph import create_agent_graph, run_agent
+from .fragments import render_task_card, render_stats, fragment_cache_stats
+from ..agent.graph import create_agent_graph
+from ..tasks.batch import TASK_TYPES, BatchScheduler, build_task
+from ..tasks.events import EventBus, format_sse
+from ..tasks.executor import TaskExecutor
+from ..tasks.store import create_task_store
+from ..tools.bilibili import get_bilibili_client
+from ..tools.breaker import breaker_stats
+from ..tools.cache import get_prompt_cache, get_response_cache
+from ..tools.tracker import get_hotspot_tracker
+from ..tools.assets import get_asset_store
+from ..tools.video_jobs import get_video_job_manager
 from ..core.config import get_settings
 from ..core.logger import setup_logger, get_logger
 
@@ -34,18 +45,116 @@ CORS(flask_app)
 # 创建Agent图
 agent_graph = create_agent_graph()
 
-# 任务存储（实际应用中应使用数据库）
-tasks_store = {}
+# 任务存储（后端由 tasks.store_backend 配置）
+tasks_store = create_task_store()
+
+# 后台任务执行器
+task_executor = TaskExecutor(agent_graph, tasks_store)
+
+# 批量任务调度（合并关键词搜索）
+batch_scheduler = BatchScheduler(task_executor, tasks_store)
+
+# 任务事件总线（SSE推送）
+event_bus = EventBus()
+
+# 后台热点追踪
+if settings.hotspot.tracker.enabled:
+    get_hotspot_tracker().track(settings.hotspot.keywords)
+    get_hotspot_tracker().start()
+
+
+def publish_task_update(task: dict):
+    """任务变更时推送任务卡片和统计（没有订阅者时不渲染）"""
+    if not event_bus.has_subscribers():
+        return
+    
+    event_bus.publish("task", render_task_card(task))
+    event_bus.publish("stats", render_stats(tasks_store.stats()))
+
+
+tasks_store.add_listener(publish_task_update)
+
+# 接管重启或进程回收前未完成的任务，并定期续期本进程任务的租约
+task_executor.start()
+
+
+def record_video_job(job: dict):
+    """视频任务结束时写回对应的Agent任务，并在后台下载视频到本地"""
+    update_task_video(job.get("task_id"), {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "url": job["video_url"],
+        "error": job["error"],
+    })
+    
+    headers = video_jobs.backend.download_headers()
+    if job["status"] != "completed" or not job["video_url"] or headers is None:
+        return
+    
+    def on_downloaded(future):
+        try:
+            asset = future.result()
+        except Exception as e:
+            logger.error(f"视频下载失败: {str(e)}")
+            return
+        update_task_video(job.get("task_id"), {"asset_id": asset["asset_id"], "local_url": f"/videos/{asset['asset_id']}"})
+    
+    asset_store.download_async(job["video_url"], headers).add_done_callback(on_downloaded)
+
+
+def update_task_video(task_id, fields: dict):
+    """合并更新任务的视频信息"""
+    task = tasks_store.get(task_id or "")
+    if task is None:
+        return
+    
+    task["video"] = {**(task.get("video") or {}), **fields}
+    task["updated_at"] = datetime.now()
+    tasks_store[task_id] = task
+
+
+# 本地视频存储
+asset_store = get_asset_store()
+
+
+# 视频生成任务管理器（启动时继续未完成的任务）
+video_jobs = get_video_job_manager()
+video_jobs.add_listener(record_video_job)
+video_jobs.start()
+
+
+def conditional_fragment(etag: str, render):
+    """按ETag返回HTML片段，客户端缓存未过期时返回304
+    
+    Args:
+        etag: 片段的实体标签
+        render: 生成片段HTML的函数（仅在需要时调用）
+    """
+    if request.if_none_match.contains(etag):
+        response = flask_app.response_class(status=304)
+    else:
+        response = flask_app.response_class(render(), mimetype="text/html")
+    
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 def create_app():
     """创建并配置应用"""
     
+    # 路由已注册时直接返回（支持重复调用）
+    if "index" in flask_app.view_functions:
+        return flask_app
+    
     # ========== FastHTML路由 ==========
     
     @flask_app.route("/")
     def index():
         """首页"""
+        # SSE只推送本进程的事件，多进程部署时由低频轮询（ETag命中时返回304）补齐
+        poll_trigger = f"load, refresh, every {settings.tasks.poll_interval}s"
+        
         content = [
             navbar(),
             hero_section(),
@@ -54,7 +163,7 @@ def create_app():
             # 统计区域
             Div(
                 H2("任务统计", cls="text-3xl font-bold mb-4"),
-                Div(id="stats_section", hx_get="/api/stats", hx_trigger="load, every 5s"),
+                Div(id="stats_section", hx_get="/api/stats", hx_trigger=poll_trigger),
                 cls="container mx-auto p-4"
             ),
             
@@ -64,11 +173,14 @@ def create_app():
                 Div(
                     id="task_list",
                     hx_get="/api/tasks",
-                    hx_trigger="load, every 10s",
+                    hx_trigger=poll_trigger,
                     cls="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4"
                 ),
                 cls="container mx-auto p-4"
-            )
+            ),
+            
+            # SSE实时更新
+            live_updates()
         ]
         
         html = page_layout("VideoAgent - AI视频创作助手", *content)
@@ -80,25 +192,20 @@ def create_app():
     def get_tasks():
         """获取任务列表"""
         try:
-            # 按创建时间倒序
-            sorted_tasks = sorted(
-                tasks_store.values(),
-                key=lambda x: x.get("created_at", datetime.min),
-                reverse=True
-            )
-            
-            # 返回前20个
-            tasks = sorted_tasks[:20]
-            
-            # 生成任务卡片HTML
-            cards = [task_card(task) for task in tasks]
-            
-            if not cards:
-                return to_xml(Div(
-                    P("暂无任务", cls="text-center text-base-content/50 py-8"),
-                ))
+            def render():
+                # 最新的20个任务（按创建时间索引倒序）
+                tasks = tasks_store.recent(20)
+                
+                if not tasks:
+                    return to_xml(Div(
+                        P("暂无任务", cls="text-center text-base-content/50 py-8"),
+                        id="task_list_empty"
+                    ))
+                
+                # 生成任务卡片HTML（按任务更新时间缓存）
+                return "".join(render_task_card(task) for task in tasks)
             
-            return to_xml(Group(*cards))
+            return conditional_fragment(f'tasks-{tasks_store.version()}', render)
             
         except Exception as e:
             logger.error(f"获取任务列表失败: {str(e)}")
@@ -113,64 +220,80 @@ def create_app():
             keywords_str = request.form.get("keywords", "")
             user_input = request.form.get("user_input", "")
             
-            # 解析关键词
-            keywords = [k.strip() for k in keywords_str.split(",") if k.strip()]
-            
-            if not keywords:
-                keywords = ["AI", "科技"]
-            
-            # 创建任务ID
-            task_id = str(uuid.uuid4())
-            
-            # 初始化任务
-            task = {
-                "id": task_id,
-                "title": f"任务 - {', '.join(keywords[:3])}",
-                "description": user_input or "自动生成视频",
-                "status": "pending",
-                "task_type": task_type,
-                "keywords": keywords,
-                "user_input": user_input,
-                "created_at": datetime.now(),
-                "updated_at": datetime.now(),
-                "result": None,
-                "error": None
-            }
+            # 初始化任务（关键词为空时使用默认关键词）
+            task = build_task(task_type, keywords_str.split(","), user_input)
+            task_id = task["id"]
             
             tasks_store[task_id] = task
             
-            # 异步执行任务（这里简化为同步）
-            try:
-                task["status"] = "running"
-                task["updated_at"] = datetime.now()
-                
-                # 运行Agent
-                result = run_agent(
-                    agent_graph,
-                    user_input=user_input,
-                    task_type=task_type,
-                    task_id=task_id,
-                    keywords=keywords
-                )
-                
-                task["status"] = "completed" if result.get("completed") else "failed"
-                task["result"] = result
-                task["error"] = result.get("error")
-                task["updated_at"] = datetime.now()
-                
-            except Exception as e:
-                logger.error(f"任务执行失败: {str(e)}")
-                task["status"] = "failed"
-                task["error"] = str(e)
-                task["updated_at"] = datetime.now()
+            # 渲染待处理卡片后提交到后台执行
+            card = render_task_card(task)
+            task_executor.submit(task_id)
             
             # 返回新任务卡片
-            return to_xml(task_card(task))
+            return card
             
         except Exception as e:
             logger.error(f"创建任务失败: {str(e)}")
             return to_xml(alert(f"创建失败: {str(e)}", "error"))
     
+    @flask_app.route("/api/tasks/batch", methods=["POST"])
+    def create_batch():
+        """批量创建任务（重叠的关键词只搜索一次）"""
+        payload = request.get_json(silent=True) or {}
+        specs = payload.get("tasks")
+        
+        if not isinstance(specs, list) or not specs:
+            return jsonify({"error": "tasks 必须是非空列表"}), 400
+        
+        if len(specs) > settings.tasks.max_batch_size:
+            return jsonify({"error": f"单个批次最多 {settings.tasks.max_batch_size} 个任务"}), 400
+        
+        for spec in specs:
+            if not isinstance(spec, dict):
+                return jsonify({"error": "任务参数必须是对象"}), 400
+            if spec.get("task_type", "complete") not in TASK_TYPES:
+                return jsonify({"error": f"task_type 必须是 {', '.join(TASK_TYPES)} 之一"}), 400
+            if not isinstance(spec.get("user_input", ""), str):
+                return jsonify({"error": "user_input 必须是字符串"}), 400
+            
+            keywords = spec.get("keywords")
+            if isinstance(keywords, str):
+                spec["keywords"] = keywords.split(",")
+            elif keywords is not None and not (
+                isinstance(keywords, list) and all(isinstance(k, str) for k in keywords)
+            ):
+                return jsonify({"error": "keywords 必须是字符串列表或逗号分隔的字符串"}), 400
+        
+        return jsonify(batch_scheduler.submit(specs)), 202
+    
+    @flask_app.route("/api/batches/<batch_id>", methods=["GET"])
+    def get_batch(batch_id: str):
+        """获取批次进度"""
+        batch = batch_scheduler.get(batch_id)
+        
+        if not batch:
+            return jsonify({"error": "批次不存在"}), 404
+        
+        return jsonify(batch)
+    
+    @flask_app.route("/api/tasks/<task_id>/retry", methods=["POST"])
+    def retry_task(task_id: str):
+        """重试失败的任务（从检查点恢复，复用已完成步骤的结果）"""
+        task = tasks_store.get(task_id)
+        
+        if not task:
+            return jsonify({"error": "任务不存在"}), 404
+        if task.get("status") != "failed":
+            return jsonify({"error": "只能重试失败的任务"}), 409
+        
+        task.update(status="pending", error=None, updated_at=datetime.now())
+        tasks_store[task_id] = task
+        
+        card = render_task_card(task)
+        task_executor.submit(task_id, resume=True)
+        return card
+    
     @flask_app.route("/api/tasks/<task_id>", methods=["GET"])
     def get_task(task_id: str):
         """获取任务详情"""
@@ -181,30 +304,87 @@ def create_app():
         
         return jsonify(task)
     
+    @flask_app.route("/api/video-jobs/<job_id>", methods=["GET"])
+    def get_video_job(job_id: str):
+        """获取视频生成任务状态"""
+        job = video_jobs.get(job_id)
+        
+        if not job:
+            return jsonify({"error": "视频任务不存在"}), 404
+        
+        return jsonify(job)
+    
+    @flask_app.route("/videos/<asset_id>", methods=["GET"])
+    def serve_video(asset_id: str):
+        """播放本地视频（支持Range请求）"""
+        asset = asset_store.get(asset_id)
+        
+        if not asset:
+            return jsonify({"error": "视频不存在"}), 404
+        
+        return send_file(asset["path"], mimetype=asset["content_type"], conditional=True, max_age=86400)
+    
     @flask_app.route("/api/stats", methods=["GET"])
     def get_stats():
         """获取统计信息"""
         try:
-            stats = {
-                "total": len(tasks_store),
-                "pending": sum(1 for t in tasks_store.values() if t["status"] == "pending"),
-                "running": sum(1 for t in tasks_store.values() if t["status"] == "running"),
-                "completed": sum(1 for t in tasks_store.values() if t["status"] == "completed"),
-                "failed": sum(1 for t in tasks_store.values() if t["status"] == "failed")
-            }
-            
-            return to_xml(stats_section(stats))
+            return conditional_fragment(
+                f'stats-{tasks_store.version()}',
+                lambda: render_stats(tasks_store.stats())
+            )
             
         except Exception as e:
             logger.error(f"获取统计失败: {str(e)}")
             return to_xml(alert(f"加载失败: {str(e)}", "error"))
     
+    @flask_app.route("/api/events", methods=["GET"])
+    def events():
+        """任务和统计更新的SSE推送
+        
+        连接保持 ``tasks.stream_timeout`` 秒后结束，浏览器按 ``retry``
+        自动重连，避免长连接一直占用工作线程。
+        """
+        subscriber = event_bus.subscribe()
+        deadline = time.monotonic() + settings.tasks.stream_timeout
+        
+        def stream():
+            try:
+                yield ": connected\n\n"
+                yield "retry: 3000\n\n"
+                while time.monotonic() < deadline:
+                    try:
+                        event, data = subscriber.get(timeout=min(15, max(deadline - time.monotonic(), 0.1)))
+                    except queue.Empty:
+                        # 心跳，保持连接并及时发现断开的客户端
+                        yield ": keepalive\n\n"
+                        continue
+                    yield format_sse(event, data)
+            finally:
+                event_bus.unsubscribe(subscriber)
+        
+        return flask_app.response_class(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    @flask_app.route("/api/cache/stats", methods=["GET"])
+    def get_cache_stats():
+        """获取缓存统计"""
+        return jsonify({
+            "responses": get_response_cache().stats(),
+            "prompts": get_prompt_cache().stats(),
+            "fragments": fragment_cache_stats(),
+            "inflight": get_bilibili_client().inflight.stats()
+        })
+    
     @flask_app.route("/health", methods=["GET"])
     def health():
         """健康检查"""
         return jsonify({
             "status": "healthy",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "backends": breaker_stats()
         })
     
     return flask_app
@@ -98,6 +98,22 @@ def task_card(task: dict):
         "failed": "badge-error"
     }
     
+    # 生成中显示流式输出的部分提示词，完成后显示最终提示词
+    prompt_text = (task.get("result") or {}).get("prompt_text") or task.get("partial_prompt")
+    
+    # 视频在后台生成，结束后写入 task["video"]
+    video = task.get("video") or {}
+    if video.get("local_url"):
+        video_info = Video(src=video["local_url"], controls=True, preload="metadata", cls="w-full rounded mt-2")
+    elif video.get("url"):
+        video_info = A("查看视频", href=video["url"], target="_blank", cls="link link-primary text-sm")
+    elif video.get("error"):
+        video_info = P(f"视频生成失败: {video['error']}", cls="text-sm text-error")
+    elif (task.get("result") or {}).get("video_job_id"):
+        video_info = P("视频生成中…", cls="text-sm text-base-content/70")
+    else:
+        video_info = None
+    
     return Div(
         Div(
             # 卡片标题
@@ -109,6 +125,8 @@ def task_card(task: dict):
             ),
             # 任务信息
             P(task.get("description", ""), cls="text-sm text-base-content/70"),
+            P(prompt_text, cls="text-sm whitespace-pre-wrap bg-base-200 rounded p-2 mt-2") if prompt_text else None,
+            video_info,
             Div(
                 Span(f"创建时间: {task.get('created_at', '')}", cls="text-xs"),
                 cls="mt-2"
@@ -116,11 +134,18 @@ def task_card(task: dict):
             # 操作按钮
             Div(
                 Button("查看详情", cls="btn btn-sm btn-primary"),
-                Button("重试", cls="btn btn-sm btn-ghost") if task.get("status") == "failed" else None,
+                Button(
+                    "重试",
+                    cls="btn btn-sm btn-ghost",
+                    hx_post=f"/api/tasks/{task.get('id', '')}/retry",
+                    hx_target=f"#task_{task.get('id', '')}",
+                    hx_swap="outerHTML"
+                ) if task.get("status") == "failed" else None,
                 cls="card-actions justify-end mt-4"
             ),
             cls="card-body"
         ),
+        id=f"task_{task.get('id', '')}",
         cls="card bg-base-100 shadow-xl hover:shadow-2xl transition-shadow"
     )
 
@@ -233,6 +258,66 @@ def stats_section(stats: dict):
     )
 
 
+def live_updates(events_url: str = "/api/events"):
+    """实时更新脚本
+    
+    通过SSE接收服务端推送：``task`` 事件替换或插入对应任务卡片，
+    ``stats`` 事件替换统计区域。断线重连后重新加载列表以补齐遗漏的更新；
+    其他进程的更新由列表和统计区域的低频轮询补齐。
+    """
+    return Script(f"""
+        (function () {{
+            // 创建任务的响应和SSE推送可能先后插入同一张卡片，保留较新的一张
+            document.body.addEventListener("htmx:afterSwap", function (e) {{
+                if (e.detail.target.id !== "task_list") return;
+                var cards = e.detail.target.querySelectorAll(".card[id^='task_']");
+                var seen = {{}};
+                for (var i = cards.length - 1; i >= 0; i--) {{
+                    if (seen[cards[i].id]) cards[i].remove();
+                    seen[cards[i].id] = true;
+                }}
+                var empty = document.getElementById("task_list_empty");
+                if (empty && cards.length) empty.remove();
+            }});
+            
+            if (!window.EventSource) return;
+            var source = new EventSource("{events_url}");
+            var opened = false;
+            
+            source.addEventListener("open", function () {{
+                if (opened) {{
+                    htmx.trigger("#task_list", "refresh");
+                    htmx.trigger("#stats_section", "refresh");
+                }}
+                opened = true;
+            }});
+            
+            source.addEventListener("task", function (e) {{
+                var tpl = document.createElement("template");
+                tpl.innerHTML = e.data.trim();
+                var card = tpl.content.firstElementChild;
+                if (!card) return;
+                
+                var old = document.getElementById(card.id);
+                if (old) {{
+                    old.replaceWith(card);
+                }} else {{
+                    var empty = document.getElementById("task_list_empty");
+                    if (empty) empty.remove();
+                    document.getElementById("task_list").prepend(card);
+                }}
+                htmx.process(card);
+            }});
+            
+            source.addEventListener("stats", function (e) {{
+                var target = document.getElementById("stats_section");
+                target.innerHTML = e.data;
+                htmx.process(target);
+            }});
+        }})();
+    """)
+
+
 def loading_spinner():
     """加载动画"""
     return Div(
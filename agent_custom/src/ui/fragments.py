@@ -0,0 +1,55 @@
+"""HTML片段渲染缓存"""
+
+import json
+from datetime import datetime
+
+from fasthtml.common import to_xml
+
+from .components import task_card, stats_section
+from ..tools.cache import TTLCache
+
+# 渲染结果缓存：任务卡片按 (任务ID, 更新时间) 缓存，统计按计数缓存
+_fragments = TTLCache(max_entries=1024, default_ttl=3600)
+
+
+def render_task_card(task: dict) -> str:
+    """渲染任务卡片（带缓存）
+    
+    Args:
+        task: 任务数据
+        
+    Returns:
+        卡片HTML
+    """
+    updated_at = task.get("updated_at")
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    
+    key = f"task:{task.get('id')}:{updated_at}:{task.get('status')}"
+    html = _fragments.get(key)
+    if html is None:
+        html = to_xml(task_card(task))
+        _fragments.set(key, html)
+    return html
+
+
+def render_stats(stats: dict) -> str:
+    """渲染统计组件（带缓存）
+    
+    Args:
+        stats: 统计数据
+        
+    Returns:
+        统计组件HTML
+    """
+    key = f"stats:{json.dumps(stats, sort_keys=True)}"
+    html = _fragments.get(key)
+    if html is None:
+        html = to_xml(stats_section(stats))
+        _fragments.set(key, html)
+    return html
+
+
+def fragment_cache_stats() -> dict:
+    """获取片段缓存统计"""
+    return _fragments.stats()
@@ -0,0 +1,234 @@
+"""工作流测试"""
+
+import asyncio
+import threading
+
+import pytest
+from src.agent import nodes
+from src.agent.graph import arun_agent, create_agent_graph, run_agent
+from src.tools.analyzer import VideoAnalyzer
+from src.tools.breaker import get_circuit_breaker, reset_breakers
+from src.tools.generator import PromptGenerator, VideoGenerator
+from src.tools.hotspot import HotspotFinder
+
+
+class FakeFinder:
+    def find_hotspots(self, keywords, top_k=10):
+        return [
+            {'bvid': f'BV{i}', 'title': f'视频{i}', 'hotspot_score': 10 - i}
+            for i in range(5)
+        ]
+    
+    async def afind_hotspots(self, keywords, top_k=10):
+        return self.find_hotspots(keywords, top_k)
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.analyzed = []
+        self.lock = threading.Lock()
+    
+    def analyze(self, video):
+        with self.lock:
+            self.analyzed.append(video['bvid'])
+        return {
+            'insights': {'bvid': video['bvid'], 'title': video['title'], 'tags': [video['bvid']]},
+            'comments': {
+                'total': 2,
+                'hot_comments': [{'content': video['bvid'], 'like': 1}],
+                'keywords': [video['bvid']],
+                'texts': [f"共同 {video['bvid']}", '共同'],
+            },
+        }
+    
+    async def aanalyze(self, video):
+        await asyncio.sleep(0)
+        return self.analyze(video)
+
+
+class FakePromptGenerator:
+    def __init__(self):
+        self.calls = []
+    
+    def generate_prompt(self, video_insights, comments_analysis, user_input='', on_token=None):
+        self.calls.append((video_insights, comments_analysis))
+        if on_token is not None:
+            on_token('提示')
+        return {'text': '提示词', 'json': {}}
+    
+    async def agenerate_prompt(self, video_insights, comments_analysis, user_input='', on_token=None):
+        return self.generate_prompt(video_insights, comments_analysis, user_input, on_token)
+
+
+class FakeVideoGenerator:
+    def submit_video(self, prompt, task_id=None):
+        return 'job_1'
+
+
+@pytest.fixture
+def tools(monkeypatch, checkpoints):
+    """替换节点使用的工具实例"""
+    fakes = {
+        HotspotFinder: FakeFinder(),
+        VideoAnalyzer: FakeAnalyzer(),
+        PromptGenerator: FakePromptGenerator(),
+        VideoGenerator: FakeVideoGenerator(),
+    }
+    monkeypatch.setattr(nodes, 'get_tool', lambda cls: fakes[cls])
+    reset_breakers()
+    yield fakes
+    reset_breakers()
+
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    """使用临时目录中的检查点存储"""
+    import src.agent.graph as graph_module
+    from src.agent.checkpoint import CheckpointStore
+    
+    store = CheckpointStore(tmp_path / 'checkpoints.sqlite3')
+    monkeypatch.setattr(graph_module, 'get_checkpoint_store', lambda: store)
+    monkeypatch.setattr(nodes, 'get_checkpoint_store', lambda: store)
+    return store
+
+
+def test_fanout_analysis(tools, monkeypatch):
+    """测试前N个热点视频并行分析并汇总"""
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 3)
+    
+    result = run_agent(create_agent_graph(), '测试', task_type='hotspot', keywords=['AI'])
+    
+    assert sorted(tools[VideoAnalyzer].analyzed) == ['BV0', 'BV1', 'BV2']
+    assert result['selected_video']['bvid'] == 'BV0'
+    assert result['video_insights']['tags'] == ['BV0', 'BV1', 'BV2']
+    assert result['comments_analysis']['total'] == 6
+    # 所有视频的评论合并计算TF-IDF
+    assert result['comments_analysis']['keywords'][0] == '共同'
+    assert len(result['video_analyses']) == 3
+    assert not any('texts' in a['comments'] for a in result['video_analyses'])
+    assert len(tools[PromptGenerator].calls) == 1
+    assert result['video_job_id'] == 'job_1'
+    assert not result.get('error')
+
+
+def test_single_analysis(tools, monkeypatch):
+    """测试关闭并行分析时只分析第一个视频"""
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 1)
+    
+    result = run_agent(create_agent_graph(), '测试', task_type='hotspot', keywords=['AI'])
+    
+    assert tools[VideoAnalyzer].analyzed == ['BV0']
+    assert result['video_insights']['bvid'] == 'BV0'
+    assert 'texts' not in result['comments_analysis']
+
+
+def test_open_breaker_fails_fast(tools, monkeypatch):
+    """测试B站熔断时节点直接失败，不调用工具"""
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 1)
+    breaker = get_circuit_breaker('bilibili', nodes.settings.bilibili.breaker)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    
+    result = run_agent(create_agent_graph(), '测试', task_type='hotspot', keywords=['AI'])
+    
+    assert '熔断' in result['error']
+    assert tools[VideoAnalyzer].analyzed == []
+
+
+def test_breaker_recovers_through_node(tools, monkeypatch):
+    """测试熔断到期后节点放行，由客户端的试探请求恢复熔断器"""
+    import requests
+    from src.tools.bilibili import BilibiliClient
+    
+    client = BilibiliClient()
+    client.cache = None
+    
+    def fake_get(url, params=None, timeout=None):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"code": 0, "data": {"result": []}}'
+        return response
+    
+    monkeypatch.setattr(client.session, 'get', fake_get)
+    
+    class ClientFinder:
+        def find_hotspots(self, keywords, top_k=10):
+            client.get('/x/web-interface/search/type', {'keyword': keywords[0]})
+            return [{'bvid': 'BV0', 'title': '视频0', 'hotspot_score': 1}]
+    
+    tools[HotspotFinder] = ClientFinder()
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 1)
+    
+    breaker = client.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    # 熔断到期
+    breaker._opened_at -= breaker.reset_timeout
+    
+    result = run_agent(create_agent_graph(), '测试', task_type='hotspot', keywords=['AI'])
+    
+    assert not result.get('error')
+    assert breaker.state == 'closed'
+
+
+def test_streaming_callback(tools):
+    """测试提示词流式回调经由run_agent传到生成节点"""
+    tokens = []
+    
+    run_agent(create_agent_graph(), '测试', task_type='generate', on_token=tokens.append)
+    
+    assert tokens == ['提示']
+
+
+def test_resume_from_checkpoint(tools, checkpoints, monkeypatch):
+    """测试重试时复用已完成节点的结果"""
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 2)
+    task_id = 'test_resume'
+    
+    class FlakyVideoGenerator:
+        calls = 0
+        
+        def submit_video(self, prompt, task_id=None):
+            FlakyVideoGenerator.calls += 1
+            if FlakyVideoGenerator.calls == 1:
+                raise RuntimeError('VEO不可用')
+            return 'job_retry'
+    
+    tools[VideoGenerator] = FlakyVideoGenerator()
+    graph = create_agent_graph()
+    
+    first = run_agent(graph, '测试', task_type='hotspot', task_id=task_id, keywords=['AI'])
+    assert first['error'] == 'VEO不可用'
+    assert len(tools[VideoAnalyzer].analyzed) == 2
+    
+    second = run_agent(graph, '测试', task_type='hotspot', task_id=task_id, keywords=['AI'], resume=True)
+    
+    assert not second.get('error')
+    assert second['video_job_id'] == 'job_retry'
+    assert second['video_insights']['bvid'] == 'BV0'
+    assert len(tools[VideoAnalyzer].analyzed) == 2
+    assert len(tools[PromptGenerator].calls) == 1
+    
+    checkpoints.clear(task_id)
+    assert checkpoints.load(task_id) == {}
+
+
+def test_async_graph(tools, monkeypatch):
+    """测试异步工作流与同步工作流结果一致"""
+    monkeypatch.setattr(nodes.settings.analysis, 'fanout_top_n', 3)
+    tokens = []
+    
+    result = asyncio.run(arun_agent(
+        create_agent_graph(use_async=True),
+        '测试',
+        task_type='hotspot',
+        keywords=['AI'],
+        on_token=tokens.append
+    ))
+    
+    assert sorted(tools[VideoAnalyzer].analyzed) == ['BV0', 'BV1', 'BV2']
+    assert result['video_insights']['tags'] == ['BV0', 'BV1', 'BV2']
+    assert result['prompt_text'] == '提示词'
+    assert result['video_job_id'] == 'job_1'
+    assert tokens == ['提示']
+    assert not result.get('error')
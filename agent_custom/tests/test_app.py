@@ -1,13 +1,55 @@
 """应用测试"""
 
 import pytest
-from src.ui.app import create_app
+
+
+class FakeGraph:
+    """模拟工作流图，后台任务不访问网络"""
+    
+    def invoke(self, state, config=None):
+        return {**state, "completed": True, "prompt_text": "测试提示词"}
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    """在临时数据目录中导入应用模块
+    
+    应用在导入时创建任务存储、检查点、视频任务和缓存等SQLite文件，
+    先把数据目录指向临时目录并清空共享实例，避免写入 ./data。
+    """
+    from src.agent.checkpoint import get_checkpoint_store
+    from src.core.config import get_settings
+    from src.tools.assets import get_asset_store
+    from src.tools.cache import get_prompt_cache, get_response_cache
+    from src.tools.video_jobs import get_video_job_manager
+    
+    getters = (get_checkpoint_store, get_asset_store, get_prompt_cache, get_response_cache, get_video_job_manager)
+    data_dir = tmp_path_factory.mktemp('data')
+    settings = get_settings()
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, 'data_dir', data_dir)
+        mp.setattr(settings, 'videos_dir', data_dir / 'videos')
+        mp.setattr(settings.tasks, 'store_path', str(data_dir / 'tasks.sqlite3'))
+        mp.setattr(settings.hotspot.tracker, 'enabled', False)
+        for getter in getters:
+            getter.cache_clear()
+        
+        from src.ui import app as app_module
+        mp.setattr(app_module.task_executor, 'graph', FakeGraph())
+        yield app_module
+        
+        app_module.task_executor.shutdown()
+        app_module.video_jobs.stop(timeout=5)
+    
+    for getter in getters:
+        getter.cache_clear()
 
 
 @pytest.fixture
-def app():
+def app(app_module):
     """创建测试应用"""
-    app = create_app()
+    app = app_module.create_app()
     app.config['TESTING'] = True
     return app
 
@@ -39,6 +81,7 @@ def test_create_task(client):
         'user_input': '测试任务'
     })
     assert response.status_code == 200
+    assert 'pending' in response.get_data(as_text=True)
 
 
 def test_get_stats(client):
@@ -46,3 +89,113 @@ def test_get_stats(client):
     response = client.get('/api/stats')
     assert response.status_code == 200
 
+
+
+def test_cache_stats(client):
+    """测试缓存统计"""
+    response = client.get('/api/cache/stats')
+    assert response.status_code == 200
+    assert 'hits' in response.json['prompts']
+
+
+def test_task_events(client):
+    """测试任务变更通过事件总线推送"""
+    from src.ui.app import event_bus
+    
+    subscriber = event_bus.subscribe()
+    try:
+        client.post('/api/tasks', data={'task_type': 'hotspot', 'keywords': 'AI'})
+        event, data = subscriber.get(timeout=5)
+        assert event == 'task'
+        assert 'task_' in data
+        event, data = subscriber.get(timeout=5)
+        assert event == 'stats'
+    finally:
+        event_bus.unsubscribe(subscriber)
+
+
+def test_events_stream(client):
+    """测试SSE端点"""
+    response = client.get('/api/events')
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response) == b': connected\n\n'
+    response.close()
+
+
+def test_events_stream_ends(client, monkeypatch):
+    """测试SSE连接到期后结束，首页保留低频轮询"""
+    from src.ui import app as app_module
+    
+    monkeypatch.setattr(app_module.settings.tasks, 'stream_timeout', 0)
+    response = client.get('/api/events')
+    assert b''.join(response.response) == b': connected\n\nretry: 3000\n\n'
+    
+    poll = f'every {app_module.settings.tasks.poll_interval}s'
+    assert poll in client.get('/').get_data(as_text=True)
+
+
+def test_fragment_etag(client, monkeypatch):
+    """测试片段路由的ETag条件请求"""
+    from src.ui import app as app_module
+    
+    # 固定版本号，避免后台任务的写入影响断言
+    monkeypatch.setattr(app_module.tasks_store, 'version', lambda: 1)
+    
+    for url in ('/api/tasks', '/api/stats'):
+        response = client.get(url)
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+
+
+def test_create_batch_validation(client):
+    """测试批量创建接口的参数校验"""
+    for spec in ({'keywords': 5}, {'keywords': ['AI', 1]}, {'task_type': 'unknown'}, {'user_input': {}}):
+        response = client.post('/api/tasks/batch', json={'tasks': [spec]})
+        assert response.status_code == 400
+    
+    response = client.post('/api/tasks/batch', json={'tasks': [{'task_type': 'complete', 'keywords': 'AI,科技'}]})
+    assert response.status_code == 202
+    assert response.json['total'] == 1
+
+
+def test_retry_requires_failed_task(client):
+    """测试只能重试失败的任务"""
+    assert client.post('/api/tasks/missing/retry').status_code == 404
+    
+    response = client.post('/api/tasks', data={'task_type': 'hotspot', 'keywords': 'AI'})
+    task_id = response.get_data(as_text=True).split('id="task_')[1].split('"')[0]
+    
+    from src.ui.app import tasks_store
+    task = tasks_store[task_id]
+    task['status'] = 'completed'
+    tasks_store[task_id] = task
+    
+    assert client.post(f'/api/tasks/{task_id}/retry').status_code == 409
+
+
+def test_serve_video_range(client, tmp_path, monkeypatch):
+    """测试本地视频支持Range请求"""
+    import httpx
+    from src.tools.assets import VideoAssetStore
+    from src.ui import app as app_module
+    
+    content = bytes(range(256)) * 4
+    store = VideoAssetStore(
+        tmp_path,
+        client=httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=content, headers={'Content-Type': 'video/mp4'})
+        ))
+    )
+    asset = store.download('https://example.com/v.mp4')
+    monkeypatch.setattr(app_module, 'asset_store', store)
+    
+    response = client.get(f"/videos/{asset['asset_id']}", headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == content[100:200]
+    assert response.headers['Content-Type'] == 'video/mp4'
+    
+    assert client.get('/videos/missing').status_code == 404
@@ -0,0 +1,437 @@
+"""任务管理测试"""
+
+import pytest
+from src.tasks.executor import TaskExecutor
+
+
+class FakeGraph:
+    """模拟工作流图"""
+    
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+    
+    def invoke(self, state, config=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("模拟失败")
+        return {**state, "completed": True, "prompt_text": "测试提示词"}
+
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    """使用临时目录中的检查点存储"""
+    import src.agent.graph as graph_module
+    import src.agent.nodes as nodes_module
+    import src.tasks.batch as batch_module
+    import src.tasks.executor as executor_module
+    from src.agent.checkpoint import CheckpointStore
+    
+    store = CheckpointStore(tmp_path / "checkpoints.sqlite3")
+    for module in (graph_module, nodes_module, batch_module, executor_module):
+        monkeypatch.setattr(module, "get_checkpoint_store", lambda: store)
+    return store
+
+
+def make_task(task_id: str) -> dict:
+    return {
+        "id": task_id,
+        "status": "pending",
+        "task_type": "complete",
+        "keywords": ["AI"],
+        "user_input": "测试",
+    }
+
+
+def test_executor_runs_in_background(checkpoints):
+    """测试后台执行任务"""
+    store = {"t1": make_task("t1")}
+    executor = TaskExecutor(FakeGraph(), store, max_workers=2, retry_delay=0)
+    
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert store["t1"]["status"] == "completed"
+    assert store["t1"]["result"]["prompt_text"] == "测试提示词"
+
+
+def test_executor_retries(checkpoints):
+    """测试失败重试"""
+    graph = FakeGraph(failures=1)
+    store = {"t1": make_task("t1")}
+    executor = TaskExecutor(graph, store, max_retries=2, retry_delay=0)
+    
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert graph.calls == 2
+    assert store["t1"]["status"] == "completed"
+    assert store["t1"]["attempts"] == 2
+
+
+def test_executor_retries_node_failure(checkpoints, monkeypatch):
+    """测试节点失败（工作流正常结束但带有 error）时自动重试并从检查点恢复"""
+    from src.agent import nodes
+    from src.agent.graph import create_agent_graph
+    from src.tools.analyzer import VideoAnalyzer
+    from src.tools.generator import PromptGenerator, VideoGenerator
+    from src.tools.hotspot import HotspotFinder
+    
+    calls = {"find": 0, "submit": 0}
+    
+    class Finder:
+        def find_hotspots(self, keywords, top_k=10):
+            calls["find"] += 1
+            return [{"bvid": "BV0", "title": "视频"}]
+    
+    class Analyzer:
+        def analyze(self, video):
+            return {"insights": {"bvid": video["bvid"], "tags": []}, "comments": {"keywords": []}}
+    
+    class Prompts:
+        def generate_prompt(self, **kwargs):
+            return {"text": "提示", "json": {}}
+    
+    class Videos:
+        def submit_video(self, prompt, task_id=None):
+            calls["submit"] += 1
+            if calls["submit"] == 1:
+                raise RuntimeError("VEO不可用")
+            return "job_1"
+    
+    fakes = {HotspotFinder: Finder(), VideoAnalyzer: Analyzer(), PromptGenerator: Prompts(), VideoGenerator: Videos()}
+    monkeypatch.setattr(nodes, "get_tool", lambda cls: fakes[cls])
+    monkeypatch.setattr(nodes.settings.analysis, "fanout_top_n", 1)
+    
+    store = {"t1": {**make_task("t1"), "task_type": "hotspot"}}
+    executor = TaskExecutor(create_agent_graph(), store, max_retries=2, retry_delay=0)
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert store["t1"]["status"] == "completed"
+    assert store["t1"]["attempts"] == 2
+    assert calls == {"find": 1, "submit": 2}
+    assert checkpoints.load("t1") == {}
+
+
+def test_executor_gives_up(checkpoints):
+    """测试超过重试次数后标记失败"""
+    graph = FakeGraph(failures=10)
+    store = {"t1": make_task("t1")}
+    executor = TaskExecutor(graph, store, max_retries=1, retry_delay=0)
+    
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert graph.calls == 2
+    assert store["t1"]["status"] == "failed"
+    assert "模拟失败" in store["t1"]["error"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def task_store(request, tmp_path):
+    """创建任务存储"""
+    from src.core.config import TaskConfig
+    from src.tasks.store import create_task_store
+    
+    config = TaskConfig(
+        store_backend=request.param,
+        store_path=str(tmp_path / "tasks.sqlite3"),
+        history_size=2
+    )
+    return create_task_store(config)
+
+
+def test_task_store_roundtrip(task_store):
+    """测试任务存储的字典接口"""
+    from datetime import datetime
+    
+    task = make_task("t1")
+    task["created_at"] = datetime(2024, 1, 1, 12, 0)
+    task_store["t1"] = task
+    
+    loaded = task_store["t1"]
+    assert loaded["created_at"] == datetime(2024, 1, 1, 12, 0)
+    assert loaded["keywords"] == ["AI"]
+    assert "t1" in task_store
+    assert task_store.get("missing") is None
+    assert len(task_store) == 1
+    
+    loaded["status"] = "completed"
+    task_store["t1"] = loaded
+    assert task_store["t1"]["status"] == "completed"
+    assert [t["id"] for t in task_store.values()] == ["t1"]
+    
+    del task_store["t1"]
+    assert len(task_store) == 0
+
+
+def test_task_store_eviction(task_store):
+    """测试按历史数量清理已结束任务"""
+    from datetime import datetime, timedelta
+    
+    base = datetime.now()
+    for i in range(4):
+        task = make_task(f"t{i}")
+        task["status"] = "completed"
+        task["created_at"] = base + timedelta(seconds=i)
+        task_store[task["id"]] = task
+    
+    running = make_task("running")
+    running["status"] = "running"
+    running["created_at"] = base - timedelta(days=30)
+    task_store["running"] = running
+    
+    assert task_store.evict() == 2
+    assert sorted(task_store) == ["running", "t2", "t3"]
+
+
+def test_task_store_leases(task_store):
+    """测试租约过期的未结束任务只被接管一次"""
+    from datetime import datetime, timedelta
+    
+    for task_id, status in (("live", "running"), ("dead", "running"), ("done", "completed"), ("new", "pending")):
+        task = make_task(task_id)
+        task["status"] = status
+        task["updated_at"] = datetime.now()
+        task_store[task_id] = task
+    
+    task_store.renew(["live"], "worker-1", 60)
+    task_store.renew(["dead", "done"], "worker-2", -1)
+    
+    # 刚创建、尚未入队的任务没有租约，也不会立即被接管
+    assert task_store.claim_expired("worker-3", 60) == ["dead"]
+    assert task_store.claim_expired("worker-4", 60) == []
+    
+    stale = task_store["new"]
+    stale["updated_at"] = datetime.now() - timedelta(seconds=120)
+    task_store["new"] = stale
+    assert task_store.claim_expired("worker-4", 60) == ["new"]
+
+
+def test_executor_recovers_expired_tasks(tmp_path, checkpoints):
+    """测试执行器启动时接管其他进程遗留的任务"""
+    from src.tasks.store import SQLiteTaskStore
+    
+    store = SQLiteTaskStore(tmp_path / "tasks.sqlite3")
+    task = make_task("t1")
+    task["status"] = "running"
+    store["t1"] = task
+    store.renew(["t1"], "dead-worker", -1)
+    
+    executor = TaskExecutor(FakeGraph(), store, retry_delay=0)
+    assert executor.recover() == 1
+    executor.shutdown()
+    
+    assert store["t1"]["status"] == "completed"
+    assert executor.recover() == 0
+
+
+def test_executor_with_sqlite_store(tmp_path, checkpoints):
+    """测试执行器写回SQLite存储"""
+    from src.tasks.store import SQLiteTaskStore
+    
+    store = SQLiteTaskStore(tmp_path / "tasks.sqlite3")
+    store["t1"] = make_task("t1")
+    executor = TaskExecutor(FakeGraph(), store, retry_delay=0)
+    
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert store["t1"]["status"] == "completed"
+
+
+def test_task_store_index(task_store):
+    """测试增量维护的时间索引和状态计数"""
+    from datetime import datetime, timedelta
+    
+    base = datetime.now()
+    for i in range(5):
+        task = make_task(f"t{i}")
+        task["created_at"] = base + timedelta(seconds=i)
+        task_store[task["id"]] = task
+    
+    assert [t["id"] for t in task_store.recent(3)] == ["t4", "t3", "t2"]
+    assert task_store.stats() == {
+        "pending": 5, "running": 0, "completed": 0, "failed": 0, "total": 5
+    }
+    
+    for task_id, status in [("t0", "running"), ("t1", "completed"), ("t0", "failed")]:
+        task = task_store[task_id]
+        task["status"] = status
+        task_store[task_id] = task
+    del task_store["t4"]
+    
+    assert task_store.stats() == {
+        "pending": 2, "running": 0, "completed": 1, "failed": 1, "total": 4
+    }
+    assert [t["id"] for t in task_store.recent(10)] == ["t3", "t2", "t1", "t0"]
+
+
+def test_event_bus():
+    """测试事件总线与SSE格式"""
+    from src.tasks.events import EventBus, format_sse
+    
+    bus = EventBus(max_queue_size=1)
+    assert not bus.has_subscribers()
+    
+    subscriber = bus.subscribe()
+    bus.publish("task", "<div>\n</div>")
+    bus.publish("task", "dropped")
+    assert subscriber.get_nowait() == ("task", "<div>\n</div>")
+    assert subscriber.empty()
+    
+    bus.unsubscribe(subscriber)
+    assert not bus.has_subscribers()
+    
+    assert format_sse("task", "<div>\n</div>") == "event: task\ndata: <div>\ndata: </div>\n\n"
+
+
+def test_task_store_version(task_store):
+    """测试存储版本号随写入递增"""
+    version = task_store.version()
+    task_store["t1"] = make_task("t1")
+    assert task_store.version() > version
+    
+    version = task_store.version()
+    del task_store["t1"]
+    assert task_store.version() > version
+
+
+def test_executor_streams_partial_prompt(checkpoints):
+    """测试流式提示词写入任务记录"""
+    store = {"t1": make_task("t1")}
+    seen = []
+    
+    class StreamingGraph:
+        def invoke(self, state, config=None):
+            config["configurable"]["on_token"]("部分提示词")
+            seen.append(store["t1"].get("partial_prompt"))
+            return {**state, "completed": True}
+    
+    executor = TaskExecutor(StreamingGraph(), store, retry_delay=0)
+    executor.submit("t1").result(timeout=5)
+    executor.shutdown()
+    
+    assert seen == ["部分提示词"]
+
+
+def test_batch_coalesces_searches(checkpoints, task_store):
+    """测试批量任务合并关键词搜索并复用结果"""
+    import time
+    from src.tasks.batch import BatchScheduler
+    from src.tools.hotspot import HotspotFinder
+    
+    searched = []
+    
+    class FakeFinder(HotspotFinder):
+        def __init__(self):
+            self.score_weights = {}
+        
+        def search_keywords(self, keywords, lookback_days=7, concurrency=None):
+            searched.extend(keywords)
+            return {kw: [{'bvid': f'BV_{kw}', 'play': len(kw), 'pubdate': 0}] for kw in keywords}
+    
+    class RecordingGraph(FakeGraph):
+        def __init__(self):
+            super().__init__()
+            self.states = {}
+        
+        def invoke(self, state, config=None):
+            self.states[state['task_id']] = state
+            return super().invoke(state, config)
+    
+    graph = RecordingGraph()
+    store = task_store
+    executor = TaskExecutor(graph, store, max_workers=2, retry_delay=0)
+    scheduler = BatchScheduler(executor, store, finder_factory=FakeFinder)
+    
+    batch = scheduler.submit([
+        {'task_type': 'hotspot', 'keywords': ['AI', '科技']},
+        {'task_type': 'hotspot', 'keywords': ['科技', '游戏']},
+        {'task_type': 'complete', 'keywords': ['美食']},
+    ])
+    assert batch['total'] == 3
+    assert batch['searches'] == 3
+    
+    deadline = time.monotonic() + 5
+    while not scheduler.get(batch['id'])['done'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    executor.shutdown()
+    
+    progress = scheduler.get(batch['id'])
+    assert progress['progress'] == 1.0
+    assert progress['counts']['completed'] == 3
+    assert sorted(searched) == ['AI', '游戏', '科技']
+    
+    first, second, third = progress['task_ids']
+    assert [v['bvid'] for v in graph.states[first]['hotspot_videos']] == ['BV_AI', 'BV_科技']
+    assert [v['bvid'] for v in graph.states[second]['hotspot_videos']] == ['BV_科技', 'BV_游戏']
+    assert 'hotspot_videos' not in graph.states[third]
+    assert store[first]['batch_id'] == batch['id']
+
+
+def test_batch_progress_from_shared_store(tmp_path, checkpoints):
+    """测试批次进度从任务存储读取，其他进程也能查询，任务清理后批次随之消失"""
+    import time
+    from src.core.config import TaskConfig
+    from src.tasks.batch import BatchScheduler
+    from src.tasks.store import SQLiteTaskStore
+    
+    config = TaskConfig(history_size=0)
+    path = tmp_path / "tasks.sqlite3"
+    executor = TaskExecutor(FakeGraph(), SQLiteTaskStore(path, config), retry_delay=0)
+    scheduler = BatchScheduler(executor, executor.store)
+    
+    batch = scheduler.submit([{"task_type": "complete", "keywords": ["AI"]}] * 2)
+    
+    # 另一个进程的调度器
+    other = BatchScheduler(executor, SQLiteTaskStore(path, config))
+    assert other.get(batch["id"])["task_ids"] == batch["task_ids"]
+    assert other.get("missing") is None
+    
+    deadline = time.monotonic() + 5
+    while not other.get(batch["id"])["done"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    executor.shutdown()
+    
+    other.store.evict()
+    assert other.get(batch["id"]) is None
+
+
+def test_batch_continues_after_task_error(checkpoints, task_store):
+    """测试批次内单个任务出错时其余任务仍会提交"""
+    import time
+    from src.tasks.batch import BatchScheduler
+    
+    class BrokenFinder:
+        def search_keywords(self, keywords, lookback_days=7, concurrency=None):
+            return {kw: [{'bvid': f'BV_{kw}'}] for kw in keywords}
+        
+        def rank_results(self, keywords, results, top_k=10):
+            raise RuntimeError("排序失败")
+    
+    class FlakyExecutor(TaskExecutor):
+        def submit(self, task_id, resume=False):
+            if task_store[task_id]['keywords'] == ['坏']:
+                raise RuntimeError("队列已关闭")
+            return super().submit(task_id, resume)
+    
+    executor = FlakyExecutor(FakeGraph(), task_store, retry_delay=0)
+    scheduler = BatchScheduler(executor, task_store, finder_factory=BrokenFinder)
+    
+    batch = scheduler.submit([
+        {'task_type': 'hotspot', 'keywords': ['AI']},
+        {'task_type': 'complete', 'keywords': ['坏']},
+        {'task_type': 'hotspot', 'keywords': ['科技']},
+    ])
+    
+    deadline = time.monotonic() + 5
+    while not scheduler.get(batch['id'])['done'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    executor.shutdown()
+    
+    progress = scheduler.get(batch['id'])
+    assert progress['counts']['completed'] == 2
+    assert progress['counts']['failed'] == 1
+    assert task_store[progress['task_ids'][1]]['error'] == '提交失败: 队列已关闭'
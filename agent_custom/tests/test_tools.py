@@ -4,6 +4,16 @@ import pytest
 from src.tools.hotspot import HotspotFinder
 
 
+@pytest.fixture
+def generator_module(monkeypatch):
+    """提示词生成器模块，共享的提示词缓存换成内存缓存，避免写入 ./data"""
+    from src.tools import generator as generator_module
+    from src.tools.cache import TTLCache
+    
+    monkeypatch.setattr(generator_module, 'get_prompt_cache', TTLCache)
+    return generator_module
+
+
 def test_hotspot_finder():
     """测试热点发现器"""
     finder = HotspotFinder()
@@ -24,6 +34,35 @@ def test_hotspot_finder():
     assert score > 0
 
 
+def test_hotspot_batch_scoring():
+    """测试批量评分使用配置权重并取前K个"""
+    from src.tools.hotspot import score_videos
+    
+    now = 1700000000
+    weights = {'views': 0, 'likes': 1.0, 'comments': 0, 'danmaku': 0, 'gravity': 1.0, 'duration_weight': 0}
+    videos = [
+        {'bvid': 'BV0', 'like': 10, 'pubdate': now},
+        {'bvid': 'BV1', 'like': 30, 'pubdate': now},
+        {'bvid': 'BV2', 'like': 20, 'pubdate': now},
+        {'bvid': 'BV3', 'like': 30, 'pubdate': now},
+    ]
+    assert score_videos(videos, weights, now=now).tolist() == [5.0, 15.0, 10.0, 15.0]
+    
+    # 时长支持 MM:SS，长视频获得加成
+    boosted = dict(weights, duration_weight=1.0)
+    short, long = score_videos(
+        [{'like': 10, 'pubdate': now, 'duration': 30}, {'like': 10, 'pubdate': now, 'duration': '10:00'}],
+        boosted,
+        now=now
+    )
+    assert long > short
+    
+    finder = HotspotFinder()
+    finder.score_weights = weights
+    ranked = finder._rank_videos(videos, top_k=3)
+    assert [v['bvid'] for v in ranked] == ['BV1', 'BV3', 'BV2']
+
+
 def test_video_analyzer():
     """测试视频分析器"""
     from src.tools.analyzer import VideoAnalyzer
@@ -39,8 +78,747 @@ def test_video_analyzer():
     assert 'AI' in keywords
 
 
+def test_keyword_extraction():
+    """测试中文分词与TF-IDF关键词"""
+    from src.tools.text import SimpleTokenizer, tfidf_keywords
+    
+    tokenizer = SimpleTokenizer()
+    assert tokenizer.tokenize('回复 @某人 :原神真的好玩[doge]') == ['原神', '好玩']
+    
+    comments = ['原神新版本太好玩了', '原神剧情好评', '这个视频真的好玩', '剧情一般']
+    keywords = tfidf_keywords(comments, tokenizer, top_k=3)
+    
+    assert keywords[0] == '原神'
+    assert set(keywords) == {'原神', '好玩', '剧情'}
+
+
 def test_prompt_generator():
     """测试提示词生成器"""
     # 需要配置API密钥才能测试
     pass
 
+
+
+def test_find_hotspots_concurrent(monkeypatch):
+    """测试多关键词并发搜索与合并去重"""
+    import threading
+    import time
+    
+    finder = HotspotFinder()
+    active = []
+    peak = []
+    lock = threading.Lock()
+    
+    def fake_search(keyword, days):
+        with lock:
+            active.append(keyword)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(keyword)
+        return [
+            {'bvid': f'BV_{keyword}', 'play': 100, 'pubdate': int(time.time())},
+            {'bvid': 'BV_shared', 'play': 10, 'pubdate': int(time.time())},
+        ]
+    
+    monkeypatch.setattr(finder, '_search_videos', fake_search)
+    
+    results = finder.find_hotspots(['a', 'b', 'c', 'd'], top_k=10, concurrency=4)
+    
+    assert max(peak) > 1
+    assert len(results) == 5
+    assert [v['bvid'] for v in results].count('BV_shared') == 1
+
+
+def test_rate_limiter():
+    """测试令牌桶限流"""
+    import time
+    from src.tools.ratelimit import RateLimiter
+    
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    
+    assert time.monotonic() - start >= 0.09
+
+
+def test_bilibili_client_pooling():
+    """测试B站客户端连接池与重试配置"""
+    from src.core.config import BilibiliConfig
+    from src.tools.bilibili import BilibiliClient, get_bilibili_client
+    
+    client = BilibiliClient(BilibiliConfig(pool_size=8, max_retries=2))
+    adapter = client.session.get_adapter("https://api.bilibili.com")
+    
+    assert adapter._pool_maxsize == 8
+    assert adapter.max_retries.total == 2
+    assert 412 in adapter.max_retries.status_forcelist
+    assert get_bilibili_client() is get_bilibili_client()
+
+
+def test_bilibili_client_async_retry():
+    """测试异步请求在风控状态码上退避重试"""
+    import asyncio
+    import httpx
+    from src.core.config import BilibiliConfig
+    from src.tools.bilibili import BilibiliClient
+    
+    client = BilibiliClient(BilibiliConfig(max_retries=2, backoff_factor=0))
+    client.cache = None
+    statuses = [412, 200]
+    
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json={'code': 0, 'data': {'bvid': request.url.params['bvid']}})
+    
+    async def run():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await client.aget('/x/web-interface/view', {'bvid': 'BV1'})
+        finally:
+            await client.aclose()
+    
+    assert asyncio.run(run())['data']['bvid'] == 'BV1'
+    assert statuses == []
+
+
+def test_bilibili_client_scope_closes_async_client():
+    """测试最后一个使用方退出时才关闭当前循环的异步客户端"""
+    import asyncio
+    from src.tools.bilibili import BilibiliClient
+    
+    client = BilibiliClient()
+    
+    async def run():
+        async with client.scope():
+            shared = client._async_client()
+            async with client.scope():
+                assert client._async_client() is shared
+            assert not shared.is_closed
+        return shared
+    
+    shared = asyncio.run(run())
+    assert shared.is_closed
+    assert len(client._async_clients) == 0
+
+
+def test_bilibili_client_collapses_concurrent_requests():
+    """测试相同的并发请求只发送一次"""
+    import asyncio
+    import httpx
+    from src.tools.bilibili import BilibiliClient
+    
+    client = BilibiliClient()
+    client.cache = None
+    requests_sent = []
+    
+    async def handler(request):
+        requests_sent.append(str(request.url))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={'code': 0, 'data': {'bvid': request.url.params['bvid']}})
+    
+    async def run():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await asyncio.gather(
+                *(client.aget('/x/web-interface/view', {'bvid': 'BV1'}) for _ in range(4)),
+                client.aget('/x/web-interface/view', {'bvid': 'BV2'})
+            )
+        finally:
+            await client.aclose()
+    
+    results = asyncio.run(run())
+    
+    assert [r['data']['bvid'] for r in results] == ['BV1'] * 4 + ['BV2']
+    assert results[0] is results[3]
+    assert len(requests_sent) == 2
+    assert client.inflight.stats()['collapsed'] == 3
+    assert client.inflight.stats()['in_flight'] == 0
+
+
+def test_circuit_breaker_trips_and_recovers(monkeypatch):
+    """测试熔断器连续失败后熔断，到期后放行一次试探请求"""
+    from src.tools import breaker as breaker_module
+    from src.tools.breaker import CircuitBreaker, CircuitOpenError
+    
+    now = [100.0]
+    monkeypatch.setattr(breaker_module.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+    
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    
+    now[0] += 30
+    assert not breaker.is_open()
+    breaker.check()  # 试探请求
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    
+    now[0] += 30
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.stats()['trips'] == 2
+
+
+def test_bilibili_client_breaker_on_risk_control():
+    """测试B站风控拦截(-412)后熔断，熔断期间不再发出请求"""
+    import asyncio
+    import httpx
+    from src.core.config import BilibiliConfig
+    from src.tools import bilibili
+    from src.tools.breaker import CircuitBreaker, CircuitOpenError
+    
+    client = bilibili.BilibiliClient(BilibiliConfig(max_retries=0))
+    client.cache = None
+    client.breaker = CircuitBreaker('bilibili', failure_threshold=2, reset_timeout=60)
+    requests_sent = []
+    
+    def handler(request):
+        requests_sent.append(request.url.params['bvid'])
+        return httpx.Response(200, json={'code': -412, 'message': '请求被拦截'})
+    
+    async def run():
+        client._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            for bvid in ('BV1', 'BV2', 'BV3'):
+                try:
+                    await client.aget('/x/web-interface/view', {'bvid': bvid})
+                except CircuitOpenError:
+                    return bvid
+        finally:
+            await client.aclose()
+    
+    assert asyncio.run(run()) == 'BV3'
+    assert requests_sent == ['BV1', 'BV2']
+
+
+def test_single_flight_shares_result_and_error():
+    """测试同步调用合并时共享结果和异常"""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from src.tools.singleflight import SingleFlight
+    
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    
+    def slow():
+        calls.append(1)
+        release.wait(1)
+        return {'code': 0}
+    
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, 'key', slow) for _ in range(3)]
+        while flight.stats()['executed'] + flight.stats()['collapsed'] < 3:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+    
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats()['collapsed'] == 2
+    
+    def fail():
+        raise ValueError('boom')
+    
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_video_analyzer_single_detail_fetch(monkeypatch):
+    """测试视频详情只获取一次"""
+    from src.tools.analyzer import VideoAnalyzer
+    
+    analyzer = VideoAnalyzer()
+    calls = []
+    
+    def fake_get(path, params=None):
+        calls.append(path)
+        if path == '/x/web-interface/view':
+            return {'code': 0, 'data': {'aid': 42, 'stat': {'view': 7}}}
+        return {'code': 0, 'data': {'replies': [
+            {'content': {'message': 'AI 很棒'}, 'like': 3, 'member': {'uname': 'u'}},
+        ]}}
+    
+    monkeypatch.setattr(analyzer.client, 'get', fake_get)
+    
+    result = analyzer.analyze({'bvid': 'BV1', 'aid': 42})
+    assert calls.count('/x/web-interface/view') == 1
+    assert result['insights']['stats']['view'] == 7
+    assert result['comments']['total'] == 1
+    
+    calls.clear()
+    result = analyzer.analyze({'bvid': 'BV1'})
+    assert calls.count('/x/web-interface/view') == 1
+    assert result['comments']['total'] == 1
+
+
+def test_video_analyzer_comment_pages(monkeypatch):
+    """测试评论分页并发获取和提前停止"""
+    from src.tools.analyzer import VideoAnalyzer
+    
+    analyzer = VideoAnalyzer()
+    analyzer.comment_max_pages = 5
+    pages = []
+    
+    def reply(rpid):
+        return {'rpid': rpid, 'content': {'message': f'评论{rpid}'}, 'like': rpid, 'member': {}}
+    
+    def paged_get(path, params=None):
+        pages.append(params['pn'])
+        start = (params['pn'] - 1) * params['ps']
+        return {'code': 0, 'data': {
+            'page': {'count': 95},
+            'replies': [reply(start + i) for i in range(params['ps'])],
+        }}
+    
+    monkeypatch.setattr(analyzer.client, 'get', paged_get)
+    comments = analyzer._get_comments('BV1', 50, aid=42)
+    
+    # 50条需要3页，总数95条不会限制页数
+    assert sorted(pages) == [1, 2, 3]
+    assert len(comments) == 50
+    assert len({c['rpid'] for c in comments}) == 50
+
+
+
+def test_ttl_cache(tmp_path):
+    """测试响应缓存的TTL、LRU淘汰和持久化"""
+    import time
+    from src.tools.cache import SQLiteCacheBackend, TTLCache, make_cache_key
+    
+    key = make_cache_key('/x/web-interface/view', {'bvid': 'BV1'})
+    assert key == make_cache_key('/x/web-interface/view', {'bvid': 'BV1'})
+    
+    cache = TTLCache(max_entries=2, default_ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # 淘汰最久未使用的 b
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    
+    cache.set('short', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+    
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['evictions'] >= 1
+    
+    backend = SQLiteCacheBackend(tmp_path / 'cache.sqlite3')
+    TTLCache(backend=backend).set(key, {'code': 0})
+    restored = TTLCache(backend=SQLiteCacheBackend(tmp_path / 'cache.sqlite3'))
+    assert restored.get(key) == {'code': 0}
+    
+    # 磁盘同样受 max_entries 限制，保留过期时间最晚的项
+    bounded = SQLiteCacheBackend(tmp_path / 'bounded.sqlite3', max_entries=2)
+    for i in range(4):
+        bounded.set(f'k{i}', i, time.time() + 60 + i)
+    bounded.prune()
+    assert [bounded.get(f'k{i}') is not None for i in range(4)] == [False, False, True, True]
+
+
+def test_prompt_generator_cache(generator_module, monkeypatch):
+    """测试提示词结果缓存"""
+    from src.tools.cache import TTLCache
+    
+    monkeypatch.setattr(generator_module.settings, 'gemini_api_keys', 'test-key')
+    generator = generator_module.PromptGenerator()
+    generator.cache = TTLCache()
+    
+    class FakeLLM:
+        calls = 0
+        
+        def invoke(self, messages):
+            FakeLLM.calls += 1
+            return type('Response', (), {'content': ' 一段提示词 '})()
+    
+    generator.llms = {key: FakeLLM() for key in generator.llms}
+    insights = {'title': '标题', 'bvid': 'BV1', 'tags': []}
+    comments = {'keywords': ['AI']}
+    
+    first = generator.generate_prompt(insights, comments, '需求')
+    second = generator.generate_prompt(insights, comments, '需求  ')
+    
+    assert first['text'] == second['text'] == '一段提示词'
+    assert FakeLLM.calls == 1
+    assert generator.cache.stats()['hits'] == 1
+
+
+def test_prompt_generator_breaker_on_outage(generator_module, monkeypatch):
+    """测试Gemini超时等服务不可用错误计入熔断，熔断后不再调用LLM"""
+    from google.genai.errors import ClientError
+    from src.tools.breaker import CircuitBreaker, CircuitOpenError
+    
+    monkeypatch.setattr(generator_module.settings, 'gemini_api_keys', 'test-key')
+    generator = generator_module.PromptGenerator()
+    generator.cache = None
+    generator.breaker = CircuitBreaker('gemini', failure_threshold=2, reset_timeout=60)
+    
+    class DeadlineExceeded(Exception):
+        pass
+    
+    class TimeoutLLM:
+        calls = 0
+        
+        def invoke(self, messages):
+            TimeoutLLM.calls += 1
+            raise DeadlineExceeded('504 Deadline Exceeded')
+    
+    class AuthLLM:
+        def invoke(self, messages):
+            raise ClientError(400, {'error': {'status': 'INVALID_ARGUMENT', 'message': 'prompt exceeds 5000 characters'}})
+    
+    insights = {'title': '标题', 'bvid': 'BV1', 'tags': []}
+    
+    generator.llms = {key: AuthLLM() for key in generator.llms}
+    with pytest.raises(ClientError):
+        generator.generate_prompt(insights, {}, '需求')
+    assert generator.breaker.state == 'closed'
+    
+    generator.llms = {key: TimeoutLLM() for key in generator.llms}
+    for _ in range(2):
+        with pytest.raises(DeadlineExceeded):
+            generator.generate_prompt(insights, {}, '需求')
+    with pytest.raises(CircuitOpenError):
+        generator.generate_prompt(insights, {}, '需求')
+    
+    assert TimeoutLLM.calls == 2
+
+
+def test_tool_registry():
+    """测试工具实例在线程间共享"""
+    from concurrent.futures import ThreadPoolExecutor
+    from src.tools.registry import get_tool, reset_tools
+    
+    class Counted:
+        created = 0
+        
+        def __init__(self):
+            Counted.created += 1
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(lambda _: get_tool(Counted), range(32)))
+    
+    assert Counted.created == 1
+    assert all(instance is instances[0] for instance in instances)
+    
+    reset_tools()
+    assert get_tool(Counted) is not instances[0]
+
+
+def test_key_pool_failover(generator_module, monkeypatch):
+    """测试多密钥轮询与限流故障转移"""
+    from google.genai.errors import ClientError
+    from src.tools.keypool import KeyPool, NoAvailableKeyError, is_rate_limit_error
+    
+    pool = KeyPool(['k1', 'k2', 'k3'])
+    keys = [pool.acquire() for _ in range(3)]
+    assert keys == ['k1', 'k2', 'k3']
+    for key in keys:
+        pool.release(key)
+    
+    pool.release(pool.acquire(), rate_limited=True)
+    assert 'k1' not in [pool.acquire() for _ in range(4)]
+    
+    single = KeyPool(['only'], cooldown=60)
+    single.release(single.acquire(), rate_limited=True)
+    with pytest.raises(NoAvailableKeyError):
+        single.acquire()
+    
+    monkeypatch.setattr(generator_module.settings, 'gemini_api_keys', 'key-a,key-b')
+    generator = generator_module.PromptGenerator()
+    generator.cache = None
+    
+    class LimitedLLM:
+        def invoke(self, messages):
+            # LangChain 把 SDK 异常包装后重新抛出，状态码在异常链上
+            try:
+                raise ClientError(429, {'error': {'status': 'RESOURCE_EXHAUSTED'}})
+            except ClientError as e:
+                raise RuntimeError('Error calling model') from e
+    
+    class WorkingLLM:
+        def invoke(self, messages):
+            return type('Response', (), {'content': '提示词'})()
+    
+    generator.llms = {'key-a': LimitedLLM(), 'key-b': WorkingLLM()}
+    result = generator.generate_prompt({'tags': []}, {}, '')
+    
+    assert result['text'] == '提示词'
+    assert generator.key_pool.stats()[0]['rate_limited'] == 1
+    
+    # 信息里恰好出现 429 的参数错误不算限流
+    assert not is_rate_limit_error(ValueError('400 INVALID_ARGUMENT: prompt has 4290 tokens'))
+
+
+def test_prompt_generator_streaming(generator_module, monkeypatch):
+    """测试流式生成提示词"""
+    from langchain_core.messages import AIMessageChunk
+    
+    monkeypatch.setattr(generator_module.settings, 'gemini_api_keys', 'test-key')
+    generator = generator_module.PromptGenerator()
+    generator.cache = None
+    
+    class StreamingLLM:
+        def stream(self, messages):
+            for part in ['一段', '提示', '词']:
+                yield AIMessageChunk(content=part)
+    
+    generator.llms = {'test-key': StreamingLLM()}
+    partials = []
+    
+    result = generator.generate_prompt({'tags': []}, {}, '', on_token=partials.append)
+    
+    assert partials == ['一段', '一段提示', '一段提示词']
+    assert result['text'] == '一段提示词'
+
+
+def test_hotspot_tracker(tmp_path, monkeypatch):
+    """测试热点追踪按增长速度排序"""
+    import time
+    from src.tools.tracker import HotspotTracker
+    
+    clock = [1700000000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    plays = {'BV0': [1000, 1100], 'BV1': [500, 5000]}
+    
+    class FakeFinder:
+        def search_keywords(self, keywords, lookback_days=7, concurrency=None):
+            return {
+                keyword: [
+                    {'bvid': bvid, 'play': counts.pop(0), 'pubdate': clock[0] - 3600}
+                    for bvid, counts in plays.items()
+                ]
+                for keyword in keywords
+            }
+    
+    tracker = HotspotTracker(FakeFinder(), tmp_path / 'hotspots.sqlite3')
+    tracker.weights = (1.0, 0, 0, 0)
+    assert tracker.ranking(['AI']) is None
+    
+    tracker.track(['AI'])
+    assert tracker.crawl() == 2
+    assert [v['bvid'] for v in tracker.ranking(['AI'])] == ['BV0', 'BV1']
+    
+    # 一小时后 BV1 增长更快
+    clock[0] += 3600
+    tracker.crawl()
+    ranking = tracker.ranking(['AI'])
+    assert [v['bvid'] for v in ranking] == ['BV1', 'BV0']
+    assert ranking[0]['velocity'] == 0.5 * 4500 + 0.5 * 500
+    assert [s['play'] for s in tracker.history('BV1')] == [500, 5000]
+    
+    assert tracker.ranking(['其他']) is None
+    clock[0] += tracker.max_age + 1
+    assert tracker.ranking(['AI']) is None
+
+
+def test_hotspot_tracker_claims_crawls(tmp_path, monkeypatch):
+    """测试多个进程共享数据库时每个关键词每个间隔只抓取一次"""
+    import time
+    from src.tools.tracker import HotspotTracker
+    
+    clock = [1700000000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    searched = []
+    
+    class FakeFinder:
+        def search_keywords(self, keywords, lookback_days=7, concurrency=None):
+            searched.extend(keywords)
+            return {keyword: [{'bvid': f'BV-{keyword}', 'play': 100}] for keyword in keywords}
+    
+    path = tmp_path / 'hotspots.sqlite3'
+    workers = [HotspotTracker(FakeFinder(), path) for _ in range(3)]
+    workers[0].track(['AI', '科技'])
+    
+    assert [worker.crawl() for worker in workers] == [2, 0, 0]
+    
+    # 下一个间隔由先到的进程抓取
+    clock[0] += workers[0].interval
+    assert [worker.crawl() for worker in reversed(workers)] == [2, 0, 0]
+    assert sorted(searched) == ['AI', 'AI', '科技', '科技']
+
+
+def test_hotspot_tracker_expires_keywords(tmp_path, monkeypatch):
+    """测试长时间未请求或超出上限的关键词停止追踪"""
+    import time
+    from src.tools.tracker import HotspotTracker
+    
+    clock = [1700000000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    
+    class FakeFinder:
+        def search_keywords(self, keywords, lookback_days=7, concurrency=None):
+            return {keyword: [{'bvid': f'BV-{keyword}', 'play': 100}] for keyword in keywords}
+    
+    tracker = HotspotTracker(FakeFinder(), tmp_path / 'hotspots.sqlite3')
+    tracker.max_idle = 600
+    tracker.max_keywords = 2
+    
+    tracker.track(['AI', '科技'])
+    tracker.crawl()
+    
+    # 只有 AI 在空闲期内再次被请求
+    clock[0] += 300
+    tracker.track(['AI'])
+    clock[0] += 400
+    assert tracker.keywords() == ['AI']
+    assert tracker.history('BV-科技') == []
+    
+    # 超出上限时淘汰最久未请求的
+    tracker.track(['游戏'])
+    clock[0] += 1
+    tracker.track(['音乐'])
+    assert sorted(tracker.keywords()) == ['游戏', '音乐']
+    assert tracker.crawl() == 2
+
+
+def test_video_job_manager(tmp_path, monkeypatch):
+    """测试视频任务并发上限、退避轮询和重启恢复"""
+    import time
+    from src.core.config import VideoConfig
+    from src.tools.video_jobs import FakeVideoBackend, VideoJobManager
+    
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    config = VideoConfig(max_concurrent=1, poll_interval=1, poll_backoff=2, max_poll_interval=3)
+    path = tmp_path / 'jobs.sqlite3'
+    
+    manager = VideoJobManager(FakeVideoBackend(polls=3), path, config)
+    finished = []
+    manager.add_listener(finished.append)
+    
+    first = manager.submit('提示词1', task_id='t1')
+    second = manager.submit('提示词2', task_id='t2')
+    
+    # 并发上限为1，第二个任务排队
+    assert manager.run_once() == 1
+    assert manager.get(first)['status'] == 'running'
+    assert manager.get(second)['status'] == 'queued'
+    
+    # 未完成时轮询间隔 1 -> 2 -> 3（上限）
+    clock[0] += 1
+    assert manager.run_once() == 2
+    clock[0] += 2
+    assert manager.run_once() == 3
+    
+    # 模拟重启：新的管理器从数据库继续轮询
+    restarted = VideoJobManager(FakeVideoBackend(polls=3), path, config)
+    restarted.add_listener(finished.append)
+    clock[0] += 3
+    restarted.run_once()
+    
+    assert restarted.get(first)['status'] == 'completed'
+    assert restarted.get(first)['video_url'].endswith('.mp4')
+    assert restarted.get(second)['status'] == 'running'
+    assert [job['task_id'] for job in finished] == ['t1']
+
+
+def test_video_job_manager_claims_jobs(tmp_path):
+    """测试多个进程的管理器共用数据库时任务只提交和轮询一次"""
+    from src.core.config import VideoConfig
+    from src.tools.video_jobs import FakeVideoBackend, VideoJobManager
+    
+    class InterleavedBackend(FakeVideoBackend):
+        """提交和轮询过程中让另一个管理器执行一轮，模拟多进程交错"""
+        
+        def __init__(self):
+            super().__init__(polls=1)
+            self.submitted = []
+            self.polled = []
+            self.other = None
+        
+        def submit(self, prompt, params):
+            self.submitted.append(prompt)
+            self._interleave()
+            return super().submit(prompt, params)
+        
+        def poll(self, operation_id):
+            self.polled.append(operation_id)
+            self._interleave()
+            return super().poll(operation_id)
+        
+        def _interleave(self):
+            other, self.other = self.other, None
+            if other is not None:
+                other.run_once()
+    
+    config = VideoConfig(poll_interval=0)
+    path = tmp_path / 'jobs.sqlite3'
+    backend = InterleavedBackend()
+    first = VideoJobManager(backend, path, config)
+    second = VideoJobManager(backend, path, config)
+    
+    job_id = first.submit('提示词')
+    backend.other = second
+    first.run_once()
+    assert backend.submitted == ['提示词']
+    
+    backend.other = second
+    first.run_once()
+    assert len(backend.polled) == 1
+    assert first.get(job_id)['status'] == 'completed'
+
+
+def test_video_asset_store(tmp_path):
+    """测试视频断点续传、内容去重和大小限制"""
+    import hashlib
+    import httpx
+    from src.core.config import VideoConfig
+    from src.tools.assets import AssetTooLargeError, VideoAssetStore
+    
+    content = b'0123456789' * 100
+    ranges = []
+    
+    def handler(request):
+        ranges.append(request.headers.get('Range'))
+        if request.headers.get('Range'):
+            start = int(request.headers['Range'][len('bytes='):-1])
+            return httpx.Response(206, content=content[start:], headers={'Content-Type': 'video/mp4'})
+        return httpx.Response(200, content=content, headers={'Content-Type': 'video/mp4'})
+    
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    store = VideoAssetStore(tmp_path, client=client)
+    
+    # 已下载一部分时从断点续传
+    url = 'https://example.com/a.mp4'
+    partial = store.partial_dir / f'{hashlib.sha1(url.encode()).hexdigest()}.part'
+    partial.write_bytes(content[:300])
+    
+    asset = store.download(url)
+    assert ranges == ['bytes=300-']
+    assert asset['path'].read_bytes() == content
+    assert not partial.exists()
+    
+    # 相同内容只保存一份，已下载的URL不再请求
+    assert store.download('https://example.com/b.mp4')['asset_id'] == asset['asset_id']
+    assert store.download(url)['asset_id'] == asset['asset_id']
+    assert len(ranges) == 2
+    assert len(list(tmp_path.glob('*.mp4'))) == 1
+    
+    small = VideoAssetStore(tmp_path / 'small', VideoConfig(max_size_mb=0), client=client)
+    with pytest.raises(AssetTooLargeError):
+        small.download('https://example.com/c.mp4')
+    
+    # 续传次数配置为0时仍至少请求一次
+    once = VideoAssetStore(tmp_path / 'once', VideoConfig(download_attempts=0), client=client)
+    assert once.download('https://example.com/d.mp4')['path'].read_bytes() == content